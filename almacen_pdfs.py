@@ -0,0 +1,142 @@
+import gzip
+import os
+import re
+import threading
+import time
+import uuid
+
+# ----------------------------------------------------------------------
+#               ALMACÉN DE LOS PDFs DE DENUNCIA GENERADOS
+# ----------------------------------------------------------------------
+# generar_pdf escribía siempre en "formato_denuncia.pdf" en el directorio de
+# trabajo: dos usuarias que terminaban el formulario al mismo tiempo se
+# sobrescribían la denuncia y /download_sue entregaba la última que se escribió.
+# Ahora el PDF se arma en memoria y se guarda aquí con un id único (uuid4), que
+# es lo único que va en la sesión. Así la generación no necesita candados.
+#   - Los archivos viven en PDFS_CARPETA, compartida por los workers de gunicorn.
+#   - Con PDFS_GZIP=1 se guardan comprimidos; si el navegador acepta gzip se
+#     envían tal cual (Content-Encoding: gzip) y si no se descomprimen al vuelo.
+#   - Cada PDF vence PDFS_TTL_HORAS después de generado; cada PDFS_BARRIDO_CADA
+#     escrituras se borran los vencidos.
+
+PDFS_CARPETA = os.getenv("PDFS_CARPETA", "denuncias_generadas")
+PDFS_GZIP = os.getenv("PDFS_GZIP", "0") == "1"
+PDFS_TTL = int(float(os.getenv("PDFS_TTL_HORAS", "24")) * 3600)
+PDFS_BARRIDO_CADA = 20  # escrituras entre cada barrido de vencidos
+
+PATRON_ID = re.compile(r"^[0-9a-f]{32}$")  # evita rutas fuera de la carpeta
+
+os.makedirs(PDFS_CARPETA, exist_ok=True)
+
+_lock = threading.Lock()
+_escrituras_desde_barrido = 0
+_estadisticas = {
+    "generados": 0,
+    "bytes_pdf": 0,
+    "bytes_en_disco": 0,
+    "descargas": 0,
+    "descargas_gzip": 0,
+    "no_encontrados": 0,
+    "vencidos_eliminados": 0,
+}
+
+
+def ruta_pdf(pdf_id, comprimido=PDFS_GZIP):
+    return os.path.join(PDFS_CARPETA, f"{pdf_id}.pdf.gz" if comprimido else f"{pdf_id}.pdf")
+
+
+def guardar_pdf(contenido):
+    """Guarda los bytes del PDF y devuelve su id."""
+    global _escrituras_desde_barrido
+    pdf_id = uuid.uuid4().hex
+    datos = gzip.compress(contenido, compresslevel=6) if PDFS_GZIP else contenido
+    ruta = ruta_pdf(pdf_id)
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, "wb") as f:
+        f.write(datos)
+    os.replace(temporal, ruta)
+
+    with _lock:
+        _estadisticas["generados"] += 1
+        _estadisticas["bytes_pdf"] += len(contenido)
+        _estadisticas["bytes_en_disco"] += len(datos)
+        _escrituras_desde_barrido += 1
+        barrer = _escrituras_desde_barrido >= PDFS_BARRIDO_CADA
+        if barrer:
+            _escrituras_desde_barrido = 0
+    if barrer:
+        limpiar_vencidos()
+    return pdf_id
+
+
+def abrir_pdf(pdf_id, acepta_gzip=False):
+    """
+    (archivo, comprimido) para enviar el PDF, o None si no existe o ya venció.
+    Si está comprimido y el cliente no acepta gzip, se descomprime al leer.
+    """
+    if not isinstance(pdf_id, str) or not PATRON_ID.match(pdf_id):
+        return None
+    for comprimido in (PDFS_GZIP, not PDFS_GZIP):  # también los guardados con la otra configuración
+        ruta = ruta_pdf(pdf_id, comprimido)
+        try:
+            if time.time() - os.path.getmtime(ruta) > PDFS_TTL:
+                _eliminar(ruta)
+                break
+            if comprimido and not acepta_gzip:
+                archivo, comprimido = gzip.open(ruta, "rb"), False
+            else:
+                archivo = open(ruta, "rb")
+        except FileNotFoundError:
+            continue
+        with _lock:
+            _estadisticas["descargas"] += 1
+            if comprimido:
+                _estadisticas["descargas_gzip"] += 1
+        return archivo, comprimido
+    _contar("no_encontrados")
+    return None
+
+
+def eliminar_pdf(pdf_id):
+    if isinstance(pdf_id, str) and PATRON_ID.match(pdf_id):
+        for comprimido in (True, False):
+            try:
+                os.remove(ruta_pdf(pdf_id, comprimido))
+            except FileNotFoundError:
+                pass
+
+
+def limpiar_vencidos():
+    """Borra los PDFs generados hace más de PDFS_TTL segundos."""
+    limite = time.time() - PDFS_TTL
+    try:
+        entradas = list(os.scandir(PDFS_CARPETA))
+    except FileNotFoundError:
+        return
+    for entrada in entradas:
+        try:
+            if entrada.name.endswith((".pdf", ".pdf.gz")) and entrada.stat().st_mtime < limite:
+                _eliminar(entrada.path)
+        except FileNotFoundError:
+            pass  # otro worker lo borró primero
+
+
+def estadisticas_pdfs():
+    with _lock:
+        stats = dict(_estadisticas)
+    stats["gzip"] = PDFS_GZIP
+    stats["ttl_horas"] = round(PDFS_TTL / 3600, 2)
+    return stats
+
+
+def _eliminar(ruta):
+    try:
+        os.remove(ruta)
+        _contar("vencidos_eliminados")
+    except FileNotFoundError:
+        pass
+
+
+def _contar(campo):
+    with _lock:
+        _estadisticas[campo] += 1
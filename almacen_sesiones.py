@@ -0,0 +1,380 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+import msgspec
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# ----------------------------------------------------------------------
+#              SESIONES COMPACTAS EN UN ALMACÉN INTERCAMBIABLE
+# ----------------------------------------------------------------------
+# Flask-Session en modo "filesystem" volvía a picklear la sesión completa
+# (todo el historial y los datos de la denuncia) en cada petición, nunca
+# borraba los archivos viejos y no servía entre workers de distintas máquinas.
+#
+# Aquí cada clave de la sesión se guarda por separado, serializada con msgpack
+# (msgspec), y al terminar la petición solo se escriben las claves cuyo valor
+# cambió. Las listas (el historial) se guardan un elemento por fila: un turno
+# nuevo escribe dos mensajes, no el historial entero. Los almacenes:
+#   - "sqlite"  (por defecto): un archivo SQLite en modo WAL, compartido por
+#                los workers de la misma máquina;
+#   - "redis"   : un hash por sesión (SESIONES_REDIS_URL), compartido entre
+#                máquinas; Redis vence las sesiones por sí mismo;
+#   - "memoria" : diccionario del proceso, sustituto local de Redis para
+#                desarrollo y pruebas;
+#   - "filesystem": el Flask-Session anterior, por si hay que volver atrás.
+# Las sesiones vencen tras SESIONES_TTL sin uso; un hilo las borra cada
+# SESIONES_LIMPIEZA segundos.
+
+SESIONES_BACKEND = os.getenv("SESIONES_BACKEND", "sqlite")  # sqlite | redis | memoria | filesystem
+SESIONES_SQLITE = os.getenv("SESIONES_SQLITE", "sesiones.sqlite3")
+SESIONES_REDIS_URL = os.getenv("SESIONES_REDIS_URL", "redis://localhost:6379/0")
+SESIONES_TTL = int(os.getenv("SESIONES_TTL", str(7 * 24 * 3600)))  # segundos sin uso
+SESIONES_LIMPIEZA = int(os.getenv("SESIONES_LIMPIEZA", "600"))  # segundos entre limpiezas
+SESIONES_RENOVAR = 60  # el vencimiento se renueva a lo más una vez por minuto si no hubo cambios
+
+_codificador = msgspec.msgpack.Encoder()
+_decodificador = msgspec.msgpack.Decoder()
+SUFIJO_LISTA = "[]"  # fila con la longitud de una lista; sus elementos van en "clave[i]"
+
+
+def _sin_conjuntos(valor):
+    """Conjuntos -> listas ordenadas: msgpack los escribe en orden de hash, que cambia en cada proceso."""
+    if isinstance(valor, (set, frozenset)):
+        try:
+            return sorted(_sin_conjuntos(v) for v in valor)
+        except TypeError:  # tipos mezclados
+            return sorted((_sin_conjuntos(v) for v in valor), key=repr)
+    if isinstance(valor, dict):
+        return {k: _sin_conjuntos(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_sin_conjuntos(v) for v in valor]
+    return valor
+
+
+def codificar(datos):
+    """
+    {fila: bytes} de los valores de la sesión (cada lista, un elemento por fila).
+    Los conjuntos se guardan como listas ordenadas, así el mismo valor siempre da
+    los mismos bytes y no se reescribe en cada petición.
+    """
+    filas = {}
+    for clave, valor in datos.items():
+        valor = _sin_conjuntos(valor)
+        if isinstance(valor, list):
+            filas[clave + SUFIJO_LISTA] = _codificador.encode(len(valor))
+            for i, elemento in enumerate(valor):
+                filas[f"{clave}[{i}]"] = _codificador.encode(elemento)
+        else:
+            filas[clave] = _codificador.encode(valor)
+    return filas
+
+
+def decodificar(filas):
+    """Inverso de codificar()."""
+    datos = {}
+    for fila, valor in filas.items():
+        if fila.endswith(SUFIJO_LISTA):
+            clave = fila[:-len(SUFIJO_LISTA)]
+            datos[clave] = [_decodificador.decode(filas[f"{clave}[{i}]"])
+                            for i in range(_decodificador.decode(valor))]
+        elif not fila.endswith("]"):
+            datos[fila] = _decodificador.decode(valor)
+    return datos
+
+
+class Sesion(CallbackDict, SessionMixin):
+    """Sesión con id propio (`sid`) y las filas codificadas tal como se leyeron del almacén."""
+
+    def __init__(self, sid, datos=None, codificados=None, expira=None, nueva=True):
+        def al_modificar(_):
+            self.modified = True
+
+        super().__init__(datos or {}, al_modificar)
+        self.sid = sid
+        self.new = nueva
+        self.modified = False
+        self.codificados = codificados or {}  # fila -> bytes leídos (para detectar cambios)
+        self.expira = expira
+
+
+class AlmacenSQLite:
+    """Una fila por (sesión, fila de la sesión); WAL permite leer mientras otro worker escribe."""
+
+    def __init__(self, ruta=SESIONES_SQLITE):
+        self.ruta = ruta
+        self._local = threading.local()
+        conexion = self._conexion()
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS sesiones (sid TEXT PRIMARY KEY, expira REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS sesiones_expira ON sesiones (expira);
+            CREATE TABLE IF NOT EXISTS sesion_claves (
+                sid TEXT NOT NULL, clave TEXT NOT NULL, valor BLOB NOT NULL,
+                PRIMARY KEY (sid, clave)
+            ) WITHOUT ROWID;
+        """)
+
+    def _conexion(self):
+        # Una conexión por hilo y por proceso (no se comparten tras un fork)
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None or self._local.pid != os.getpid():
+            conexion = sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion, self._local.pid = conexion, os.getpid()
+        return conexion
+
+    def cargar(self, sid):
+        """(expira, {clave: bytes}) o None si no existe o ya venció."""
+        conexion = self._conexion()
+        fila = conexion.execute("SELECT expira FROM sesiones WHERE sid = ?", (sid,)).fetchone()
+        if fila is None or fila[0] < time.time():
+            return None
+        valores = conexion.execute("SELECT clave, valor FROM sesion_claves WHERE sid = ?", (sid,))
+        return fila[0], dict(valores)
+
+    def guardar(self, sid, cambios, borrados, expira):
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            conexion.execute("INSERT INTO sesiones (sid, expira) VALUES (?, ?) "
+                             "ON CONFLICT (sid) DO UPDATE SET expira = excluded.expira", (sid, expira))
+            if cambios:
+                conexion.executemany("INSERT OR REPLACE INTO sesion_claves (sid, clave, valor) VALUES (?, ?, ?)",
+                                     [(sid, clave, valor) for clave, valor in cambios.items()])
+            if borrados:
+                conexion.executemany("DELETE FROM sesion_claves WHERE sid = ? AND clave = ?",
+                                     [(sid, clave) for clave in borrados])
+
+    def eliminar(self, sid):
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            conexion.execute("DELETE FROM sesion_claves WHERE sid = ?", (sid,))
+            conexion.execute("DELETE FROM sesiones WHERE sid = ?", (sid,))
+
+    def limpiar_vencidas(self):
+        conexion = self._conexion()
+        ahora = time.time()
+        with conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            conexion.execute("DELETE FROM sesion_claves WHERE sid IN "
+                             "(SELECT sid FROM sesiones WHERE expira < ?)", (ahora,))
+            return conexion.execute("DELETE FROM sesiones WHERE expira < ?", (ahora,)).rowcount
+
+
+class AlmacenRedis:
+    """Un hash de Redis por sesión; el TTL lo aplica Redis."""
+
+    def __init__(self, url=SESIONES_REDIS_URL, cliente=None):
+        if cliente is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("SESIONES_BACKEND=redis requiere el paquete redis "
+                                   "(pip install -r requirements.txt).") from e
+
+            cliente = redis.Redis.from_url(url)
+        self.cliente = cliente
+
+    @staticmethod
+    def _llave(sid):
+        return f"sesion:{sid}"
+
+    def cargar(self, sid):
+        llave = self._llave(sid)
+        with self.cliente.pipeline() as pipe:
+            valores, ttl = pipe.hgetall(llave).ttl(llave).execute()
+        if not valores:
+            return None
+        return time.time() + max(ttl, 0), {clave.decode("utf-8"): valor for clave, valor in valores.items()}
+
+    def guardar(self, sid, cambios, borrados, expira):
+        llave = self._llave(sid)
+        with self.cliente.pipeline() as pipe:
+            if cambios:
+                pipe.hset(llave, mapping=cambios)
+            if borrados:
+                pipe.hdel(llave, *borrados)
+            pipe.expireat(llave, int(expira))
+            pipe.execute()
+
+    def eliminar(self, sid):
+        self.cliente.delete(self._llave(sid))
+
+    def limpiar_vencidas(self):
+        return 0
+
+
+class AlmacenMemoria:
+    """Sustituto local de Redis: mismo contrato, en un diccionario del proceso."""
+
+    def __init__(self):
+        self._datos = {}  # sid -> (expira, {clave: bytes})
+        self._lock = threading.Lock()
+
+    def cargar(self, sid):
+        with self._lock:
+            entrada = self._datos.get(sid)
+            if entrada is None or entrada[0] < time.time():
+                return None
+            return entrada[0], dict(entrada[1])
+
+    def guardar(self, sid, cambios, borrados, expira):
+        with self._lock:
+            _, valores = self._datos.get(sid, (expira, {}))
+            valores.update(cambios)
+            for clave in borrados:
+                valores.pop(clave, None)
+            self._datos[sid] = (expira, valores)
+
+    def eliminar(self, sid):
+        with self._lock:
+            self._datos.pop(sid, None)
+
+    def limpiar_vencidas(self):
+        ahora = time.time()
+        with self._lock:
+            vencidas = [sid for sid, (expira, _) in self._datos.items() if expira < ahora]
+            for sid in vencidas:
+                del self._datos[sid]
+        return len(vencidas)
+
+
+class InterfazSesiones(SessionInterface):
+    """SessionInterface de Flask sobre cualquiera de los almacenes anteriores."""
+
+    def __init__(self, almacen, ttl=SESIONES_TTL):
+        self.almacen = almacen
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._limpieza_pid = None
+        self.estadisticas = {"lecturas": 0, "escrituras": 0, "claves_escritas": 0,
+                             "bytes_escritos": 0, "sin_cambios": 0, "vencidas_eliminadas": 0}
+
+    def open_session(self, app, request):
+        self._arrancar_limpieza()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            try:
+                guardada = self.almacen.cargar(sid)
+            except Exception as e:
+                print(f"⚠️ No se pudo leer la sesión: {str(e)}")
+                guardada = None
+            self._contar("lecturas")
+            if guardada is not None:
+                expira, codificados = guardada
+                datos = decodificar(codificados)
+                return Sesion(sid, datos, codificados, expira, nueva=False)
+        return Sesion(secrets.token_urlsafe(32))
+
+    def save_session(self, app, session, response):
+        nombre = self.get_cookie_name(app)
+        dominio, ruta = self.get_cookie_domain(app), self.get_cookie_path(app)
+        self.guardar_datos(session)
+        if not session:
+            # Sesión vacía (por ejemplo tras session.clear()): se borra también del navegador
+            if not session.new:
+                response.delete_cookie(nombre, domain=dominio, path=ruta)
+            return
+
+        if session.new or self.should_set_cookie(app, session):
+            response.set_cookie(nombre, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app), domain=dominio, path=ruta,
+                                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+            session.new = False
+
+    def guardar_datos(self, session):
+        """
+        Guarda la sesión en el almacén sin tocar la cookie: para cuando la respuesta
+        ya salió, como al final de un stream SSE (la cookie se envió con los encabezados).
+        """
+        if not session:
+            # Sesión vacía (por ejemplo tras session.clear()): se borra del almacén
+            if not session.new:
+                self.almacen.eliminar(session.sid)
+            return
+
+        # Solo se escriben las filas cuyo valor codificado cambió (también detecta
+        # listas modificadas en su lugar, que CallbackDict no ve)
+        codificados = codificar(session)
+        cambios = {clave: valor for clave, valor in codificados.items()
+                   if session.codificados.get(clave) != valor}
+        borrados = set(session.codificados) - set(codificados)
+        ahora = time.time()
+        renovar = session.expira is None or ahora + self.ttl - session.expira > SESIONES_RENOVAR
+        if cambios or borrados or renovar:
+            session.expira = ahora + self.ttl
+            self.almacen.guardar(session.sid, cambios, borrados, session.expira)
+            session.codificados = codificados
+            with self._lock:
+                self.estadisticas["escrituras"] += 1
+                self.estadisticas["claves_escritas"] += len(cambios)
+                self.estadisticas["bytes_escritos"] += sum(len(v) for v in cambios.values())
+        else:
+            self._contar("sin_cambios")
+
+    def _contar(self, contador, cantidad=1):
+        with self._lock:
+            self.estadisticas[contador] += cantidad
+
+    def _arrancar_limpieza(self):
+        if self._limpieza_pid == os.getpid():
+            return
+        with self._lock:
+            if self._limpieza_pid == os.getpid():
+                return
+            threading.Thread(target=self._limpiar, name="limpieza-sesiones", daemon=True).start()
+            self._limpieza_pid = os.getpid()
+
+    def _limpiar(self):
+        while True:
+            time.sleep(SESIONES_LIMPIEZA)
+            try:
+                eliminadas = self.almacen.limpiar_vencidas()
+                if eliminadas:
+                    self._contar("vencidas_eliminadas", eliminadas)
+                    print(f"🧹 {eliminadas} sesiones vencidas eliminadas.")
+            except Exception as e:
+                print(f"⚠️ Error al limpiar sesiones vencidas: {str(e)}")
+
+
+def configurar_sesiones(app, backend=SESIONES_BACKEND):
+    """Instala en `app` la interfaz de sesiones del backend elegido."""
+    if backend == "filesystem":
+        from flask_session import Session
+
+        app.config["SESSION_TYPE"] = "filesystem"
+        app.config["SESSION_FILE_DIR"] = "./flask_sessions"
+        Session(app)
+        return None
+
+    if backend == "redis":
+        almacen = AlmacenRedis()
+    elif backend == "memoria":
+        almacen = AlmacenMemoria()
+    else:
+        almacen = AlmacenSQLite()
+    app.session_interface = InterfazSesiones(almacen)
+    print(f"🗄️ Sesiones en {backend}.")
+    return app.session_interface
+
+
+def guardar_datos_sesion(app, session):
+    """Guarda la sesión cuando la respuesta ya se envió (ver InterfazSesiones.guardar_datos)."""
+    interfaz = app.session_interface
+    if isinstance(interfaz, InterfazSesiones):
+        interfaz.guardar_datos(session)
+    else:  # Flask-Session solo guarda junto con una respuesta; la cookie de esta se descarta
+        interfaz.save_session(app, session, app.response_class())
+
+
+def estadisticas_sesiones(app):
+    interfaz = app.session_interface
+    if not isinstance(interfaz, InterfazSesiones):
+        return {"backend": "filesystem"}
+    with interfaz._lock:
+        return dict(interfaz.estadisticas, backend=type(interfaz.almacen).__name__)
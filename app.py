@@ -1,44 +1,48 @@
-from flask import Flask, request, render_template, jsonify, session, send_file
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-from sentence_transformers import SentenceTransformer
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
-from formato_denuncia import procesar_denuncia
+from flask import Flask, request, render_template, jsonify, session, send_file, send_from_directory, g, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from funciones_auxiliares import *
-from flask_session import Session
+from cache_audio import AUDIO_OUTPUT_FOLDER, estadisticas_audio
+from paquete_audio import iniciar_precalentamiento
+from cola_tts import estado_trabajo, estadisticas_cola
+from cache_busqueda import invalidar_busquedas, estadisticas_busqueda
+from busqueda_hibrida import buscar_hibrido, cita
+from enrutador_rag import decidir, registrar_llamada, estadisticas_enrutador
+from almacen_sesiones import configurar_sesiones, estadisticas_sesiones, guardar_datos_sesion
+from almacen_pdfs import abrir_pdf, eliminar_pdf, estadisticas_pdfs
+from historial import (construir_contexto, programar_resumen, sincronizar_resumen, olvidar_resumen,
+                       estadisticas_historial)
+from cache_respuestas import (buscar_respuesta, guardar_respuesta, profundidad_conversacion,
+                              estadisticas_respuestas, registrar_omitido as registrar_omitido_cache)
+from cliente_llm import (LLMNoDisponible, completar, transmitir, transcribir, registrar_respaldo,
+                         estadisticas_llm)
 from prompt import SYSTEM_PROMPT
 from dotenv import load_dotenv
-from openai import OpenAI
 import threading
-import glob
+import json
+import io
+import time
 import markdown
 import os
 
 # Cargar variables de entorno
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
 db_lock = threading.Lock()  # Evita condiciones de carrera en multi-threading
+reload_lock = threading.Lock()  # Serializa las actualizaciones del índice
 db = None  # Global para almacenar FAISS
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY")
 
-# Carpeta donde están los documentos PDF
-PDF_FOLDER = "static/pdfs"
 AUDIO_FOLDER = "uploads/audio"
-INDEX_PATH = "faiss_index"  # Nombre del archivo donde guardaremos el índice
 os.makedirs(AUDIO_FOLDER, exist_ok=True)  # Crear la carpeta si no existe
 
-app.config["SESSION_TYPE"] = "filesystem"  # Tipo de sesión en archivos
 app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_FILE_DIR"] = "./flask_sessions"
-
-Session(app)  # Ahora se inicializa correctamente
+configurar_sesiones(app)  # SQLite por defecto; ver almacen_sesiones.py
 
-# Cargar modelo de embeddings
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+# Pre-renderizar en segundo plano el audio de los textos fijos (opcional)
+if os.getenv("AUDIO_PAQUETE_AL_INICIAR") == "1":
+    iniciar_precalentamiento()
 
 respuestas_proceder = ["proceder", "iniciar", "vamos", "sí", "si", "ok", "1"]
 respuestas_no = ["no", "2", "cancelar", "omitir"]
@@ -47,91 +51,87 @@ def get_db():
     global db
     with db_lock:  # Garantiza que solo un hilo cargue el índice
         if db is None:
+            from indice import load_or_create_index  # langchain y faiss se importan aquí, no al arrancar
+
             db = load_or_create_index()
         return db
 
-# Función para cargar y procesar documentos PDF
-def load_pdfs():
-    documents = []
-    if not os.path.exists(PDF_FOLDER):
-        print("❌ Carpeta de PDFs no encontrada.")
-        return []
-
-    for filename in os.listdir(PDF_FOLDER):
-        if filename.endswith(".pdf"):
-            pdf_path = os.path.join(PDF_FOLDER, filename)
-            loader = PyPDFLoader(pdf_path)
-            docs = loader.load()
-            if docs:
-                print(f"📄 Cargado {filename} con {len(docs)} páginas.")
-            documents.extend(docs)
-
-    return documents
-
-def load_or_create_index():
-    """Carga el índice FAISS desde disco si existe, de lo contrario lo crea."""
-    index_files = glob.glob(f"{INDEX_PATH}*")  # Verificar si hay archivos FAISS
-
-    if index_files:
-        print("🔄 Cargando índice FAISS desde disco...")
-        try:
-            db_instance = FAISS.load_local(INDEX_PATH, OpenAIEmbeddings(), allow_dangerous_deserialization=True)
-            if db_instance is not None:
-                return db_instance
-        except Exception as e:
-            print(f"⚠️ Error al cargar índice FAISS: {str(e)}. Se intentará regenerar.")
-
-    print("📌 Generando nuevo índice FAISS...")
-
-    #Cargar los PDFs antes de intentar dividirlos
-    pdf_documents = load_pdfs()
-    if not pdf_documents:
-        print("❌ No hay documentos PDF disponibles. No se generará FAISS.")
-        return None  # Evita errores si no hay documentos
-
-    # 📝 Dividir documentos solo si hay documentos PDF cargados
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    split_docs = text_splitter.split_documents(pdf_documents)
-
-    print(f"📌 Se generaron {len(split_docs)} fragmentos de texto para indexar.")
-
-    # 🔹 Crear FAISS solo si hay fragmentos de texto
-    if split_docs:
-        db_instance = FAISS.from_documents(split_docs, OpenAIEmbeddings())
-        db_instance.save_local(INDEX_PATH)
-        print(f"✅ Índice FAISS guardado en {INDEX_PATH}")
-        return db_instance
-    else:
-        print("❌ No se pudieron generar fragmentos de texto. Verifica los documentos PDF.")
-        return None
-
-db = load_or_create_index()
+# ----------------------------------------------------------------------
+# Índice, BM25 y modelo de embeddings: ya no se cargan al importar la app, así
+# "/" responde en cuanto arranca el proceso. Se cargan en un hilo de fondo
+# (o en el maestro de gunicorn, ver wsgi.py); una consulta que llegue antes
+# espera en get_db a que termine.
+# ----------------------------------------------------------------------
+_carga_pid = None  # los hilos no sobreviven a un fork
+_carga_lock = threading.Lock()
+
+def cargar_recursos():
+    """Carga lo que usa la búsqueda: índice FAISS, BM25, modelo de embeddings y reranker."""
+    from busqueda_hibrida import indice_bm25, obtener_reranker
+    from embeddings_locales import obtener_modelo
+    from indice import EMBEDDINGS_PROVIDER
+
+    inicio = time.perf_counter()
+    db_instance = get_db()
+    if db_instance is not None:
+        indice_bm25(db_instance)
+    if EMBEDDINGS_PROVIDER != "openai":
+        obtener_modelo()
+    obtener_reranker()
+    print(f"🔥 Índice y modelos cargados en {time.perf_counter() - inicio:.1f} s.")
+
+def cargar_recursos_en_segundo_plano():
+    """Lanza cargar_recursos en un hilo, una vez por proceso."""
+    global _carga_pid
+    with _carga_lock:
+        if _carga_pid == os.getpid():
+            return
+        _carga_pid = os.getpid()
+    threading.Thread(target=_cargar_recursos_seguro, name="carga-recursos", daemon=True).start()
+
+def _cargar_recursos_seguro():
+    try:
+        cargar_recursos()
+    except Exception as e:
+        print(f"❌ Error al cargar el índice y los modelos: {str(e)}")
 
 # Búsqueda en los documentos PDF
 def search_in_pdfs(query, top_k=3):
     db_instance = get_db()
     if db_instance is None:
         print("⚠️ No hay documentos indexados aún.")
-        return "⚠️ No hay documentos indexados aún."
+        return ""
 
     try:
-        retrieved_docs = db_instance.similarity_search(query, k=top_k)
-        retrieved_text = "\n".join([doc.page_content for doc in retrieved_docs])
+        retrieved_docs = buscar_hibrido(db_instance, query, top_k)
+        retrieved_text = "\n".join([f"[{cita(doc)}]\n{doc.page_content}" for doc in retrieved_docs])
         print(f"🔍 Búsqueda en FAISS: {retrieved_text[:500]}")
         return retrieved_text
     except Exception as e:
         print(f"❌ Error en búsqueda FAISS: {str(e)}")
-        return "⚠️ Error al buscar en los documentos."
+        return ""
 
 @app.route("/reload_index", methods=["POST"])
 def reload_index():
-    """Permite regenerar el índice FAISS manualmente sin reiniciar Flask"""
+    """Actualiza el índice FAISS de forma incremental sin reiniciar Flask"""
     global db
-    with db_lock:
-        print("♻️ Regenerando índice FAISS...")
-        db = load_or_create_index()
-    
-    return jsonify({"message": "Índice FAISS regenerado correctamente."})
+    # Solo una recarga a la vez; las búsquedas siguen usando el índice anterior mientras tanto
+    if not reload_lock.acquire(blocking=False):
+        return jsonify({"message": "Ya hay una actualización del índice en curso."}), 409
+    try:
+        print("♻️ Actualizando índice FAISS...")
+        with db_lock:
+            actual = db
+        from indice import actualizar_indice
+
+        nuevo, resumen = actualizar_indice(actual)  # Embebe fuera de db_lock
+        with db_lock:
+            db = nuevo
+        invalidar_busquedas()
+    finally:
+        reload_lock.release()
+
+    return jsonify({"message": "Índice FAISS actualizado correctamente.", "resumen": resumen})
 
 @app.route("/")
 def home():
@@ -148,6 +148,7 @@ def chat():
     try:
         data = request.json
         user_message = data.get("message", "").strip().lower()
+        g.voz = quiere_voz(data.get("voice"))  # Sin voz no se genera ningún audio
         
         if not user_message:
             return jsonify({"response": "No recibí ningún mensaje. 😕"})
@@ -194,17 +195,19 @@ def chat():
                 """
 
                 messages = session["messages"]
-                messages.append({"role": "user", "content": user_message})
+                messages.append({"role": "user", "content": user_message, "tipo": "formulario"})
+                session["messages"] = messages
 
-                completion_exp = client.chat.completions.create(
+                completion_exp = completar(
                     model="gpt-4-turbo",
-                    messages=[{"role": "system", "content": explanation_prompt}] + messages,
+                    messages=contexto_llm(explanation_prompt, incluir_formulario=True),
                     max_tokens=500
                 )
                 explanation_response = (completion_exp.choices[0].message.content 
                                         if completion_exp.choices else "No se pudo obtener una respuesta clara.")
 
                 # Actualizamos 'messages'
+                messages.append({"role": "assistant", "content": explanation_response, "tipo": "formulario"})
                 session["messages"] = messages
 
                 # Devolvemos la explicación; seguimos en el MISMO dato
@@ -218,6 +221,10 @@ def chat():
                 if "datos_faltantes" in session and session["datos_faltantes"]:
                     siguiente_dato = session["datos_faltantes"][0]
                     # Simplemente le dices al usuario: "ok, continuemos con ... "
+                    texto = (f"Perfecto, continuemos con la denuncia. El siguiente dato que necesito es {siguiente_dato}. "
+                             "Por favor, ingrésalo, o escribe 'omitir' si no deseas proporcionarlo, "
+                             "o 'cancelar' para detener el proceso.")
+                    audio_response_path = text_to_speech(texto)
                     return jsonify({
                         "response": markdown.markdown(
                             f"Perfecto, continuemos con la denuncia. "
@@ -228,11 +235,11 @@ def chat():
                         "audio_response": audio_response_path
                     })
                 else:
+                    texto = ("No hay más datos pendientes. Parece que la denuncia está casi completa. "
+                             "Si deseas revisarla o generar el PDF, avísame.")
+                    audio_response_path = text_to_speech(texto)
                     return jsonify({
-                        "response": (
-                            "No hay más datos pendientes. Parece que la denuncia está casi completa. "
-                            "Si deseas revisarla o generar el PDF, avísame."
-                        ),
+                        "response": texto,
                         "audio_response": audio_response_path
                     })
                     
@@ -250,7 +257,7 @@ def chat():
                 # Si el usuario no ha ingresado nada aún, se le muestran las opciones
                 if not session.get("pidiendo_medidas_cautelares", False):
                     session["pidiendo_medidas_cautelares"] = True
-                    texto = f"Estas son las medidas cautelares disponibles: {opciones_str}. Para seleccionar, escribe los números separados por comas (ej: '1,3'). Escribe 'otra' para agregar una medida no listada. Cuando termines, escribe 'terminar'."                    
+                    texto = texto_menu_medidas_cautelares()
                     audio_response_path = text_to_speech(texto)
                     return jsonify({
                         "response": (
@@ -290,7 +297,7 @@ def chat():
 
                         # Ahora activar la petición de medidas de protección
                         session["pidiendo_medidas_proteccion"] = True  # <--- NUEVA VARIABLE PARA CONTROLAR EL FLUJO
-                        texto = f"Se han registrado tus medidas cautelares. Ahora, selecciona las **medidas de protección** que solicitas para proteger tus derechos. Estas son las medidas de protección disponibles: {opciones_str}. Para seleccionar, escribe los números separados por comas (ej: '1,3'). Escribe 'otra' para agregar una medida no listada. Cuando termines, escribe 'terminar'."                    
+                        texto = texto_cautelares_registradas()
                         audio_response_path = text_to_speech(texto)
                         return jsonify({
                             "response": markdown.markdown(
@@ -311,15 +318,17 @@ def chat():
                             resultado = procesar_denuncia(datos_usuario)
                             if isinstance(resultado, dict) and "error" in resultado:
                                 session["datos_faltantes"] = resultado["faltantes"]
+                                texto = f"⚠️ Faltan datos: {', '.join(resultado['faltantes'])}. Por favor, ingrésalos para continuar."
+                                audio_response_path = text_to_speech(texto)
                                 return jsonify({
                                     "response": (f"⚠️ Faltan datos: {', '.join(resultado['faltantes'])}. "
                                                 "Por favor, ingrésalos para continuar."),
                                     "audio_response": audio_response_path
                                 })
-                            session["pdf_path"] = resultado
+                            session["pdf_id"] = resultado
                             session.pop("datos_faltantes", None)
                             session.pop("datos_usuario", None)
-                            texto = "La denuncia ha sido generada correctamente. Puedes descargarla en el link que te genere. Este es un formato de denuncia con los datos proporcionados. Puedes revisarlo y editarlo si lo deseas. ¡Estoy aquí para ayudarte!"
+                            texto = TEXTO_DENUNCIA_GENERADA
                             audio_response_path = text_to_speech(texto)
                             return jsonify({
                                 "response": (
@@ -336,7 +345,7 @@ def chat():
 
                 # Manejo de 'otra'
                 if user_message == "otra":
-                    texto = "Escribe la medida cautelar adicional que deseas. Cuando termines, escribe 'terminar'."
+                    texto = TEXTO_OTRA_CAUTELAR
                     audio_response_path = text_to_speech(texto)
                     return jsonify({
                         "response": (
@@ -388,7 +397,7 @@ def chat():
 
                 if not session.get("pidiendo_medidas_proteccion", False):
                     session["pidiendo_medidas_proteccion"] = True
-                    texto = f"Estas son las medidas de protección disponibles: {opciones_str}.Para seleccionar, escribe los números separados por comas (ej: '1,3').Escribe 'otra' para agregar una medida no listada. Cuando termines, escribe 'terminar'."
+                    texto = texto_menu_medidas_proteccion()
                     audio_response_path = text_to_speech(texto)
                     return jsonify({
                         "response": (
@@ -423,7 +432,7 @@ def chat():
                     # Verificar si aún hay datos faltantes
                     if session["datos_faltantes"]:
                         siguiente_dato = session["datos_faltantes"][0]
-                        texto = f"✅ Se han registrado tus medidas de protección.Ahora necesito **{siguiente_dato}**.¿Qué tipo de prueba deseas ofrecer? Elige una opción: 1️.Confesional,2️.Testimonial,3️.Documental Pública o Privada,4️.Presuncional Legal y Humana,5️.Instrumental de Actuaciones,Escribe el número de la opción que deseas elegir, o escribe 'omitir' si no deseas proporcionarlo, o 'cancelar' para salir."
+                        texto = texto_proteccion_registrada(siguiente_dato)
                         audio_response_path = text_to_speech(texto)
                         return jsonify({
                             "response": (
@@ -446,15 +455,17 @@ def chat():
                             resultado = procesar_denuncia(datos_usuario)
                             if isinstance(resultado, dict) and "error" in resultado:
                                 session["datos_faltantes"] = resultado["faltantes"]
+                                texto = f"⚠️ Faltan datos: {', '.join(resultado['faltantes'])}. Por favor, ingrésalos para continuar."
+                                audio_response_path = text_to_speech(texto)
                                 return jsonify({
                                     "response": (f"⚠️ Faltan datos: {', '.join(resultado['faltantes'])}. "
                                                 "Por favor, ingrésalos para continuar."),
                                     "audio_response": audio_response_path
                                 })
-                            session["pdf_path"] = resultado
+                            session["pdf_id"] = resultado
                             session.pop("datos_faltantes", None)
                             session.pop("datos_usuario", None)
-                            texto = "La denuncia ha sido generada correctamente. Puedes descargarla en el link que te genere. Este es un formato de denuncia con los datos proporcionados. Puedes revisarlo y editarlo si lo deseas. ¡Estoy aquí para ayudarte!"
+                            texto = TEXTO_DENUNCIA_GENERADA
                             audio_response_path = text_to_speech(texto)
                             return jsonify({
                                 "response": (
@@ -471,7 +482,7 @@ def chat():
 
                 # Manejo de 'otra'
                 if user_message == "otra":
-                    texto = "Escribe la medida de protección adicional que deseas. Cuando termines, escribe 'terminar'."
+                    texto = TEXTO_OTRA_PROTECCION
                     audio_response_path = text_to_speech(texto)
                     return jsonify({
                         "response": (
@@ -515,7 +526,7 @@ def chat():
             if dato_actual == "tipo_prueba":
                 if "ha_preguntado_tipo_prueba" not in session:
                     session["ha_preguntado_tipo_prueba"] = True
-                    texto = "¿Qué tipo de prueba deseas ofrecer? Elige una opción: 1️.Confesional,2️.Testimonial, 3️.Documental Pública o Privada, 4️.Presuncional Legal y Humana, 5️.Instrumental de Actuaciones, Escribe el número de la opción que deseas elegir. puedes escribir para omitir o cancelar para terminar el proceso"
+                    texto = TEXTO_MENU_TIPO_PRUEBA
                     audio_response_path = text_to_speech(texto)
                     return jsonify({
                         "response": (
@@ -551,8 +562,10 @@ def chat():
                             "donde_funciones_notario", "fecha_intrumento_notarial", 
                             "prueba_confesional", "numeros_prueba"
                         ])
+                        texto = "Has seleccionado prueba confesional. ¿Quién desahoga la prueba?"
+                        audio_response_path = text_to_speech(texto)
                         return jsonify({
-                            "response": "Has seleccionado prueba confesional. ¿Quién desahoga la prueba?",
+                            "response": texto,
                             "audio_response": audio_response_path
                         })
 
@@ -562,8 +575,10 @@ def chat():
                             "donde_funciones_notario", "fecha_intrumento_notarial", 
                             "prueba_testimonial", "numeros_prueba"
                         ])
+                        texto = "Has seleccionado prueba testimonial. ¿Quién desahoga la prueba?"
+                        audio_response_path = text_to_speech(texto)
                         return jsonify({
-                            "response": "Has seleccionado prueba testimonial. ¿Quién desahoga la prueba?",
+                            "response": texto,
                             "audio_response": audio_response_path
                         })
 
@@ -572,8 +587,10 @@ def chat():
                             "documentos_oficiales", "folio", "fecha_folio", 
                             "autoridad_emite", "acto_documento", "documento_prueba", "numeros_prueba"
                         ])
+                        texto = "Has seleccionado prueba documental. ¿Cuál es el documento oficial que presentas?"
+                        audio_response_path = text_to_speech(texto)
                         return jsonify({
-                            "response": "Has seleccionado prueba documental. ¿Cuál es el documento oficial que presentas?",
+                            "response": texto,
                             "audio_response": audio_response_path
                         })
 
@@ -598,7 +615,7 @@ def chat():
                         # **💡 IMPORTANTE: Avanzar al siguiente campo**
                         if session["datos_faltantes"]:
                             siguiente_dato = session["datos_faltantes"][0]
-                            texto = f"✅ Se ha registrado tu prueba {datos_usuario['tipo_prueba']}. Ahora necesito **{siguiente_dato}**."
+                            texto = texto_prueba_registrada(datos_usuario['tipo_prueba'], siguiente_dato)
                             audio_response_path = text_to_speech(texto)
                             return jsonify({
                                 "response": markdown.markdown(f"✅ Se ha registrado tu prueba {datos_usuario['tipo_prueba']}. Ahora necesito **{siguiente_dato}**."),
@@ -611,10 +628,10 @@ def chat():
                                 return jsonify({
                                     "response": f"⚠️ Faltan datos: {', '.join(resultado['faltantes'])}. Por favor, ingrésalos para continuar.",
                                 })
-                            session["pdf_path"] = resultado
+                            session["pdf_id"] = resultado
                             session.pop("datos_faltantes", None)
                             session.pop("datos_usuario", None)
-                            texto = "La denuncia ha sido generada correctamente. Puedes descargarla en el link que te genere. Este es un formato de denuncia con los datos proporcionados. Puedes revisarlo y editarlo si lo deseas. ¡Estoy aquí para ayudarte!"
+                            texto = TEXTO_DENUNCIA_GENERADA
                             audio_response_path = text_to_speech(texto)
                             return jsonify({
                                 "response": "✅ La denuncia ha sido generada correctamente. Puedes descargarla aquí: /download_sue",
@@ -660,7 +677,7 @@ def chat():
                         siguiente_dato = session["datos_faltantes"][0]
                         desc = field_info.get(dato_actual, {}).get("descripcion", "Información no disponible.")
                         ejemp = field_info.get(dato_actual, {}).get("ejemplo", "Ejemplo no disponible.")
-                        texto = f"Se han registrado tus narraciones. Ahora necesitamos **{siguiente_dato}**, {desc}. un ejemplo de como llenarlo seria: {ejemp}. ¿Podrías proporcionarlo ahora?. Si no deseas darlo, escribe 'omitir', o 'cancelar'."
+                        texto = texto_narraciones_registradas(siguiente_dato)
                         audio_response_path = text_to_speech(texto)
                         return jsonify({
                             "response": markdown.markdown(
@@ -682,10 +699,10 @@ def chat():
                                     "response":markdown.markdown(f"⚠️ Faltan datos: {', '.join(resultado['faltantes'])}. "
                                                  "Por favor, ingrésalos para continuar.")
                                 })
-                            session["pdf_path"] = resultado
+                            session["pdf_id"] = resultado
                             session.pop("datos_faltantes", None)
                             session.pop("datos_usuario", None)
-                            texto = "La denuncia ha sido generada correctamente. Puedes descargarla en el link que te genere. Este es un formato de denuncia con los datos proporcionados. Puedes revisarlo y editarlo si lo deseas. ¡Estoy aquí para ayudarte!"
+                            texto = TEXTO_DENUNCIA_GENERADA
                             audio_response_path = text_to_speech(texto)
                             return jsonify({
                                 "response": markdown.markdown(
@@ -720,7 +737,7 @@ def chat():
                 - Explicación de faltas y ejemplo de mejora si no cumple
                 """
 
-                completion_llm = client.chat.completions.create(
+                completion_llm = completar(
                     model="gpt-4-turbo",
                     messages=[{"role": "system", "content": narraciones_prompt}],
                     temperature=0  # Para mayor precisión
@@ -732,7 +749,7 @@ def chat():
                 if "se ha registrado narraciones" in clean_ans:
                     datos_usuario["narraciones"].append(user_message.strip())
                     session["datos_usuario"] = datos_usuario
-                    texto = "Narración agregada. ¿Deseas **agregar** otro hecho o **terminar**?"
+                    texto = TEXTO_NARRACION_AGREGADA
                     audio_response_path = text_to_speech(texto)
                     return jsonify({
                         "response": markdown.markdown(
@@ -744,23 +761,24 @@ def chat():
                 else:
                     return jsonify({"response": bot_ans})
             # -------------------------------------------------------------------
-            # 2) Validación del dato ingresado con el LLM (código existente)
+            # 2) Validación local del dato (REGLAS_CAMPOS); el LLM solo valida texto libre
             # -------------------------------------------------------------------
-            validation_func = VALIDATION_RULES.get(dato_actual)
-            if validation_func:
-                if not validation_func(user_message):
-                    # ❌ Valor claramente inválido
-                    return jsonify({
-                        "response": markdown.markdown(
-                            f"⚠️ El valor **{user_message}** no es válido para **{dato_actual}** "
-                            f"según las reglas mínimas. Inténtalo de nuevo, "
-                            "escribe 'omitir' para dejarlo vacío, o 'cancelar' para salir."
-                        ),
-                        "audio_response": audio_response_path
-                    })
-            desc = field_info.get(dato_actual, {}).get("descripcion", "Información no disponible.")
-            ejemp = field_info.get(dato_actual, {}).get("ejemplo", "Ejemplo no disponible.")
-            full_prompt = f"""
+            estado, valor, motivo = validar_campo(dato_actual, user_message)
+            if estado == "invalido":
+                ejemp = field_info.get(dato_actual, {}).get("ejemplo", "")
+                texto = (f"⚠️ El valor **{user_message}** no es válido para **{dato_actual}**: {motivo}. "
+                         f"{ejemp} Inténtalo de nuevo, escribe 'omitir' para dejarlo vacío, "
+                         "o 'cancelar' para salir.")
+                audio_response_path = text_to_speech(texto)
+                return jsonify({
+                    "response": markdown.markdown(texto),
+                    "audio_response": audio_response_path
+                })
+
+            if estado == "llm":
+                desc = field_info.get(dato_actual, {}).get("descripcion", "Información no disponible.")
+                ejemp = field_info.get(dato_actual, {}).get("ejemplo", "Ejemplo no disponible.")
+                full_prompt = f"""
             {SYSTEM_PROMPT}
             ### Instrucciones para el LLM:
             1. El usuario está llenando un **formato de denuncia** y debe ingresar el siguiente dato: **{dato_actual}**.
@@ -795,81 +813,85 @@ def chat():
             """
 
 
-            messages = session["messages"]
-            messages.append({"role": "user", "content": user_message})
+                messages = session["messages"]
+                messages.append({"role": "user", "content": user_message, "tipo": "formulario"})
+                session["messages"] = messages
 
-            completion = client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=[{"role": "system", "content": full_prompt}] + messages,
-                max_tokens=500
-            )
-            bot_response = (completion.choices[0].message.content
-                            if completion.choices else "No se pudo obtener una respuesta clara.")
+                completion = completar(
+                    model="gpt-4-turbo",
+                    messages=contexto_llm(full_prompt, incluir_formulario=True),
+                    max_tokens=500
+                )
+                bot_response = (completion.choices[0].message.content
+                                if completion.choices else "No se pudo obtener una respuesta clara.")
 
-            # Persistimos la conversación
-            session["messages"] = messages
+                # Persistimos la conversación
+                messages.append({"role": "assistant", "content": bot_response, "tipo": "formulario"})
+                session["messages"] = messages
 
-            # ¿el LLM confirma que el dato es válido?
-            if any(frase in bot_response.lower() for frase in [
-                "dato registrado", "se ha registrado", "ha sido guardado",
-                "válido", "correcto", "registrado"]):   
-                datos_usuario[dato_actual] = user_message.strip()
-                session["datos_usuario"] = datos_usuario
-                session["datos_faltantes"] = datos_faltantes[1:]
+                # ¿el LLM confirma que el dato es válido?
+                if not any(frase in bot_response.lower() for frase in [
+                    "dato registrado", "se ha registrado", "ha sido guardado",
+                    "válido", "correcto", "registrado"]):
+                    # Si el LLM no confirma, devolvemos la respuesta para que el usuario corrija
+                    return jsonify({"response": bot_response})
+                valor = user_message.strip()
+
+            # Dato aceptado: se registra y se pide el siguiente
+            datos_usuario[dato_actual] = valor
+            session["datos_usuario"] = datos_usuario
+            session["datos_faltantes"] = datos_faltantes[1:]
+
+            if session["datos_faltantes"]:
+                siguiente_dato = session["datos_faltantes"][0]
+                desc = field_info.get(siguiente_dato, {}).get("descripcion", "Información no disponible.")
+                ejemp = field_info.get(siguiente_dato, {}).get("ejemplo", "Ejemplo no disponible.")
+                texto = texto_dato_registrado(dato_actual, siguiente_dato)
+                audio_response_path = text_to_speech(texto)
+                return jsonify({
+                    "response": markdown.markdown(
+                        f"✅ Se ha registrado **{dato_actual}**.\n\n"
+                        f"El siguiente dato es **{siguiente_dato}**, "
+                        f"que sirve {desc}.\n\n"
+                        f"{ejemp}\n\n"
+                        "¿Podrías proporcionarlo?"
+                    ),
+                    "audio_response": audio_response_path
+                })
+            else:
+                # Generar denuncia
+                try:
+                    resultado = procesar_denuncia(datos_usuario)
+                    
+                    if isinstance(resultado, dict) and "error" in resultado:
+                        session["datos_faltantes"] = resultado["faltantes"]
+                        texto = f"⚠️ Faltan datos: {', '.join(resultado['faltantes'])}. Por favor, ingrésalos para continuar."
+                        audio_response_path = text_to_speech(texto)
+                        return jsonify({
+                            "response": (f"⚠️ Faltan datos: {', '.join(resultado['faltantes'])}. "
+                                         "Por favor, ingrésalos para continuar."),
+                            "audio_response": audio_response_path
+                        })
 
-                if session["datos_faltantes"]:
-                    siguiente_dato = session["datos_faltantes"][0]
-                    desc = field_info.get(siguiente_dato, {}).get("descripcion", "Información no disponible.")
-                    ejemp = field_info.get(siguiente_dato, {}).get("ejemplo", "Ejemplo no disponible.")
-                    texto = f"se ha registrado **{dato_actual}**. El siguiente dato es **{siguiente_dato}**, que sirve {desc}. {ejemp},¿Podrías proporcionarlo?"
+                    session["pdf_id"] = resultado
+                    session.pop("datos_faltantes", None)
+                    session.pop("datos_usuario", None)
+                    texto = TEXTO_DENUNCIA_GENERADA
                     audio_response_path = text_to_speech(texto)
                     return jsonify({
-                        "response": markdown.markdown(
-                            f"✅ Se ha registrado **{dato_actual}**.\n\n"
-                            f"El siguiente dato es **{siguiente_dato}**, "
-                            f"que sirve {desc}.\n\n"
-                            f"{ejemp}\n\n"
-                            "¿Podrías proporcionarlo?"
+                        "response": (
+                            "✅ La denuncia ha sido generada correctamente. "
+                            "Puedes descargarla aquí: /download_sue\n\n"
+                            "Este es un formato de denuncia con los datos proporcionados. "
+                            "Puedes revisarlo y editarlo si lo deseas. "
+                            "¡Estoy aquí para ayudarte! 😊"
                         ),
                         "audio_response": audio_response_path
                     })
-                else:
-                    # Generar denuncia
-                    try:
-                        resultado = procesar_denuncia(datos_usuario)
-                        
-                        if isinstance(resultado, dict) and "error" in resultado:
-                            session["datos_faltantes"] = resultado["faltantes"]
-                            texto = f"⚠️ Faltan datos: {', '.join(resultado['faltantes'])}. Por favor, ingrésalos para continuar."
-                            audio_response_path = text_to_speech(texto)
-                            return jsonify({
-                                "response": (f"⚠️ Faltan datos: {', '.join(resultado['faltantes'])}. "
-                                             "Por favor, ingrésalos para continuar."),
-                                "audio_response": audio_response_path
-                            })
-
-                        session["pdf_path"] = resultado
-                        session.pop("datos_faltantes", None)
-                        session.pop("datos_usuario", None)
-                        texto = "La denuncia ha sido generada correctamente. Puedes descargarla en el link que te genere. Este es un formato de denuncia con los datos proporcionados. Puedes revisarlo y editarlo si lo deseas. ¡Estoy aquí para ayudarte!"
-                        audio_response_path = text_to_speech(texto)
-                        return jsonify({
-                            "response": (
-                                "✅ La denuncia ha sido generada correctamente. "
-                                "Puedes descargarla aquí: /download_sue\n\n"
-                                "Este es un formato de denuncia con los datos proporcionados. "
-                                "Puedes revisarlo y editarlo si lo deseas. "
-                                "¡Estoy aquí para ayudarte! 😊"
-                            ),
-                            "audio_response": audio_response_path
-                        })
-                    except Exception as e:
-                        return jsonify({
-                            "response": f"❌ Error al generar la denuncia: {str(e)}"
-                        }), 500
-
-            # Si el LLM no confirma, devolvemos la respuesta para que el usuario corrija
-            return jsonify({"response": bot_response})
+                except Exception as e:
+                    return jsonify({
+                        "response": f"❌ Error al generar la denuncia: {str(e)}"
+                    }), 500
 
         # -----------------------------------------------------------------------
         # 2) Si NO se está llenando datos, revisamos si el usuario quiere iniciar denuncia
@@ -882,7 +904,7 @@ def chat():
         user_message_clean = re.sub(r"[^\w\s]", "", user_message.lower()).strip()
         if user_message_clean in frases_activadoras:
             session["awaiting_decision"] = True
-            texto = "🔍 ¿Qué deseas hacer?. 1️.**📄 Iniciar el proceso de denuncia.**,2️.**🧠 Recibir orientación antes de denunciar.** Escribe '1' para iniciar la denuncia o '2' para orientación."
+            texto = TEXTO_MENU_DECISION
             audio_response_path = text_to_speech(texto)
             return jsonify({
                 "response": markdown.markdown(
@@ -903,7 +925,7 @@ def chat():
                 session["datos_usuario"] = {}
 
                 primer_dato = session["datos_faltantes"][0]
-                texto = f"Perfecto, iniciaremos la denuncia. A continuación te mostraré la lista de datos que necesitaremos y por qué son importantes: 1.Nombre completo: Para identificar formalmente a la persona que presenta la denuncia. 2.Teléfono Un medio de contacto para resolver dudas o enviar notificaciones. 3.Domicilio: Tu dirección oficial, necesaria en algunos trámites legales. 4.Correo Para envío de notificaciones y seguimiento digital. 5.Personas autorizadas: Si deseas que alguien más reciba notificaciones o te ayude en el proceso. 6.Fecha de los hechos: El día en que ocurrieron los hechos que denuncias. 7.Lugar de los hechos: Dónde sucedieron esos hechos. 8.Ciudad: Ubicación general para contextualizar lo ocurrido. 9.Persona denunciada: Nombre completo de la persona a quien diriges la denuncia. 10.Relación con la persona denunciada: Si es familiar, colega, etc. 11.Narración de los hechos: Descripción detallada de lo que ocurrió. 12.Afectación: Cómo te impactaron estos hechos. 13.Medidas cautelares: Acciones urgentes que solicitas para proteger tus derechos. 14.Protección: Medidas adicionales de protección que consideras necesarias.15.Pruebas: Testimonios, documentos u otras evidencias que respalden la denuncia. Te iré solicitando estos datos uno por uno. Puedes omitir un dato si no lo deseas proporcionar, o escribir cancelar para detener el proceso en cualquier momento. Para comenzar, por favor, indícame {primer_dato}."
+                texto = texto_inicio_denuncia(primer_dato)
                 audio_response_path = text_to_speech(texto)
                 respuesta = (
                         "Perfecto, iniciaremos la denuncia. A continuación te mostraré la lista "
@@ -943,17 +965,21 @@ def chat():
 
                 messages = session["messages"]
                 messages.append({"role": "user", "content": "¿Cómo puedo presentar una denuncia?"})
+                session["messages"] = messages
 
-                completion = client.chat.completions.create(
-                    model="gpt-4-turbo",
-                    messages=[{"role": "system", "content": SYSTEM_PROMPT}] + messages,
-                    max_tokens=500
-                )
-
-                bot_response = (completion.choices[0].message.content
-                                if completion.choices else "No se pudo obtener una respuesta clara.")
+                try:
+                    completion = completar(
+                        model="gpt-4-turbo",
+                        messages=contexto_llm(SYSTEM_PROMPT),
+                        max_tokens=500
+                    )
+                    bot_response = (completion.choices[0].message.content
+                                    if completion.choices else "No se pudo obtener una respuesta clara.")
+                except LLMNoDisponible:
+                    bot_response = respuesta_de_respaldo("", 0)
 
                 # Persistimos mensajes
+                messages.append({"role": "assistant", "content": bot_response})
                 session["messages"] = messages
                 texto = bot_response + "\n\n🔹 **¿Te puedo ayudar en algo más?**"
                 audio_response_path = text_to_speech(bot_response)
@@ -967,38 +993,33 @@ def chat():
         # 3) Chat general si no se ha iniciado o no se está en proceso de denuncia
         # -----------------------------------------------------------------------
         messages = session["messages"]
+        profundidad = profundidad_conversacion(messages)
+        bot_response = respuesta_en_cache(user_message, profundidad)
         messages.append({"role": "user", "content": user_message})
-
-        completion = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[{"role": "system", "content": SYSTEM_PROMPT}] + messages,
-            max_tokens=500
-        )
-        bot_response = (completion.choices[0].message.content 
-                        if completion.choices else "")
-
-        # Actualizar 'messages'
         session["messages"] = messages
 
-        # Manejo de respuestas vagas
-        vague_responses = ["no estoy seguro", "no tengo información", "no puedo responder"]
-        if any(vague in bot_response.lower() for vague in vague_responses):
-            retrieved_context = search_in_pdfs(user_message)
-            if retrieved_context:
-                full_prompt = f"""
-                {SYSTEM_PROMPT}
-                El usuario ha preguntado: "{user_message}"
-                No se encontró una respuesta clara, pero aquí hay información relevante:
-                {retrieved_context}
-                Responde de manera clara y útil utilizando esta información.
-                """
-                completion = client.chat.completions.create(
+        if bot_response is None:
+            inicio = time.perf_counter()
+            # Se decide antes de llamar al LLM si hace falta el contexto de los PDFs: una sola llamada
+            system_prompt, con_contexto = prompt_de_sistema(user_message)
+            try:
+                completion = completar(
                     model="gpt-4-turbo",
-                    messages=[{"role": "system", "content": full_prompt}] + messages,
+                    messages=contexto_llm(system_prompt),
                     max_tokens=500
                 )
                 bot_response = (completion.choices[0].message.content 
-                                if completion.choices else "No se pudo obtener una respuesta clara.")
+                                if completion.choices else "")
+                registrar_llamada(con_contexto, es_respuesta_vaga(bot_response))
+
+                guardar_respuesta(user_message, SYSTEM_PROMPT, profundidad, bot_response,
+                                  time.perf_counter() - inicio)
+            except LLMNoDisponible:
+                bot_response = respuesta_de_respaldo(user_message, profundidad)
+
+        # Actualizar 'messages'
+        messages.append({"role": "assistant", "content": bot_response})
+        session["messages"] = messages
 
         bot_response_html = markdown.markdown(bot_response)
         audio_response_path = text_to_speech(bot_response)
@@ -1006,9 +1027,209 @@ def chat():
             "response": bot_response_html,
             "audio_response": audio_response_path
         })
+    except LLMNoDisponible:
+        # Ramas del formulario que validan con el LLM: no hay respuesta guardada que sirva
+        registrar_respaldo()
+        return jsonify({"response": RESPUESTA_SIN_LLM_FORMULARIO}), 503
     except Exception as e:
         return jsonify({"response": f"Error: {str(e)}"}), 500
 
+# Respuestas del LLM que indican que le faltó el contexto de los documentos
+VAGUE_RESPONSES = ["no estoy seguro", "no tengo información", "no puedo responder"]
+
+# Cuando el LLM no está disponible (circuito abierto o plazo agotado, ver cliente_llm.py)
+RESPUESTA_SIN_LLM = ("Ahora mismo no puedo consultar al asistente. Intenta de nuevo en unos minutos. "
+                     "Si quieres presentar una denuncia, escribe **quiero denunciar**.")
+RESPUESTA_SIN_LLM_FORMULARIO = ("Ahora mismo no puedo revisar este dato con el asistente. Intenta de nuevo en "
+                                "unos minutos, escribe 'omitir' para dejarlo vacío o 'cancelar' para salir.")
+
+def respuesta_de_respaldo(user_message, profundidad):
+    """
+    Respuesta sin LLM: la de la caché semántica para una pregunta equivalente
+    (aunque se haya pedido omitirla) o RESPUESTA_SIN_LLM.
+    """
+    registrar_respaldo()
+    if user_message:
+        try:
+            guardada = buscar_respuesta(user_message, SYSTEM_PROMPT, profundidad)
+            if guardada is None and profundidad:
+                # Mejor la respuesta pensada para un primer turno que ninguna
+                guardada = buscar_respuesta(user_message, SYSTEM_PROMPT, 0)
+            if guardada is not None:
+                return guardada
+        except Exception as e:
+            print(f"⚠️ Error en la caché de respuestas: {str(e)}")
+    return RESPUESTA_SIN_LLM
+
+def contexto_llm(system_prompt, incluir_formulario=False, sesion=None):
+    """
+    Prompt de sistema + historial acotado por tokens (con resumen de lo anterior, ver historial.py).
+    `sesion` es la de Flask salvo que se indique otra (ver asgi.py).
+    """
+    sesion = session if sesion is None else sesion
+    messages = sesion.get("messages", [])
+    clave = getattr(sesion, "sid", None)
+    estado = sincronizar_resumen(clave, sesion.get("historial_resumen"), messages)
+    if estado != sesion.get("historial_resumen"):
+        sesion["historial_resumen"] = estado
+    programar_resumen(clave, messages, estado)
+    return construir_contexto(system_prompt, messages, estado, incluir_formulario)
+
+def respuesta_en_cache(user_message, profundidad, omitir_cache=None):
+    """Respuesta de la caché semántica, salvo que el cliente envíe X-Cache-Bypass: 1."""
+    if omitir_cache is None:
+        omitir_cache = request.headers.get("X-Cache-Bypass") == "1"
+    if omitir_cache:
+        registrar_omitido_cache()
+        return None
+    try:
+        return buscar_respuesta(user_message, SYSTEM_PROMPT, profundidad)
+    except Exception as e:
+        print(f"⚠️ Error en la caché de respuestas: {str(e)}")
+        return None
+
+def es_respuesta_vaga(bot_response):
+    return any(vague in bot_response.lower() for vague in VAGUE_RESPONSES)
+
+def prompt_con_contexto(user_message, retrieved_context):
+    return f"""
+                {SYSTEM_PROMPT}
+                El usuario ha preguntado: "{user_message}"
+                Estos fragmentos de los documentos jurídicos son relevantes para la pregunta:
+                {retrieved_context}
+                Responde de manera clara y útil utilizando esta información y cita el artículo cuando aplique.
+                """
+
+def prompt_de_sistema(user_message):
+    """(prompt, con_contexto): el enrutador decide si se agregan los fragmentos de los PDFs."""
+    try:
+        buscar, _ = decidir(get_db(), user_message)
+    except Exception as e:
+        print(f"⚠️ Error en el enrutador RAG: {str(e)}")
+        buscar = False
+    retrieved_context = search_in_pdfs(user_message) if buscar else ""
+    if retrieved_context:
+        return prompt_con_contexto(user_message, retrieved_context), True
+    return SYSTEM_PROMPT, False
+
+def rama_streaming(user_message, sesion=None):
+    """
+    Indica si el mensaje cae en una rama de /chat que espera al LLM y se puede transmitir:
+    'general' (chat general), 'orientacion' (opción 2 tras 'quiero denunciar') o None.
+    Replica las condiciones de chat() en el mismo orden.
+    """
+    sesion = session if sesion is None else sesion
+    if sesion.get("datos_faltantes"):
+        return None
+    user_message_clean = re.sub(r"[^\w\s]", "", user_message.lower()).strip()
+    if user_message_clean in ["quiero hacer una denuncia", "necesito denunciar", "quiero denunciar"]:
+        return None
+    if sesion.get("awaiting_decision"):
+        if user_message in respuestas_proceder or user_message == "1":
+            return None
+        if user_message in respuestas_no or user_message == "2":
+            return "orientacion"
+    return "general"
+
+def evento_sse(evento, data):
+    return f"event: {evento}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def transmitir_completion(messages):
+    """Genera los fragmentos de texto de una respuesta del LLM a medida que llegan."""
+    stream = transmitir(
+        model="gpt-4-turbo",
+        messages=messages,
+        max_tokens=500
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+@app.route("/chat_stream", methods=["POST"])
+def chat_stream():
+    """
+    Variante de /chat que transmite la respuesta del LLM como Server-Sent Events.
+    Eventos: 'delta' (texto nuevo), 'html' (markdown acumulado renderizado al cerrar
+    cada línea) y 'done' (respuesta final, igual a /chat).
+    Los flujos que no llaman al LLM (formulario, menús) se responden con el JSON de /chat.
+    """
+    data = request.json or {}
+    user_message = data.get("message", "").strip().lower()
+    rama = rama_streaming(user_message) if user_message else None
+    if rama is None:
+        return chat()
+
+    g.voz = quiere_voz(data.get("voice"))
+    if "messages" not in session:
+        session["messages"] = []
+
+    messages = session["messages"]
+    profundidad = profundidad_conversacion(messages)
+    if rama == "orientacion":
+        session["awaiting_orientation_response"] = True
+        session.pop("awaiting_decision", None)
+        messages.append({"role": "user", "content": "¿Cómo puedo presentar una denuncia?"})
+    else:
+        messages.append({"role": "user", "content": user_message})
+    session["messages"] = messages
+
+    if rama == "general":
+        en_cache = respuesta_en_cache(user_message, profundidad)
+        if en_cache is not None:
+            # Sin LLM no hay nada que transmitir: se responde con el mismo JSON que /chat
+            session["messages"] = messages + [{"role": "assistant", "content": en_cache}]
+            return jsonify({
+                "response": markdown.markdown(en_cache),
+                "audio_response": text_to_speech(en_cache)
+            })
+
+    def generar():
+        try:
+            inicio = time.perf_counter()
+            system_prompt, con_contexto = prompt_de_sistema(user_message) if rama == "general" else (SYSTEM_PROMPT, False)
+            partes, respaldo = [], False
+            try:
+                for delta in transmitir_completion(contexto_llm(system_prompt)):
+                    partes.append(delta)
+                    yield evento_sse("delta", {"text": delta})
+                    if "\n" in delta:
+                        yield evento_sse("html", {"html": markdown.markdown("".join(partes))})
+                bot_response = "".join(partes)
+            except LLMNoDisponible:
+                # Solo puede pasar antes del primer fragmento: la respuesta sale completa en 'done'
+                respaldo = True
+                bot_response = respuesta_de_respaldo(user_message if rama == "general" else "", profundidad)
+            if rama == "general" and not respaldo:
+                registrar_llamada(con_contexto, es_respuesta_vaga(bot_response))
+
+            if not bot_response:
+                bot_response = "No se pudo obtener una respuesta clara."
+            elif rama == "general" and not respaldo:
+                guardar_respuesta(user_message, SYSTEM_PROMPT, profundidad, bot_response,
+                                  time.perf_counter() - inicio)
+            if rama == "orientacion":
+                bot_response_html = markdown.markdown(bot_response + "\n\n🔹 **¿Te puedo ayudar en algo más?**")
+            else:
+                bot_response_html = markdown.markdown(bot_response)
+            audio_response_path = text_to_speech(bot_response)
+
+            # La sesión ya se guardó al enviar los encabezados: se guarda de nuevo con la respuesta
+            session["messages"] = messages + [{"role": "assistant", "content": bot_response}]
+            guardar_datos_sesion(app, session)
+
+            yield evento_sse("done", {
+                "response": bot_response_html,
+                "audio_response": audio_response_path,
+                "audio_job": g.pop("audio_job", None)
+            })
+        except Exception as e:
+            yield evento_sse("done", {"response": f"Error: {str(e)}"})
+
+    return Response(stream_with_context(generar()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Evita que un proxy acumule el stream
+    })
+
 @app.route("/audio", methods=["POST"])
 def audio():
     if "audio" not in request.files:
@@ -1018,6 +1239,8 @@ def audio():
     if audio_file.filename == "":
         return jsonify({"error": "El archivo no tiene nombre."}), 400
 
+    g.voz = quiere_voz(request.form.get("voice"))
+
     # Guardar el archivo en el servidor
     filename = secure_filename(audio_file.filename)
     file_path = os.path.join(AUDIO_FOLDER, filename)
@@ -1026,7 +1249,7 @@ def audio():
     try:
         # Transcribir el audio usando OpenAI Whisper
         with open(file_path, "rb") as f:
-            transcript = client.audio.transcriptions.create(model="whisper-1", file=f)
+            transcript = transcribir(f)
 
         transcription_text = transcript.text if hasattr(transcript, "text") else "[No se obtuvo transcripción]"
 
@@ -1050,28 +1273,90 @@ def audio():
     
 @app.route('/static/audio/<filename>')
 def serve_audio(filename):
-    return send_file(os.path.join("static/audio", filename))
+    # Los nombres son digests del contenido, así que el navegador puede cachearlos indefinidamente
+    return send_from_directory(AUDIO_OUTPUT_FOLDER, filename, max_age=31536000)
+
+@app.route("/audio_status/<job_id>", methods=["GET"])
+def audio_status(job_id):
+    """Estado de un audio generado en segundo plano. ?esperar=N hace long-polling hasta N segundos."""
+    if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+        return jsonify({"error": "Id de audio inválido."}), 400
+
+    esperar = min(request.args.get("esperar", 0, type=float), 10)
+    status = estado_trabajo(job_id, esperar)
+    return jsonify({
+        "status": status,
+        "audio_response": f"/{AUDIO_OUTPUT_FOLDER}/{job_id}.mp3" if status == "ready" else None
+    })
+
+@app.after_request
+def adjuntar_trabajo_audio(response):
+    """Agrega el id del audio pendiente a las respuestas JSON que traen 'audio_response'."""
+    audio_job = g.pop("audio_job", None)
+    if audio_job and response.is_json:
+        data = response.get_json(silent=True)
+        if isinstance(data, dict) and data.get("audio_response"):
+            data["audio_job"] = audio_job
+            response.set_data(app.json.dumps(data))
+    return response
+
+@app.route("/health", methods=["GET"])
+def health():
+    """El proceso responde (liveness)."""
+    return jsonify({"status": "ok"})
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Listo para atender (readiness): 503 mientras el índice FAISS no esté cargado."""
+    actual = db  # sin db_lock: no debe esperar a que termine una carga en curso
+    if actual is None:
+        return jsonify({"ready": False, "index": None}), 503
+    return jsonify({"ready": True, "index": {
+        "version": getattr(actual, "manifiesto", {}).get("version"),
+        "vectores": actual.index.ntotal
+    }})
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Contadores internos de rendimiento de este worker."""
+    from lote_denuncias import estadisticas_lote
+
+    return jsonify({
+        "audio_cache": estadisticas_audio(),
+        "tts_queue": estadisticas_cola(),
+        "rag_cache": estadisticas_busqueda(),
+        "response_cache": estadisticas_respuestas(),
+        "llm": estadisticas_llm(),
+        "rag_router": estadisticas_enrutador(),
+        "history": estadisticas_historial(),
+        "sessions": estadisticas_sesiones(app),
+        "pdfs": estadisticas_pdfs(),
+        "batch": estadisticas_lote()
+    })
 
 def chat_request(user_message):
     """Función para enviar una consulta al chatbot desde texto."""
     messages = session.get("messages", [])
+    profundidad = profundidad_conversacion(messages)
     messages.append({"role": "user", "content": user_message})
+    session["messages"] = messages
 
     try:
-        completion = client.chat.completions.create(
+        completion = completar(
             model="gpt-4-turbo",
-            messages=[{"role": "system", "content": SYSTEM_PROMPT}] + messages,
+            messages=contexto_llm(SYSTEM_PROMPT),
             max_tokens=500
         )
         bot_response = completion.choices[0].message.content if completion.choices else ""
-
-        messages.append({"role": "assistant", "content": bot_response})
-        session["messages"] = messages
-
-        return {"response": bot_response}
-
+    except LLMNoDisponible:
+        bot_response = respuesta_de_respaldo(user_message, profundidad)
     except Exception as e:
         return {"response": f"Error: {str(e)}"}
+
+    messages.append({"role": "assistant", "content": bot_response})
+    session["messages"] = messages
+
+    return {"response": bot_response}
     
 @app.route("/get_messages")
 def get_messages():
@@ -1082,8 +1367,10 @@ def get_messages():
 def confirm_clear():
     """
     Ahora, en lugar de solo remover 'messages', eliminamos TODO con session.clear().
-    Así reseteas la sesión por completo (datos faltantes, pdf_path, etc.).
+    Así reseteas la sesión por completo (datos faltantes, pdf_id, etc.) y se borra la denuncia generada.
     """
+    olvidar_resumen(getattr(session, "sid", None))
+    eliminar_pdf(session.get("pdf_id"))
     session.clear()
     return jsonify({"response": "Memoria y sesión limpiadas. 🧹"})
 
@@ -1094,32 +1381,48 @@ def download_form():
 
 @app.route("/download_sue", methods=["GET"])
 def download_sue():
-    pdf_path = session.get("pdf_path")
+    pdf_id = session.get("pdf_id")
 
-    if not pdf_path:
+    if not pdf_id:
         print("❌ No hay un PDF en la sesión.")  # Debugging
         return jsonify({"error": "No se ha generado ningún archivo en la sesión."}), 404
 
-    if not isinstance(pdf_path, str):
-        print(f"❌ Error: pdf_path en sesión no es un string: {pdf_path}")  # Debugging
-        return jsonify({"error": "Ruta de PDF inválida en la sesión."}), 500
-
-    pdf_path = os.path.abspath(pdf_path)  # Convertir a ruta absoluta
-
-    if not os.path.exists(pdf_path):
-        print(f"❌ Error: El archivo no existe en {pdf_path}")  # Debugging
-        return jsonify({"error": f"El archivo no existe en: {pdf_path}"}), 404
+    return enviar_pdf(pdf_id)
 
-    return send_file(pdf_path, as_attachment=True)
+@app.route("/denuncias/<pdf_id>", methods=["GET"])
+def descargar_denuncia(pdf_id):
+    """
+    PDFs de /generar_denuncia y /generar_denuncias_lote (el id va en la respuesta
+    o en cada línea del NDJSON). No pide token: el id es un uuid4 (122 bits al
+    azar) que solo conoce quien generó la denuncia y vence a las PDFS_TTL.
+    """
+    return enviar_pdf(pdf_id)
+
+def enviar_pdf(pdf_id):
+    acepta_gzip = "gzip" in request.accept_encodings
+    abierto = abrir_pdf(pdf_id, acepta_gzip)
+    if abierto is None:
+        print(f"❌ Error: El PDF {pdf_id} no existe o ya venció.")  # Debugging
+        return jsonify({"error": "La denuncia ya no está disponible; vuelve a generarla."}), 404
+
+    # Se envía directo desde el almacén, sin copiarlo a otra ruta
+    archivo, comprimido = abierto
+    response = send_file(archivo, mimetype="application/pdf", as_attachment=True,
+                         download_name="formato_denuncia.pdf", max_age=0)
+    if comprimido:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Cache-Control"] = "private, no-store"
+    response.vary.add("Accept-Encoding")
+    return response
 
 @app.route("/get_pdf_path", methods=["GET"])
 def get_pdf_path():
-    pdf_path = session.get("pdf_path")
+    pdf_id = session.get("pdf_id")
 
-    if not pdf_path:
+    if not pdf_id:
         return jsonify({"error": "No se ha generado ningún archivo en la sesión."}), 404
 
-    return jsonify({"pdf_path": pdf_path})  # ✅ Ahora devuelve un diccionario válido
+    return jsonify({"pdf_path": "/download_sue", "pdf_id": pdf_id})  # ✅ Ahora devuelve un diccionario válido
 
 @app.route("/generar_denuncia", methods=["POST"])
 def generar_denuncia():
@@ -1138,16 +1441,49 @@ def generar_denuncia():
         if isinstance(resultado, dict) and "error" in resultado:
             return jsonify(resultado), 400
 
-    
-        return jsonify({"message": "Denuncia generada con éxito."})
+        # El PDF queda en almacen_pdfs: se baja con /denuncias/<id> o, en esta sesión, con /download_sue
+        session["pdf_id"] = resultado
+        return jsonify({"message": "Denuncia generada con éxito.", "pdf_id": resultado,
+                        "url": f"/denuncias/{resultado}"})
 
     except Exception as e:
         return jsonify({"error": f"Error al generar la denuncia: {str(e)}"}), 500
 
-if __name__ == "__main__":
-    with db_lock:  # Garantiza que solo un hilo cargue el índice FAISS
-        if db is None and not app.debug:  
-            db = load_or_create_index()
+@app.route("/generar_denuncias_lote", methods=["POST"])
+def generar_denuncias_lote():
+    """
+    Lote de denuncias en JSONL o CSV (archivo "archivo" en multipart o el cuerpo
+    de la petición). Responde un ZIP con los PDFs (?salida=zip, por defecto) o
+    el estado de cada fila en NDJSON (?salida=ndjson). Ver lote_denuncias.py.
+    """
+    from lote_denuncias import (LOTE_MAX_FILAS, LOTE_TOKEN, autorizado, formato_de, imprimir_avance,
+                                leer_registros, ndjson_en_partes, procesar_lote, zip_en_partes)
+
+    if not LOTE_TOKEN:
+        return jsonify({"error": "La generación por lote está deshabilitada (falta LOTE_TOKEN)."}), 503
+    if not autorizado(request.headers.get("Authorization")):
+        return jsonify({"error": "No autorizado."}), 401
 
+    archivo = request.files.get("archivo")
+    if archivo is not None:
+        binario, formato = archivo.stream, formato_de(archivo.filename or "", archivo.content_type)
+    else:
+        binario, formato = request.stream, formato_de("", request.content_type)
+    formato = request.args.get("formato", formato)
+    salida = request.args.get("salida", "zip")
+    if formato not in ("jsonl", "csv") or salida not in ("zip", "ndjson"):
+        return jsonify({"error": "formato debe ser jsonl o csv y salida zip o ndjson."}), 400
+
+    texto = io.TextIOWrapper(binario, encoding="utf-8-sig", newline="")
+    resultados = procesar_lote(leer_registros(texto, formato), maximo=LOTE_MAX_FILAS, al_avanzar=imprimir_avance)
+    if salida == "ndjson":
+        partes = ndjson_en_partes(resultados, url_descarga=lambda pdf_id: f"/denuncias/{pdf_id}")
+        return Response(stream_with_context(partes), mimetype="application/x-ndjson")
+    return Response(stream_with_context(zip_en_partes(resultados)), mimetype="application/zip",
+                    headers={"Content-Disposition": "attachment; filename=denuncias.zip"})
+
+if __name__ == "__main__":
+    # Solo para desarrollo; en producción: gunicorn -c gunicorn.conf.py (ver wsgi.py)
+    cargar_recursos_en_segundo_plano()
     port = int(os.environ.get("PORT", 5000))  # Usa el puerto asignado por Render
     app.run(host="0.0.0.0", port=port, debug=False)
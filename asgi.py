@@ -0,0 +1,421 @@
+import contextlib
+import io
+import itertools
+import json
+import os
+import time
+
+import anyio
+import httpx
+import markdown
+from openai import AsyncOpenAI, AsyncStream, DefaultAsyncHttpxClient
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from uvicorn.middleware.wsgi import WSGIMiddleware
+from werkzeug.formparser import parse_form_data
+from werkzeug.utils import secure_filename
+
+import app as servidor
+from almacen_sesiones import InterfazSesiones
+from cache_respuestas import guardar_respuesta, profundidad_conversacion
+from cliente_llm import LLMNoDisponible, llamar_async
+from cola_tts import TTS_ASINCRONO
+from enrutador_rag import registrar_llamada
+from funciones_auxiliares import audio_de, quiere_voz
+from prompt import SYSTEM_PROMPT
+
+# ----------------------------------------------------------------------
+#              MODO ASÍNCRONO (ASGI) PARA LAS RAMAS QUE ESPERAN AL LLM
+# ----------------------------------------------------------------------
+# Con Flask cada conversación ocupa un hilo mientras espera a OpenAI (segundos
+# por respuesta), así que un worker atiende tantas conversaciones como hilos
+# tenga. Aquí las rutas que pasan casi todo el tiempo esperando E/S externa
+# (/chat general y de orientación, /chat_stream y /audio con Whisper) usan
+# AsyncOpenAI sobre un solo event loop: una conversación en espera es una
+# corrutina, no un hilo, y un proceso sostiene cientos a la vez.
+#   - Todo lo demás (formulario de denuncia, PDFs, lotes, /audio_status...) lo
+#     sigue atendiendo la app de Flask a través de un puente WSGI con
+#     ASGI_HILOS_WSGI hilos; también los mensajes de /chat que caen en el
+#     formulario (rama_streaming devuelve None).
+#   - La sesión es la misma de Flask (almacen_sesiones): se abre y se guarda
+#     con la misma interfaz, así que ambos modos comparten cookie y datos. Con
+#     SESIONES_BACKEND=filesystem todo se atiende con Flask.
+#   - El trabajo de CPU o bloqueante (enrutador RAG, FAISS, caché semántica,
+#     sesiones en SQLite) corre en el pool de hilos de anyio.
+#   - Plazos, reintentos, cobertura y circuito son los de cliente_llm.py, con el
+#     mismo estado que las rutas de Flask de este worker (llamar_async).
+#   - gTTS no tiene cliente asíncrono: el audio ya se sintetiza en la cola de
+#     cola_tts (TTS_ASINCRONO=1), y con TTS_ASINCRONO=0 se sintetiza en un hilo.
+#
+# Uso:  uvicorn asgi:aplicacion --host 0.0.0.0 --port $PORT
+
+ASGI_CONEXIONES_LLM = int(os.getenv("ASGI_CONEXIONES_LLM", "1000"))  # conexiones HTTP abiertas hacia OpenAI
+ASGI_CLIENTES_LLM = int(os.getenv("ASGI_CLIENTES_LLM", "8"))  # pools de conexiones entre los que se reparten
+ASGI_HILOS = int(os.getenv("ASGI_HILOS", "40"))  # hilos para el trabajo bloqueante
+ASGI_HILOS_WSGI = int(os.getenv("ASGI_HILOS_WSGI", "32"))  # hilos del puente hacia Flask
+
+flask_app = servidor.app
+flask_wsgi = WSGIMiddleware(flask_app, workers=ASGI_HILOS_WSGI)
+SESIONES_COMPARTIDAS = isinstance(flask_app.session_interface, InterfazSesiones)
+
+_clientes = None
+# Solo se modifican desde el event loop, así que no necesitan candado
+_estadisticas = {
+    "en_vuelo": 0,
+    "max_en_vuelo": 0,
+    "atendidas": 0,
+    "reenviadas_a_flask": 0,
+    "errores": 0,
+}
+
+
+def cliente_async():
+    """
+    AsyncOpenAI del event loop de este worker, por turnos entre ASGI_CLIENTES_LLM.
+    El pool de httpcore recorre todas sus conexiones cada vez que entra o sale una
+    petición (costo cuadrático): con cientos de conversaciones en un solo pool eso
+    se come el event loop, repartidas en varios pools chicos no.
+    """
+    global _clientes
+    if _clientes is None:
+        por_cliente = max(1, ASGI_CONEXIONES_LLM // ASGI_CLIENTES_LLM)
+        # Sin límite aparte para las ociosas: cerrarlas obliga a abrir otra conexión TLS en el siguiente turno
+        limites = httpx.Limits(max_connections=por_cliente, max_keepalive_connections=por_cliente)
+        _clientes = itertools.cycle([
+            AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0,  # reintenta cliente_llm
+                        http_client=DefaultAsyncHttpxClient(limits=limites))
+            for _ in range(ASGI_CLIENTES_LLM)
+        ])
+    return next(_clientes)
+
+
+class ReenvioFlask:
+    """Respuesta ASGI que entrega la petición (con el cuerpo ya leído) a la app de Flask."""
+
+    def __init__(self, cuerpo):
+        self.cuerpo = cuerpo
+
+    async def __call__(self, scope, receive, send):
+        _estadisticas["reenviadas_a_flask"] += 1
+        pendiente = True
+
+        async def reenviar():
+            nonlocal pendiente
+            if pendiente:
+                pendiente = False
+                return {"type": "http.request", "body": self.cuerpo, "more_body": False}
+            return await receive()
+
+        await flask_wsgi(scope, reenviar, send)
+
+
+async def abrir_sesion(request):
+    return await run_in_threadpool(flask_app.session_interface.open_session, flask_app, request)
+
+
+async def guardar_sesion(sesion, response):
+    await run_in_threadpool(flask_app.session_interface.save_session, flask_app, sesion, response)
+
+
+async def texto_a_voz(texto, voz):
+    """(url, trabajo) del audio de la respuesta; solo sale del event loop si hay que sintetizar ya."""
+    if voz and not TTS_ASINCRONO:
+        return await run_in_threadpool(audio_de, texto, voz)
+    return audio_de(texto, voz)
+
+
+def con_audio(respuesta, audio, trabajo):
+    respuesta["audio_response"] = audio
+    if audio and trabajo:
+        respuesta["audio_job"] = trabajo  # lo mismo que app.adjuntar_trabajo_audio
+    return respuesta
+
+
+async def pedir_completion(messages, stream=False):
+    """
+    chat.completions.create sin la validación del cuerpo del SDK: recorre cada
+    mensaje del historial con get_type_hints (~10 ms por llamada) y aquí correría
+    en el event loop. Los mensajes ya son dicts de texto, se envían tal cual.
+    """
+    cuerpo = {"model": "gpt-4-turbo", "messages": messages, "max_tokens": 500}
+    if stream:
+        cuerpo["stream"] = True
+    return await llamar_async(
+        lambda timeout: cliente_async().post("/chat/completions", body=cuerpo, cast_to=ChatCompletion,
+                                             options={"timeout": timeout},
+                                             stream=stream, stream_cls=AsyncStream[ChatCompletionChunk]),
+        "chat_stream" if stream else "chat", cubrir=not stream)
+
+
+async def completion(messages):
+    resultado = await pedir_completion(messages)
+    return resultado.choices[0].message.content if resultado.choices else ""
+
+
+def en_vuelo(handler):
+    """Cuenta las conversaciones atendidas por el event loop al mismo tiempo."""
+    async def envuelto(request):
+        _estadisticas["en_vuelo"] += 1
+        _estadisticas["max_en_vuelo"] = max(_estadisticas["max_en_vuelo"], _estadisticas["en_vuelo"])
+        try:
+            return await handler(request)
+        except Exception:
+            _estadisticas["errores"] += 1
+            raise
+        finally:
+            _estadisticas["en_vuelo"] -= 1
+            _estadisticas["atendidas"] += 1
+    return envuelto
+
+
+async def preparar_turno(request, cuerpo):
+    """
+    (user_message, voz, sesion, rama) si el mensaje va a una rama del LLM; None si lo atiende Flask.
+    Agrega a la sesión el mensaje de la usuaria igual que app.chat().
+    """
+    if not SESIONES_COMPARTIDAS:
+        return None
+    try:
+        data = json.loads(cuerpo)
+        user_message = data.get("message", "").strip().lower()
+    except (ValueError, AttributeError):
+        return None  # Flask responde el error como siempre
+    if not user_message:
+        return None
+    sesion = await abrir_sesion(request)
+    rama = servidor.rama_streaming(user_message, sesion)
+    if rama is None:
+        return None
+
+    if "messages" not in sesion:
+        sesion["messages"] = []
+    messages = sesion["messages"]
+    if rama == "orientacion":
+        sesion["awaiting_orientation_response"] = True
+        sesion.pop("awaiting_decision", None)
+        messages.append({"role": "user", "content": "¿Cómo puedo presentar una denuncia?"})
+    else:
+        messages.append({"role": "user", "content": user_message})
+    sesion["messages"] = messages
+    return user_message, quiere_voz(data.get("voice")), sesion, rama
+
+
+async def respuesta_en_cache(request, user_message, sesion):
+    """Igual que app.respuesta_en_cache; la profundidad se mide sin el mensaje recién agregado."""
+    profundidad = profundidad_conversacion(sesion["messages"][:-1])
+    omitir = request.headers.get("X-Cache-Bypass") == "1"
+    return profundidad, await run_in_threadpool(servidor.respuesta_en_cache, user_message, profundidad, omitir)
+
+
+@en_vuelo
+async def chat(request):
+    cuerpo = await request.body()
+    turno = await preparar_turno(request, cuerpo)
+    if turno is None:
+        return ReenvioFlask(cuerpo)
+    user_message, voz, sesion, rama = turno
+    messages = sesion["messages"]
+
+    try:
+        if rama == "orientacion":
+            try:
+                bot_response = await completion(servidor.contexto_llm(SYSTEM_PROMPT, sesion=sesion))
+                bot_response = bot_response or "No se pudo obtener una respuesta clara."
+            except LLMNoDisponible:
+                bot_response = servidor.respuesta_de_respaldo("", 0)
+            messages.append({"role": "assistant", "content": bot_response})
+            sesion["messages"] = messages
+            audio, trabajo = await texto_a_voz(bot_response, voz)
+            respuesta = {"response": bot_response + "\n\n🔹 **¿Te puedo ayudar en algo más?**"}
+        else:
+            profundidad, bot_response = await respuesta_en_cache(request, user_message, sesion)
+            if bot_response is None:
+                inicio = time.perf_counter()
+                system_prompt, con_contexto = await run_in_threadpool(servidor.prompt_de_sistema, user_message)
+                try:
+                    bot_response = await completion(servidor.contexto_llm(system_prompt, sesion=sesion))
+                    registrar_llamada(con_contexto, servidor.es_respuesta_vaga(bot_response))
+                    await run_in_threadpool(guardar_respuesta, user_message, SYSTEM_PROMPT, profundidad,
+                                            bot_response, time.perf_counter() - inicio)
+                except LLMNoDisponible:
+                    bot_response = await run_in_threadpool(servidor.respuesta_de_respaldo, user_message, profundidad)
+            messages.append({"role": "assistant", "content": bot_response})
+            sesion["messages"] = messages
+            audio, trabajo = await texto_a_voz(bot_response, voz)
+            respuesta = {"response": markdown.markdown(bot_response)}
+        response = JSONResponse(con_audio(respuesta, audio, trabajo))
+    except Exception as e:
+        response = JSONResponse({"response": f"Error: {str(e)}"}, status_code=500)
+    await guardar_sesion(sesion, response)
+    return response
+
+
+@en_vuelo
+async def chat_stream(request):
+    """/chat_stream de app.py sobre el stream de AsyncOpenAI; mismos eventos 'delta', 'html' y 'done'."""
+    cuerpo = await request.body()
+    turno = await preparar_turno(request, cuerpo)
+    if turno is None:
+        return ReenvioFlask(cuerpo)
+    user_message, voz, sesion, rama = turno
+    messages = sesion["messages"]
+
+    profundidad = None
+    if rama == "general":
+        profundidad, en_cache = await respuesta_en_cache(request, user_message, sesion)
+        if en_cache is not None:
+            sesion["messages"] = messages + [{"role": "assistant", "content": en_cache}]
+            audio, trabajo = await texto_a_voz(en_cache, voz)
+            response = JSONResponse(con_audio({"response": markdown.markdown(en_cache)}, audio, trabajo))
+            await guardar_sesion(sesion, response)
+            return response
+
+    async def generar():
+        try:
+            inicio = time.perf_counter()
+            if rama == "general":
+                system_prompt, con_contexto = await run_in_threadpool(servidor.prompt_de_sistema, user_message)
+            else:
+                system_prompt, con_contexto = SYSTEM_PROMPT, False
+            partes, respaldo = [], False
+            try:
+                stream = await pedir_completion(servidor.contexto_llm(system_prompt, sesion=sesion), stream=True)
+                async for chunk in stream:
+                    if not (chunk.choices and chunk.choices[0].delta.content):
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    partes.append(delta)
+                    yield servidor.evento_sse("delta", {"text": delta})
+                    if "\n" in delta:
+                        yield servidor.evento_sse("html", {"html": markdown.markdown("".join(partes))})
+                bot_response = "".join(partes)
+            except LLMNoDisponible:
+                # Solo puede pasar al abrir el stream: la respuesta sale completa en 'done'
+                respaldo = True
+                bot_response = await run_in_threadpool(servidor.respuesta_de_respaldo,
+                                                       user_message if rama == "general" else "", profundidad)
+            if rama == "general" and not respaldo:
+                registrar_llamada(con_contexto, servidor.es_respuesta_vaga(bot_response))
+
+            if not bot_response:
+                bot_response = "No se pudo obtener una respuesta clara."
+            elif rama == "general" and not respaldo:
+                await run_in_threadpool(guardar_respuesta, user_message, SYSTEM_PROMPT, profundidad,
+                                        bot_response, time.perf_counter() - inicio)
+            if rama == "orientacion":
+                bot_response_html = markdown.markdown(bot_response + "\n\n🔹 **¿Te puedo ayudar en algo más?**")
+            else:
+                bot_response_html = markdown.markdown(bot_response)
+            audio, trabajo = await texto_a_voz(bot_response, voz)
+
+            # La cookie ya salió con los encabezados: aquí solo se guarda el historial
+            sesion["messages"] = messages + [{"role": "assistant", "content": bot_response}]
+            await run_in_threadpool(flask_app.session_interface.guardar_datos, sesion)
+
+            yield servidor.evento_sse("done", {
+                "response": bot_response_html,
+                "audio_response": audio,
+                "audio_job": trabajo
+            })
+        except Exception as e:
+            yield servidor.evento_sse("done", {"response": f"Error: {str(e)}"})
+
+    response = StreamingResponse(generar(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    await guardar_sesion(sesion, response)
+    return response
+
+
+@en_vuelo
+async def audio(request):
+    """/audio de app.py con Whisper y el LLM asíncronos. El audio ya no se guarda en uploads/."""
+    cuerpo = await request.body()
+    if not SESIONES_COMPARTIDAS:
+        return ReenvioFlask(cuerpo)
+    _, form, files = parse_form_data({
+        "REQUEST_METHOD": "POST",
+        "CONTENT_TYPE": request.headers.get("content-type", ""),
+        "CONTENT_LENGTH": str(len(cuerpo)),
+        "wsgi.input": io.BytesIO(cuerpo),
+    })
+    if "audio" not in files:
+        return JSONResponse({"error": "No se recibió ningún archivo de audio."}, status_code=400)
+    audio_file = files["audio"]
+    if audio_file.filename == "":
+        return JSONResponse({"error": "El archivo no tiene nombre."}, status_code=400)
+    voz = quiere_voz(form.get("voice"))
+
+    sesion = await abrir_sesion(request)
+    try:
+        archivo = (secure_filename(audio_file.filename) or "audio.webm", audio_file.read())
+        transcript = await llamar_async(
+            lambda timeout: cliente_async().audio.transcriptions.create(model="whisper-1", file=archivo,
+                                                                        timeout=timeout),
+            "transcripcion")
+        transcription_text = transcript.text if hasattr(transcript, "text") else "[No se obtuvo transcripción]"
+
+        # Igual que app.chat_request
+        messages = sesion.get("messages", [])
+        profundidad = profundidad_conversacion(messages)
+        messages.append({"role": "user", "content": transcription_text})
+        sesion["messages"] = messages
+        try:
+            try:
+                bot_response = await completion(servidor.contexto_llm(SYSTEM_PROMPT, sesion=sesion))
+            except LLMNoDisponible:
+                bot_response = await run_in_threadpool(servidor.respuesta_de_respaldo, transcription_text,
+                                                       profundidad)
+            messages.append({"role": "assistant", "content": bot_response})
+            sesion["messages"] = messages
+        except Exception as e:
+            bot_response = f"Error: {str(e)}"
+
+        audio_url, trabajo = await texto_a_voz(bot_response, voz)
+        response = JSONResponse(con_audio({
+            "response": markdown.markdown(bot_response),
+            "transcription": transcription_text
+        }, audio_url, trabajo))
+    except Exception as e:
+        response = JSONResponse({"error": f"Error al procesar el audio: {str(e)}"}, status_code=500)
+    await guardar_sesion(sesion, response)
+    return response
+
+
+async def metrics(request):
+    """Las métricas de app.py más las del event loop."""
+    def de_flask():
+        with flask_app.app_context():
+            return servidor.metrics().get_json()
+
+    datos = await run_in_threadpool(de_flask)
+    datos["asgi"] = dict(_estadisticas, sesiones_compartidas=SESIONES_COMPARTIDAS,
+                         hilos=ASGI_HILOS, hilos_wsgi=ASGI_HILOS_WSGI)
+    return JSONResponse(datos)
+
+
+@contextlib.asynccontextmanager
+async def ciclo_de_vida(aplicacion):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = ASGI_HILOS
+    servidor.cargar_recursos_en_segundo_plano()
+    print(f"⚡ Modo ASGI: {ASGI_HILOS} hilos para trabajo bloqueante, {ASGI_HILOS_WSGI} para Flask.")
+    yield
+    if _clientes is not None:
+        for _ in range(ASGI_CLIENTES_LLM):
+            await next(_clientes).close()
+
+
+aplicacion = Starlette(
+    routes=[
+        Route("/chat", chat, methods=["POST"]),
+        Route("/chat_stream", chat_stream, methods=["POST"]),
+        Route("/audio", audio, methods=["POST"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Mount("/", app=flask_wsgi),
+    ],
+    lifespan=ciclo_de_vida,
+)
@@ -0,0 +1,182 @@
+"""
+Comportamiento de cliente_llm.py contra benchmarks/servidor_falso.py, escenario
+por escenario (POST /config del servidor falso cambia las fallas). Falla
+(código de salida 1) si alguna comprobación no se cumple:
+  - sano: ningún error;
+  - errores transitorios (20 % de 503): los reintentos dejan menos de 2 % de
+    llamadas fallidas;
+  - cola lenta (5 % de respuestas de 1,5 s): con cobertura el p99 baja a menos
+    de la mitad que sin ella, con el cliente síncrono y con llamar_async;
+  - plazo: una respuesta de 3 s con plazo de 0,5 s falla a tiempo;
+  - caída (100 % de 503): el circuito se abre y rechaza al instante;
+  - recuperación: pasado LLM_CIRCUITO_ESPERA, la llamada de prueba lo cierra.
+
+Uso (desde la raíz del repo):
+    python benchmarks/bench_cliente_llm.py [--llamadas 300] [--hilos 16]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUERTO_LLM = 8094
+MENSAJES = [{"role": "user", "content": "¿Qué es la violencia política en razón de género?"}]
+
+# La configuración de cliente_llm se lee al importarlo
+os.environ.update(OPENAI_BASE_URL=f"http://127.0.0.1:{PUERTO_LLM}/v1", OPENAI_API_KEY="falsa",
+                  LLM_CIRCUITO_ESPERA="1", LLM_ESPERA_BASE="0.05")
+sys.path.insert(0, RAIZ)
+import cliente_llm  # noqa: E402
+
+
+def configurar(**cambios):
+    base = {"latencia": 0.05, "variacion": 0.2, "errores": 0.0, "codigo_error": 503, "lentas": 0.0}
+    httpx.post(f"http://127.0.0.1:{PUERTO_LLM}/config", json=dict(base, **cambios)).raise_for_status()
+
+
+def una_llamada(nombre):
+    inicio = time.perf_counter()
+    try:
+        cliente_llm.completar(nombre=nombre, model="gpt-4-turbo", messages=MENSAJES, max_tokens=500)
+        return True, time.perf_counter() - inicio
+    except cliente_llm.LLMNoDisponible:
+        return False, time.perf_counter() - inicio
+
+
+def ronda(nombre, llamadas, hilos):
+    with ThreadPoolExecutor(hilos) as pool:
+        resultados = list(pool.map(una_llamada, [nombre] * llamadas))
+    return resultados, cliente_llm.estadisticas_llm()["operaciones"][nombre]
+
+
+async def ronda_async(nombre, llamadas, concurrentes):
+    from openai import AsyncOpenAI
+
+    cliente = AsyncOpenAI(max_retries=0)
+    cupo = asyncio.Semaphore(concurrentes)  # como los hilos de ronda(): sin cupo, la CPU del cliente es el cuello
+
+    async def llamada():
+        async with cupo:
+            await cliente_llm.llamar_async(
+                lambda timeout: cliente.chat.completions.create(model="gpt-4-turbo", messages=MENSAJES,
+                                                                timeout=timeout),
+                nombre, cubrir=True)
+
+    await asyncio.gather(*(llamada() for _ in range(llamadas)))
+    await cliente.close()
+    return cliente_llm.estadisticas_llm()["operaciones"][nombre]
+
+
+def mostrar(nombre, operacion):
+    latencia = operacion["latencia_ms"]
+    print(f"  {nombre:<22} llamadas={operacion['llamadas']:<4} errores={operacion['errores']:<4} "
+          f"p50={latencia['p50']} ms  p95={latencia['p95']} ms  p99={latencia['p99']} ms")
+
+
+def revisar(descripcion, cumple):
+    print(f"{'✅' if cumple else '❌'} {descripcion}")
+    return cumple
+
+
+def esperar_servidor(proceso):
+    for _ in range(100):
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor falso terminó con código {proceso.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{PUERTO_LLM}/estadisticas", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError("El servidor falso no respondió")
+
+
+def escenarios(llamadas, hilos):
+    bien = True
+
+    configurar()
+    ronda("calentamiento", hilos, hilos)  # crea el cliente y abre las conexiones
+    _, sano = ronda("sano", llamadas, hilos)
+    mostrar("sano", sano)
+    bien &= revisar("sano: sin errores", sano["errores"] == 0)
+
+    configurar(errores=0.2)
+    reintentos = cliente_llm.estadisticas_llm()["reintentos"]
+    _, transitorios = ronda("errores_transitorios", llamadas, hilos)
+    reintentos = cliente_llm.estadisticas_llm()["reintentos"] - reintentos
+    mostrar("errores_transitorios", transitorios)
+    bien &= revisar(f"20 % de 503: {reintentos} reintentos, {transitorios['tasa_errores']:.1%} de llamadas fallidas",
+                    transitorios["tasa_errores"] < 0.02)
+
+    configurar(lentas=0.05, latencia_lenta=1.5)
+    _, sin_cobertura = ronda("cola_sin_cobertura", llamadas, hilos)
+    cliente_llm.LLM_COBERTURA_MS = "200"
+    antes = cliente_llm.estadisticas_llm()
+    _, con_cobertura = ronda("cola_con_cobertura", llamadas, hilos)
+    despues = cliente_llm.estadisticas_llm()
+    con_async = asyncio.run(ronda_async("cola_con_cobertura_async", llamadas, hilos))
+    cliente_llm.LLM_COBERTURA_MS = "0"
+    for nombre, operacion in (("cola_sin_cobertura", sin_cobertura), ("cola_con_cobertura", con_cobertura),
+                              ("cola_con_cobertura_async", con_async)):
+        mostrar(nombre, operacion)
+    coberturas = despues["coberturas"] - antes["coberturas"]
+    ganadas = despues["coberturas_ganadas"] - antes["coberturas_ganadas"]
+    p99 = sin_cobertura["latencia_ms"]["p99"]
+    bien &= revisar(f"cola lenta: p99 {p99} ms sin cobertura, {con_cobertura['latencia_ms']['p99']} ms con "
+                    f"cobertura ({coberturas} coberturas, {ganadas} ganadas)",
+                    con_cobertura["latencia_ms"]["p99"] < p99 / 2)
+    bien &= revisar(f"cola lenta asíncrona: p99 {con_async['latencia_ms']['p99']} ms",
+                    con_async["latencia_ms"]["p99"] < p99 / 2)
+    bien &= revisar(f"coberturas dentro del saldo ({cliente_llm.LLM_COBERTURA_MAX:.0%} de las llamadas)",
+                    coberturas <= cliente_llm.LLM_COBERTURA_MAX * llamadas + cliente_llm.LLM_COBERTURA_RAFAGA)
+
+    configurar(latencia=3)
+    inicio = time.perf_counter()
+    try:
+        cliente_llm.completar(nombre="plazo", plazo=0.5, model="gpt-4-turbo", messages=MENSAJES)
+        a_tiempo = False
+    except cliente_llm.LLMNoDisponible:
+        a_tiempo = True
+    duracion = time.perf_counter() - inicio
+    bien &= revisar(f"plazo de 0,5 s con respuestas de 3 s: LLMNoDisponible en {duracion:.2f} s",
+                    a_tiempo and duracion < 0.7)
+
+    configurar(errores=1.0)
+    resultados, caida = ronda("caida", llamadas, hilos)
+    estado = cliente_llm.estadisticas_llm()
+    rechazos = sorted(duracion for _, duracion in resultados[-llamadas // 2:])
+    mostrar("caida", caida)
+    bien &= revisar(f"caída: circuito {estado['circuito']}, {estado['rechazadas_por_circuito']} rechazadas, "
+                    f"mediana de la segunda mitad {rechazos[len(rechazos) // 2] * 1000:.1f} ms",
+                    estado["circuito"] == "abierto" and rechazos[len(rechazos) // 2] < 0.005)
+
+    configurar()
+    time.sleep(cliente_llm.LLM_CIRCUITO_ESPERA + 0.1)
+    exito, _ = una_llamada("recuperacion")
+    bien &= revisar(f"recuperación: la llamada de prueba {'pasó' if exito else 'falló'} y el circuito quedó "
+                    f"{cliente_llm.estadisticas_llm()['circuito']}",
+                    exito and cliente_llm.estadisticas_llm()["circuito"] == "cerrado")
+    return bien
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llamadas", type=int, default=300, help="llamadas por escenario")
+    parser.add_argument("--hilos", type=int, default=16)
+    args = parser.parse_args()
+
+    falso = subprocess.Popen([sys.executable, os.path.join("benchmarks", "servidor_falso.py"),
+                              "--puerto", str(PUERTO_LLM)], cwd=RAIZ,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        esperar_servidor(falso)
+        bien = escenarios(args.llamadas, args.hilos)
+    finally:
+        falso.terminate()
+        falso.wait()
+    sys.exit(0 if bien else 1)
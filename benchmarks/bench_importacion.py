@@ -0,0 +1,110 @@
+"""
+Presupuesto de arranque en frío. Falla (código de salida 1) si:
+  - `import app` tarda más de --importacion-ms (según python -X importtime,
+    la mejor de --repeticiones corridas);
+  - al importar la app se importa alguno de los módulos pesados de PESADOS
+    (deben cargarse con su primer uso o en el hilo de fondo, ver
+    app.cargar_recursos);
+  - `python app.py` tarda más de --inicio-ms en responder "/" y "/movile".
+También muestra los módulos que más tardan y cuánto tarda /ready (índice y
+modelos cargados en segundo plano), que no tiene presupuesto.
+
+Uso (desde la raíz del repo):
+    python benchmarks/bench_importacion.py [--importacion-ms 800] [--inicio-ms 1000]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUERTO_APP = 8093
+PESADOS = ["faiss", "torch", "sentence_transformers", "transformers", "langchain", "langchain_core",
+           "langchain_community", "langchain_openai", "langchain_text_splitters", "fpdf", "pydub", "pypdf",
+           "openai"]
+
+
+def entorno():
+    return dict(os.environ, PORT=str(PUERTO_APP), SESIONES_BACKEND="memoria",
+                PDFS_CARPETA=tempfile.mkdtemp(prefix="bench_importacion_"))
+
+
+def medir_importacion():
+    """(ms de `import app`, {módulo: ms acumulados}) según -X importtime."""
+    salida = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=RAIZ, env=entorno(),
+                            capture_output=True, text=True, check=True).stderr
+    modulos = {}
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        modulos[nombre.strip()] = int(acumulado) / 1000
+    return modulos["app"], modulos
+
+
+def esperar(url, proceso, limite):
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"La app terminó con código {proceso.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} no respondió en {limite} s")
+
+
+def medir_inicio():
+    """(ms hasta responder "/", ms hasta "/movile", ms hasta /ready) de `python app.py`."""
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, "app.py"], cwd=RAIZ, env=entorno(),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        tiempos = []
+        for ruta, limite in (("/", 60), ("/movile", 60), ("/ready", 600)):
+            esperar(f"http://127.0.0.1:{PUERTO_APP}{ruta}", proceso, limite)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return tiempos
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+def revisar(nombre, valor, presupuesto):
+    dentro = valor <= presupuesto
+    print(f"{'✅' if dentro else '❌'} {nombre}: {valor:.0f} ms (presupuesto {presupuesto} ms)")
+    return dentro
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--importacion-ms", type=int, default=800)
+    parser.add_argument("--inicio-ms", type=int, default=1000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--mostrar", type=int, default=10, help="módulos más lentos a mostrar")
+    args = parser.parse_args()
+
+    corridas = [medir_importacion() for _ in range(args.repeticiones)]
+    importacion, modulos = min(corridas, key=lambda corrida: corrida[0])
+    print("Módulos más lentos al importar la app (ms acumulados):")
+    directos = {nombre: ms for nombre, ms in modulos.items() if nombre != "app"}
+    for nombre, ms in sorted(directos.items(), key=lambda par: par[1], reverse=True)[:args.mostrar]:
+        print(f"  {ms:7.1f}  {nombre}")
+    print()
+
+    bien = revisar("import app", importacion, args.importacion_ms)
+    pesados = sorted({nombre.split(".")[0] for nombre in modulos} & set(PESADOS))
+    print(f"{'❌' if pesados else '✅'} módulos pesados importados al arrancar: {', '.join(pesados) or 'ninguno'}")
+    bien = bien and not pesados
+
+    raiz, movil, listo = medir_inicio()
+    bien = revisar('primer "/"', raiz, args.inicio_ms) and bien
+    bien = revisar('primer "/movile"', movil, args.inicio_ms) and bien
+    print(f"ℹ️  /ready (índice y modelos cargados): {listo:.0f} ms")
+    sys.exit(0 if bien else 1)
@@ -0,0 +1,118 @@
+"""
+Memoria por worker de gunicorn con y sin precarga (GUNICORN_PRECARGA, ver
+gunicorn.conf.py y wsgi.py). Arranca gunicorn con --workers workers, hace
+consultas que pasan por el enrutador, BM25 y FAISS (el LLM es
+benchmarks/servidor_falso.py) y lee /proc/<pid>/smaps_rollup del maestro y de
+cada worker:
+  - RSS: lo que el proceso tiene en memoria, compartido o no.
+  - PSS: lo compartido dividido entre los procesos que lo comparten.
+  - USS: lo privado del proceso, lo que se libera si el worker muere.
+
+Uso (desde la raíz del repo, con el índice FAISS ya construido):
+    python benchmarks/bench_memoria_workers.py [--workers 4] [--consultas 40]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUERTO_LLM = 8089
+PUERTO_APP = 8091
+PREGUNTAS = [
+    "¿Qué dice el artículo 20 bis de la LGAMVLV?",
+    "¿Qué autoridad atiende la violencia política contra una regidora?",
+    "¿Qué medidas de protección puede dictar el instituto electoral?",
+]
+
+
+def memoria(pid):
+    """(RSS, PSS, USS) en MB según /proc/<pid>/smaps_rollup."""
+    campos = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) == 3 and partes[2] == "kB":
+                campos[partes[0].rstrip(":")] = int(partes[1]) / 1024
+    return campos["Rss"], campos["Pss"], campos["Private_Clean"] + campos["Private_Dirty"]
+
+
+def hijos(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(hijo) for hijo in f.read().split()]
+
+
+def esperar(url, proceso, limite=300):
+    inicio = time.time()
+    while time.time() - inicio < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El proceso terminó con código {proceso.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} no respondió en {limite} s")
+
+
+def consultar(numero):
+    with httpx.Client(base_url=f"http://127.0.0.1:{PUERTO_APP}", timeout=120) as cliente:
+        r = cliente.post("/chat", headers={"X-Cache-Bypass": "1"},
+                         json={"message": PREGUNTAS[numero % len(PREGUNTAS)], "voice": False})
+        return r.status_code
+
+
+def correr(precarga, workers, consultas, env):
+    env = dict(env, GUNICORN_PRECARGA="1" if precarga else "0", WEB_CONCURRENCY=str(workers))
+    inicio = time.perf_counter()
+    gunicorn = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"], cwd=RAIZ, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        esperar(f"http://127.0.0.1:{PUERTO_APP}/ready", gunicorn)
+        while len(hijos(gunicorn.pid)) < workers:
+            time.sleep(0.2)
+        listo = time.perf_counter() - inicio
+        # Varias rondas en paralelo para que todas los workers atiendan alguna consulta
+        with ThreadPoolExecutor(workers * 2) as pool:
+            estados = list(pool.map(consultar, range(consultas)))
+
+        maestro = memoria(gunicorn.pid)
+        por_worker = [memoria(pid) for pid in hijos(gunicorn.pid)]
+        pss_total = maestro[1] + sum(m[1] for m in por_worker)
+        print(f"{'con precarga' if precarga else 'sin precarga':<13} listo en {listo:5.1f} s  "
+              f"consultas ok={estados.count(200)}/{len(estados)}\n"
+              f"  maestro  RSS={maestro[0]:6.0f} MB  USS={maestro[2]:6.0f} MB\n"
+              f"  worker   RSS={statistics.mean(m[0] for m in por_worker):6.0f} MB  "
+              f"PSS={statistics.mean(m[1] for m in por_worker):6.0f} MB  "
+              f"USS={statistics.mean(m[2] for m in por_worker):6.0f} MB  (promedio de {len(por_worker)})\n"
+              f"  total    PSS={pss_total:6.0f} MB\n")
+    finally:
+        gunicorn.terminate()
+        gunicorn.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--consultas", type=int, default=40)
+    args = parser.parse_args()
+
+    falso = subprocess.Popen([sys.executable, os.path.join("benchmarks", "servidor_falso.py"),
+                              "--puerto", str(PUERTO_LLM), "--latencia", "0.2"],
+                             cwd=RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{PUERTO_LLM}/v1", OPENAI_API_KEY="falsa",
+               PORT=str(PUERTO_APP), SESIONES_BACKEND="memoria", PDFS_CARPETA=tempfile.mkdtemp(prefix="bench_mem_"))
+    try:
+        esperar(f"http://127.0.0.1:{PUERTO_LLM}/estadisticas", falso)
+        for precarga in (False, True):
+            correr(precarga, args.workers, args.consultas, env)
+    finally:
+        falso.terminate()
+        falso.wait()
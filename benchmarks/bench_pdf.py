@@ -0,0 +1,116 @@
+"""
+Mide PDFs/segundo de formato_denuncia.generar_pdf contra la forma anterior de
+generarlo (TEXTO_BASE.format completo, secciones y títulos por subcadenas y
+multi_cell sin caché en cada párrafo). Antes de medir comprueba que ambos
+producen exactamente los mismos bytes, con la fecha de creación fija.
+
+Uso (desde la raíz del repo):
+    python benchmarks/bench_pdf.py [--pdfs 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from fpdf import FPDF  # noqa: E402
+
+import formato_denuncia  # noqa: E402
+
+FECHA = datetime(2025, 1, 1, tzinfo=timezone.utc)
+CAMPOS = [
+    "nombre_completo", "telefono", "domicilio", "correo", "persona_autorizada1", "persona_autorizada2",
+    "fecha_hechos", "lugar_hechos", "ciudad", "persona_denunciada", "relacion_denunciada", "narraciones",
+    "afectacion", "medidas_cautelares", "medidas_proteccion", "tipo_prueba", "prueba_confesional",
+    "prueba_testimonial", "documento_prueba", "quien_desahoga", "numero_notarial", "notario_publico_numero",
+    "donde_funciones_notario", "fecha_intrumento_notarial", "numeros_prueba", "documentos_oficiales", "folio",
+    "fecha_folio", "autoridad_emite", "acto_documento",
+]
+NARRACION = ("En la sesión de cabildo el regidor me impidió tomar la palabra, apagó mi micrófono y dijo frente "
+             "a todos que una mujer no debía opinar de presupuesto. ")
+
+
+class PDFFechaFija(formato_denuncia.PDF):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_creation_date(FECHA)
+
+
+class PDFAnterior(PDFFechaFija):
+    """El PDF de antes: fuentes propias de cada documento y multi_cell en cada párrafo."""
+
+    def __init__(self, *args, **kwargs):
+        FPDF.__init__(self, *args, **kwargs)
+        self.set_creation_date(FECHA)
+
+    def parrafo_justificado(self, texto, fijo=""):
+        self.multi_cell(0, 7, texto, align="J")
+
+
+def generar_pdf_anterior(datos):
+    datos = dict(datos)
+    pdf = PDFAnterior()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.texto_negrita(formato_denuncia.ENCABEZADO_AUTORIDAD)
+    datos["tipo_prueba"] = formato_denuncia.generar_texto_prueba(datos)
+    for seccion in formato_denuncia.TEXTO_BASE.format(**datos).split("\n\n"):
+        if seccion.strip():
+            if formato_denuncia.es_titulo(seccion):
+                pdf.agregar_titulo_centrado(seccion.strip())
+            else:
+                pdf.chapter_body(seccion)
+    pdf.agregar_fecha_centrada(datos["ciudad"])
+    pdf.agregar_firma_centrada()
+    return bytes(pdf.output())
+
+
+def generar_pdf_actual(datos):
+    original, formato_denuncia.PDF = formato_denuncia.PDF, PDFFechaFija
+    try:
+        return formato_denuncia.generar_pdf(datos)
+    finally:
+        formato_denuncia.PDF = original
+
+
+def denuncias():
+    """Una denuncia por tipo de prueba, con narraciones de distinto largo (cambian los saltos de página)."""
+    for i, tipo in enumerate(formato_denuncia.TEXTOS_PRUEBAS):
+        datos = {campo: f"{campo.replace('_', ' ')} {i}" for campo in CAMPOS}
+        datos.update(ciudad="tijuana", tipo_prueba=tipo, narraciones=NARRACION * (1 + 4 * i),
+                     nombre_completo=f"Ana María Pérez López {i}", persona_denunciada="Juan Gómez")
+        yield datos
+
+
+def medir(generar, lote, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        for datos in lote:
+            inicio = time.perf_counter()
+            generar(datos)
+            tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", type=int, default=50, help="PDFs por variante")
+    args = parser.parse_args()
+
+    lote = list(denuncias())
+    inicio = time.perf_counter()
+    primeros = [generar_pdf_actual(datos) for datos in lote]
+    print(f"Primera pasada (corta las líneas fijas): {(time.perf_counter() - inicio) * 1000:.0f} ms "
+          f"para {len(lote)} PDFs")
+    iguales = all(generar_pdf_anterior(datos) == pdf for datos, pdf in zip(lote, primeros))
+    print(f"Bytes idénticos al generador anterior: {'sí' if iguales else 'NO'}\n")
+
+    repeticiones = max(1, args.pdfs // len(lote))
+    for nombre, generar in (("anterior", generar_pdf_anterior), ("plantilla", generar_pdf_actual)):
+        tiempos = medir(generar, lote, repeticiones)
+        print(f"{nombre:<10} {len(tiempos) / sum(tiempos):6.1f} PDFs/s  "
+              f"p50={statistics.median(tiempos) * 1000:6.1f} ms  max={max(tiempos) * 1000:6.1f} ms")
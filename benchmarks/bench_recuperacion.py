@@ -0,0 +1,128 @@
+"""
+Compara la recuperación densa (la ruta anterior: solo FAISS) con la híbrida
+(BM25 + FAISS + artículo citado, fusionados por RRF) sobre consultas con
+respuesta conocida: recall@k y latencia por consulta. Al final muestra qué
+preguntas de usuarios manda a la búsqueda el enrutador RAG y cuáles no.
+
+Uso (desde la raíz del repo, con el índice ya construido: python indice.py):
+    python benchmarks/bench_recuperacion.py [--repeticiones 5] [--con-cache]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+import cache_busqueda  # noqa: E402
+import enrutador_rag  # noqa: E402
+from busqueda_hibrida import buscar_hibrido, indice_bm25, RERANKER_MODELO  # noqa: E402
+from indice import load_or_create_index  # noqa: E402
+
+# (consulta, [(documento, artículo)]) -- artículo None = cualquier fragmento del documento
+CONSULTAS = [
+    ("artículo 461 de la LGIPE", [("lgipe", "461")]),
+    ("art. 474 Bis LGIPE", [("lgipe", "474 bis")]),
+    ("artículo 442 Bis de la LGIPE", [("lgipe", "442 bis")]),
+    ("¿qué dice el artículo 20 Bis de la LGAMVLV?", [("lgamvlv", "20 bis")]),
+    ("artículo 20 Ter de la ley de acceso", [("lgamvlv", "20 ter")]),
+    ("artículo 41 de la Constitución", [("cpeum", "41")]),
+    ("artículo 35 constitucional", [("cpeum", "35")]),
+    ("artículo 7 de la ley general en materia de delitos electorales", [("lgmde", "7")]),
+    ("artículo 20 Bis de la LGMDE", [("lgmde", "20 bis")]),
+    ("artículo 1 de la Ley General de Víctimas", [("lgv", "1")]),
+    ("artículo 5 del reglamento de quejas", [("reglamento", "5")]),
+    ("¿qué es la violencia política contra las mujeres en razón de género?",
+     [("lgamvlv", "20 bis"), ("lgipe", "3"), ("lgmde", "3"), ("reglamento", None)]),
+    ("¿qué conductas constituyen violencia política de género?",
+     [("lgamvlv", "20 ter"), ("lgmde", "20 bis")]),
+    ("sanciones por violencia política contra las mujeres",
+     [("lgipe", "456"), ("lgipe", "442 bis"), ("lgmde", "20 bis")]),
+]
+KS = (1, 3, 5)
+# (pregunta como la escriben los usuarios, ¿debe buscar en los documentos?)
+PREGUNTAS_ENRUTADOR = [
+    ("hola, buenas tardes", False),
+    ("muchas gracias, muy amable", False),
+    ("¿qué dice el artículo 20 Ter?", True),
+    ("¿el OPLE puede recibir mi queja?", True),
+    ("¿qué es la violencia política contra las mujeres en razón de género?", True),
+    ("me restringieron el uso de la palabra en las sesiones del cabildo", True),
+    ("soy regidora y el presidente municipal no me convoca a las sesiones", True),
+    ("¿qué medidas de protección puedo pedir si me amenazan?", True),
+    ("¿cuánto tiempo tengo para presentar la denuncia?", True),
+    ("soy mujer y quiero saber la receta del pozole", False),
+    ("¿cuánto cobran de cargo por envío a Tijuana?", False),
+    ("mi candidato favorito del mundial es México", False),
+    ("escríbeme un poema sobre el mar", False),
+]
+
+
+def relevante(meta, esperados):
+    return any(meta.get("documento") == doc and (art is None or art in meta.get("articulos", []))
+               for doc, art in esperados)
+
+
+def ruta_densa(db, bm25, consulta, k):
+    return [bm25.metadatos[i] for i in cache_busqueda.ids_cercanos(db, consulta, k)]
+
+
+def ruta_hibrida(db, bm25, consulta, k):
+    return [doc.metadata for doc in buscar_hibrido(db, consulta, k)]
+
+
+def medir(nombre, ruta, db, bm25, repeticiones, con_cache):
+    aciertos = {k: 0 for k in KS}
+    tiempos = []
+    for consulta, esperados in CONSULTAS:
+        for _ in range(repeticiones):
+            if not con_cache:
+                cache_busqueda._embeddings.vaciar()
+                cache_busqueda.invalidar_busquedas()
+            inicio = time.perf_counter()
+            resultados = ruta(db, bm25, consulta, max(KS))
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        for k in KS:
+            if any(relevante(meta, esperados) for meta in resultados[:k]):
+                aciertos[k] += 1
+
+    tiempos.sort()
+    recall = "  ".join(f"recall@{k}={aciertos[k] / len(CONSULTAS):.2f}" for k in KS)
+    print(f"{nombre:<8} {recall}  p50={statistics.median(tiempos):.1f} ms  "
+          f"p95={tiempos[int(len(tiempos) * 0.95) - 1]:.1f} ms")
+
+
+def medir_enrutador(db):
+    aciertos = 0
+    for pregunta, esperado in PREGUNTAS_ENRUTADOR:
+        buscar, motivo = enrutador_rag._decidir(db, pregunta)
+        aciertos += buscar == esperado
+        marca = "✅" if buscar == esperado else "❌"
+        print(f"{marca} {'buscar' if buscar else 'sin búsqueda':<12} {motivo:<15} {pregunta}")
+    con_busqueda = sum(1 for _, esperado in PREGUNTAS_ENRUTADOR if esperado)
+    print(f"\nenrutador: {aciertos}/{len(PREGUNTAS_ENRUTADOR)} como se esperaba "
+          f"({con_busqueda} deben buscar, {len(PREGUNTAS_ENRUTADOR) - con_busqueda} no)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--con-cache", action="store_true", help="no vacía las cachés entre consultas")
+    args = parser.parse_args()
+
+    db = load_or_create_index()
+    if db is None:
+        sys.exit("❌ No hay índice FAISS.")
+    bm25 = indice_bm25(db)
+    print(f"{len(CONSULTAS)} consultas, {len(bm25.ids)} fragmentos, re-ranker: {RERANKER_MODELO or 'no'}\n")
+    medir("densa", ruta_densa, db, bm25, args.repeticiones, args.con_cache)
+    medir("híbrida", ruta_hibrida, db, bm25, args.repeticiones, args.con_cache)
+    print()
+    medir_enrutador(db)
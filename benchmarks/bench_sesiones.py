@@ -0,0 +1,129 @@
+"""
+Mide la E/S de sesión por petición (abrir + guardar) con cada backend:
+Flask-Session en archivos (el anterior) contra los almacenes de
+almacen_sesiones. Simula conversaciones que crecen turno a turno, como el
+historial de /chat, y reporta p50/p95 por petición y bytes escritos.
+
+Uso (desde la raíz del repo):
+    python benchmarks/bench_sesiones.py [--usuarios 20] [--turnos 40] [--redis]
+"""
+import argparse
+import os
+import pickle
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from flask import Flask, session  # noqa: E402
+
+import almacen_sesiones  # noqa: E402
+
+PREGUNTA = "¿Qué puedo hacer si en mi campaña me excluyen de los debates por ser mujer? " * 2
+RESPUESTA = ("Puedes presentar una queja ante el INE o el OPLE de tu entidad. La LGIPE y la LGAMVLV "
+             "consideran violencia política impedir el acceso a debates en razón de género. ") * 4
+
+
+def crear_app(backend, carpeta):
+    app = Flask(__name__)
+    app.secret_key = "bench"
+    app.config["SESSION_PERMANENT"] = False
+    if backend == "filesystem":
+        from flask_session import Session
+
+        app.config["SESSION_TYPE"] = "filesystem"
+        app.config["SESSION_FILE_DIR"] = os.path.join(carpeta, "flask_sessions")
+        Session(app)
+    elif backend == "sqlite":
+        app.session_interface = almacen_sesiones.InterfazSesiones(
+            almacen_sesiones.AlmacenSQLite(os.path.join(carpeta, "sesiones.sqlite3")))
+    elif backend == "redis":
+        app.session_interface = almacen_sesiones.InterfazSesiones(almacen_sesiones.AlmacenRedis())
+    else:
+        app.session_interface = almacen_sesiones.InterfazSesiones(almacen_sesiones.AlmacenMemoria())
+
+    @app.route("/turno", methods=["POST"])
+    def turno():
+        # Igual que /chat: se agrega la pregunta y la respuesta al historial
+        messages = session.get("messages", [])
+        turno = len(messages) // 2
+        messages.append({"role": "user", "content": f"{PREGUNTA} ({turno})"})
+        messages.append({"role": "assistant", "content": f"{RESPUESTA} ({turno})"})
+        session["messages"] = messages
+        session.setdefault("datos_usuario", {"nombre": "Ana Pérez", "correo": "ana@ejemplo.com"})
+        return "ok"
+
+    @app.route("/consulta")
+    def consulta():
+        # Petición que solo lee la sesión (por ejemplo /audio_status)
+        return str(len(session.get("messages", [])))
+
+    return app
+
+
+def medir_interfaz(app):
+    """Envuelve open/save de la interfaz para medir solo la E/S de sesión."""
+    interfaz = app.session_interface
+    tiempos = []
+    escritos = [0]  # bytes que Flask-Session escribe: la sesión completa en pickle
+    abrir, guardar = interfaz.open_session, interfaz.save_session
+
+    def open_session(*args):
+        inicio = time.perf_counter()
+        try:
+            return abrir(*args)
+        finally:
+            tiempos.append(time.perf_counter() - inicio)
+
+    def save_session(app, sesion, response):
+        inicio = time.perf_counter()
+        try:
+            return guardar(app, sesion, response)
+        finally:
+            tiempos[-1] += time.perf_counter() - inicio
+            if getattr(sesion, "modified", False) and not hasattr(interfaz, "estadisticas"):
+                escritos[0] += len(pickle.dumps(dict(sesion)))
+
+    interfaz.open_session, interfaz.save_session = open_session, save_session
+    return tiempos, escritos
+
+
+def bytes_en_disco(carpeta):
+    return sum(os.path.getsize(os.path.join(raiz, f)) for raiz, _, archivos in os.walk(carpeta) for f in archivos)
+
+
+def correr(backend, usuarios, turnos):
+    with tempfile.TemporaryDirectory() as carpeta:
+        app = crear_app(backend, carpeta)
+        tiempos, escritos_pickle = medir_interfaz(app)
+        clientes = [app.test_client() for _ in range(usuarios)]
+        ultimos = []
+        for numero in range(turnos):
+            for cliente in clientes:
+                cliente.post("/turno")
+                cliente.get("/consulta")
+            if numero == turnos - 1:
+                ultimos = tiempos[-2 * usuarios:]
+
+        tiempos_ms = sorted(t * 1000 for t in tiempos)
+        ultimos_ms = sorted(t * 1000 for t in ultimos)
+        escritos = getattr(app.session_interface, "estadisticas", {}).get("bytes_escritos", escritos_pickle[0])
+        print(f"{backend:<10} p50={statistics.median(tiempos_ms):6.3f} ms  "
+              f"p95={tiempos_ms[int(len(tiempos_ms) * 0.95) - 1]:6.3f} ms  "
+              f"último turno p50={statistics.median(ultimos_ms):6.3f} ms  "
+              f"bytes escritos={escritos}  en disco={bytes_en_disco(carpeta)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=20)
+    parser.add_argument("--turnos", type=int, default=40)
+    parser.add_argument("--redis", action="store_true", help=f"incluye Redis en {almacen_sesiones.SESIONES_REDIS_URL}")
+    args = parser.parse_args()
+
+    print(f"{args.usuarios} usuarios x {args.turnos} turnos (una escritura y una lectura por turno)\n")
+    for backend in ["filesystem", "sqlite", "memoria"] + (["redis"] if args.redis else []):
+        correr(backend, args.usuarios, args.turnos)
@@ -0,0 +1,172 @@
+"""
+Prueba de carga: usuarias simultáneas por núcleo del modo con hilos de Flask
+(python app.py, servidor con un hilo por petición) contra el modo ASGI (uvicorn asgi:aplicacion).
+El LLM es benchmarks/servidor_falso.py con una latencia fija, así que lo que se
+mide es cuánto cuesta a cada modo tener conversaciones esperando a OpenAI.
+
+Cada usuaria virtual tiene su propia cookie de sesión y manda --turnos mensajes
+al chat general, uno tras otro (con X-Cache-Bypass para que siempre se llame al
+LLM y sin voz). Por cada nivel de concurrencia se reporta throughput, latencias,
+errores, CPU y máximos de memoria e hilos del servidor, y usuarias por núcleo
+(usuarias / núcleos de CPU que usó el servidor). En una máquina con pocos
+núcleos el generador de carga y el LLM falso compiten por la CPU con el
+servidor: el throughput queda por debajo del ideal en ambos modos.
+
+Uso (desde la raíz del repo, con el índice FAISS ya construido):
+    python benchmarks/carga_asgi.py [--usuarios 50,200,400] [--turnos 3] [--latencia 1.5]
+                                    [--modos hilos,asgi] [--ruta /chat]
+"""
+import argparse
+import asyncio
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUERTO_LLM = 8089
+PUERTO_APP = 8090
+PREGUNTAS = [
+    "¿Qué es la violencia política contra las mujeres en razón de género?",
+    "Hola, ¿me puedes ayudar?",
+    "¿Qué autoridad atiende una queja si soy regidora?",
+    "Gracias por la información",
+]
+COMANDOS = {
+    "hilos": [sys.executable, "app.py"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:aplicacion", "--host", "127.0.0.1",
+             "--port", str(PUERTO_APP), "--log-level", "warning", "--backlog", "4096"],
+}
+
+
+def proceso_de(pid):
+    """(segundos de CPU, MB de RSS, hilos) del proceso, leídos de /proc."""
+    with open(f"/proc/{pid}/stat") as f:
+        campos = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(campos[11]) + int(campos[12])) / os.sysconf("SC_CLK_TCK")
+    hilos = int(campos[17])
+    rss = int(campos[21]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    return cpu, rss, hilos
+
+
+class Muestreo(threading.Thread):
+    """Máximos de RSS y de hilos del servidor durante un nivel de carga."""
+
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid, self.rss, self.hilos = pid, 0, 0
+        self.terminar = threading.Event()
+
+    def run(self):
+        while not self.terminar.wait(0.2):
+            _, rss, hilos = proceso_de(self.pid)
+            self.rss, self.hilos = max(self.rss, rss), max(self.hilos, hilos)
+
+
+def esperar_servidor(url, proceso, limite=300):
+    inicio = time.time()
+    while time.time() - inicio < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor terminó con código {proceso.returncode}")
+        try:
+            httpx.get(url, timeout=2)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    raise RuntimeError(f"{url} no respondió en {limite} s")
+
+
+def iniciar(comando, env, url):
+    proceso = subprocess.Popen(comando, cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    esperar_servidor(url, proceso)
+    return proceso
+
+
+async def usuaria(numero, turnos, ruta, contexto_ssl, latencias, errores):
+    # Un cliente por usuaria (su cookie y su conexión); el contexto SSL se comparte porque
+    # crearlo cuesta más que la petición, y un solo pool para todas se vuelve cuadrático
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PUERTO_APP}", timeout=300, verify=contexto_ssl) as cliente:
+        await turnos_de(cliente, numero, turnos, ruta, latencias, errores)
+
+
+async def turnos_de(cliente, numero, turnos, ruta, latencias, errores):
+    for turno in range(turnos):
+        inicio = time.perf_counter()
+        try:
+            r = await cliente.post(ruta, headers={"X-Cache-Bypass": "1"},
+                                   json={"message": PREGUNTAS[(numero + turno) % len(PREGUNTAS)], "voice": False})
+            if r.status_code != 200 or "Error:" in r.text:
+                errores.append(r.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errores.append(type(e).__name__)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+
+
+async def nivel(usuarias, turnos, ruta):
+    latencias, errores = [], []
+    contexto_ssl = ssl.create_default_context()
+    await asyncio.gather(*(usuaria(i, turnos, ruta, contexto_ssl, latencias, errores) for i in range(usuarias)))
+    return latencias, errores
+
+
+def correr(modo, niveles, turnos, ruta, latencia, env):
+    proceso = iniciar(COMANDOS[modo], env, f"http://127.0.0.1:{PUERTO_APP}/metrics")
+    try:
+        asyncio.run(nivel(1, 1, ruta))  # carga el índice, el enrutador y el modelo de embeddings
+        for usuarias in niveles:
+            cpu_antes = proceso_de(proceso.pid)[0]
+            muestreo = Muestreo(proceso.pid)
+            muestreo.start()
+            inicio = time.perf_counter()
+            latencias, errores = asyncio.run(nivel(usuarias, turnos, ruta))
+            duracion = time.perf_counter() - inicio
+            muestreo.terminar.set()
+            muestreo.join()
+            cpu = proceso_de(proceso.pid)[0]
+            nucleos = (cpu - cpu_antes) / duracion
+            latencias.sort()
+            p95 = latencias[int(len(latencias) * 0.95) - 1] if latencias else float("nan")
+            por_nucleo = usuarias / nucleos if nucleos else float("inf")
+            print(f"{modo:<6} {usuarias:>5} usuarias  {len(latencias) / duracion:7.1f} turnos/s "
+                  f"(ideal {usuarias / latencia:6.1f})  "
+                  f"p50={statistics.median(latencias) if latencias else float('nan'):5.2f} s  p95={p95:5.2f} s  "
+                  f"errores={len(errores):<4} CPU={nucleos:4.2f} núcleos  RSS={muestreo.rss:6.0f} MB  "
+                  f"hilos={muestreo.hilos:<4} "
+                  f"usuarias/núcleo={por_nucleo:6.0f}")
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", default="50,200,400", help="niveles de concurrencia separados por coma")
+    parser.add_argument("--turnos", type=int, default=3, help="mensajes por usuaria")
+    parser.add_argument("--latencia", type=float, default=1.5, help="segundos que tarda el LLM falso")
+    parser.add_argument("--modos", default="hilos,asgi")
+    parser.add_argument("--ruta", default="/chat", choices=["/chat", "/chat_stream"])
+    args = parser.parse_args()
+
+    falso = iniciar([sys.executable, os.path.join("benchmarks", "servidor_falso.py"), "--puerto", str(PUERTO_LLM),
+                     "--latencia", str(args.latencia)], dict(os.environ), f"http://127.0.0.1:{PUERTO_LLM}/estadisticas")
+    carpeta = tempfile.mkdtemp(prefix="carga_asgi_")
+    env = dict(os.environ,
+               OPENAI_BASE_URL=f"http://127.0.0.1:{PUERTO_LLM}/v1", OPENAI_API_KEY="falsa",
+               PORT=str(PUERTO_APP), SESIONES_BACKEND="memoria", PDFS_CARPETA=carpeta)
+    niveles = [int(n) for n in args.usuarios.split(",")]
+    print(f"LLM falso con {args.latencia} s por respuesta, {args.turnos} turnos por usuaria, "
+          f"{os.cpu_count()} CPU en la máquina\n")
+    try:
+        for modo in args.modos.split(","):
+            correr(modo, niveles, args.turnos, args.ruta, args.latencia, env)
+    finally:
+        falso.terminate()
+        falso.wait()
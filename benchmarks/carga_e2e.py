@@ -0,0 +1,287 @@
+"""
+Prueba de carga de principio a fin con recorridos completos de usuaria
+(benchmarks/jornadas.py: denuncia de 28 campos hasta el PDF, orientación,
+voz y formulario directo) contra una configuración de workers dada. El LLM,
+Whisper y el TTS son benchmarks/servidor_falso.py, con la distribución de
+latencias que se elija, así que se mide lo que la app agrega encima de ellos.
+
+Cada usuaria virtual tiene su propio cliente (su cookie de sesión) y corre
+--recorridos recorridos uno tras otro, elegidos según --mezcla; las usuarias
+arrancan repartidas a lo largo de --rampa segundos. Al final se reporta:
+  - throughput: recorridos y peticiones por segundo, recorridos fallidos;
+  - latencias (p50/p95/p99) por ruta y por recorrido;
+  - desglose por etapa: cuánto del tiempo total de las peticiones se fue en
+    cada etapa del guion (campos validados localmente, validación con el LLM,
+    chat, Whisper, espera del audio, PDF...);
+  - tiempo de espera simulada en el servidor falso por ruta (LLM, Whisper,
+    TTS): lo que queda del tiempo de las peticiones es de la app;
+  - CPU, memoria máxima e hilos de todos los procesos del servidor (el
+    maestro de gunicorn y sus workers).
+
+Uso (desde la raíz del repo, con el índice FAISS ya construido):
+    python benchmarks/carga_e2e.py [--modo gunicorn] [--workers 2] [--hilos 8] [--clase gthread]
+                                   [--usuarias 20] [--recorridos 2] [--rampa 5]
+                                   [--mezcla denuncia:1,orientacion:2,voz:1,formulario:1]
+                                   [--latencia 1.5] [--distribucion uniforme] [--variacion 0.2]
+                                   [--latencia-whisper 0.75] [--latencia-tts 0.4] [--unicas 0]
+--clase uvicorn.workers.UvicornWorker usa el modo ASGI dentro de gunicorn; --modo flask
+(python app.py) y --modo asgi (uvicorn asgi:aplicacion) son un solo proceso.
+"""
+import argparse
+import asyncio
+import os
+import re
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+from jornadas import RECORRIDOS, Registro, correr
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUERTO_LLM = 8095
+PUERTO_APP = 8096
+
+
+def comando(modo):
+    """El servidor, lanzado por con_tts_falso.py para que el audio venga del servidor falso."""
+    lanzador = [sys.executable, os.path.join("benchmarks", "con_tts_falso.py")]
+    if modo == "gunicorn":
+        return lanzador + ["gunicorn", "-c", "gunicorn.conf.py"]
+    if modo == "asgi":
+        return lanzador + ["uvicorn", "asgi:aplicacion", "--host", "127.0.0.1",
+                           "--port", str(PUERTO_APP), "--log-level", "warning", "--backlog", "4096"]
+    return lanzador + ["app.py"]
+
+
+def arbol(pid):
+    """El proceso y todos sus descendientes (los workers de gunicorn), leídos de /proc."""
+    pids = [pid]
+    for actual in pids:
+        try:
+            with open(f"/proc/{actual}/task/{actual}/children") as f:
+                pids.extend(int(hijo) for hijo in f.read().split())
+        except FileNotFoundError:
+            pass
+    return pids
+
+
+def proceso_de(pid):
+    """(segundos de CPU, MB de RSS, hilos) del proceso y sus descendientes."""
+    cpu = rss = hilos = 0
+    for actual in arbol(pid):
+        try:
+            with open(f"/proc/{actual}/stat") as f:
+                campos = f.read().rsplit(")", 1)[1].split()
+        except FileNotFoundError:
+            continue  # un worker que gunicorn acaba de reemplazar
+        cpu += (int(campos[11]) + int(campos[12])) / os.sysconf("SC_CLK_TCK")
+        hilos += int(campos[17])
+        rss += int(campos[21]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    return cpu, rss, hilos
+
+
+class Muestreo(threading.Thread):
+    """Máximos de RSS y de hilos del servidor durante la carga."""
+
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid, self.rss, self.hilos = pid, 0, 0
+        self.terminar = threading.Event()
+
+    def run(self):
+        while not self.terminar.wait(0.2):
+            _, rss, hilos = proceso_de(self.pid)
+            self.rss, self.hilos = max(self.rss, rss), max(self.hilos, hilos)
+
+
+def esperar_servidor(url, proceso, limite=600):
+    """Espera a que `url` responda 200 (para la app, /ready: índice y modelos cargados)."""
+    inicio = time.time()
+    while time.time() - inicio < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor terminó con código {proceso.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} no respondió en {limite} s")
+
+
+def iniciar(comando, env, url):
+    proceso = subprocess.Popen(comando, cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    esperar_servidor(url, proceso)
+    return proceso
+
+
+def mezcla_de(texto):
+    """"denuncia:1,orientacion:2" -> ["denuncia", "orientacion", "orientacion"] (el ciclo que sigue cada usuaria)."""
+    ciclo = []
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition(":")
+        if nombre not in RECORRIDOS:
+            raise SystemExit(f"Recorrido desconocido: {nombre} (hay {', '.join(RECORRIDOS)})")
+        ciclo += [nombre] * int(peso or 1)
+    return ciclo
+
+
+async def usuaria(numero, ciclo, recorridos, espera, contexto_ssl, registro):
+    await asyncio.sleep(espera)
+    for i in range(recorridos):
+        # Un cliente por recorrido: una sesión nueva, como quien vuelve a abrir la página. El contexto
+        # SSL se comparte porque crearlo cuesta más que la petición
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PUERTO_APP}", timeout=300,
+                                     verify=contexto_ssl) as cliente:
+            await correr(ciclo[(numero + i) % len(ciclo)], cliente, registro, numero * recorridos + i)
+
+
+async def carga(usuarias, ciclo, recorridos, rampa):
+    registro = Registro()
+    contexto_ssl = ssl.create_default_context()
+    await asyncio.gather(*(usuaria(i, ciclo, recorridos, rampa * i / usuarias, contexto_ssl, registro)
+                           for i in range(usuarias)))
+    return registro
+
+
+def percentiles(valores):
+    valores = sorted(valores)
+    if not valores:
+        return "sin datos"
+    p = lambda q: valores[min(len(valores) - 1, int(len(valores) * q))] * 1000  # noqa: E731
+    return f"p50={p(0.5):7.0f} ms  p95={p(0.95):7.0f} ms  p99={p(0.99):7.0f} ms  máx={valores[-1] * 1000:7.0f} ms"
+
+
+def ruta_base(ruta):
+    """Agrupa las rutas con ids: /audio_status/<id>, /static/audio/<archivo> y /denuncias/<id>."""
+    return re.sub(r"/(audio_status|static/audio|denuncias)/.*", r"/\1/…", ruta)
+
+
+def reportar(registro, duracion, falso_antes, falso_despues, nucleos, muestreo):
+    peticiones, recorridos = registro.peticiones, registro.recorridos
+    fallidos = [r for r in recorridos if r[2] is not None]
+    print(f"\nThroughput: {len(recorridos) / duracion:.2f} recorridos/s, {len(peticiones) / duracion:.1f} peticiones/s "
+          f"en {duracion:.1f} s  ({len(recorridos)} recorridos, {len(fallidos)} fallidos, "
+          f"{sum(1 for p in peticiones if not p[4])} peticiones con error)")
+    for nombre, _, desvio in fallidos[:5]:
+        print(f"  ❌ {nombre}: {desvio}")
+
+    print("\nRecorridos (duración completa):")
+    por_recorrido = defaultdict(list)
+    for nombre, segundos, desvio in recorridos:
+        if desvio is None:
+            por_recorrido[nombre].append(segundos)
+    for nombre in sorted(por_recorrido):
+        print(f"  {nombre:<14} {len(por_recorrido[nombre]):>5}  {percentiles(por_recorrido[nombre])}")
+
+    print("\nLatencia por ruta:")
+    por_ruta = defaultdict(list)
+    for _, _, ruta, segundos, _ in peticiones:
+        por_ruta[ruta_base(ruta)].append(segundos)
+    for ruta in sorted(por_ruta):
+        print(f"  {ruta:<20} {len(por_ruta[ruta]):>6}  {percentiles(por_ruta[ruta])}")
+
+    print("\nDesglose por etapa (del tiempo total de las peticiones):")
+    por_etapa = defaultdict(list)
+    for _, etapa, _, segundos, _ in peticiones:
+        por_etapa[etapa].append(segundos)
+    total = sum(p[3] for p in peticiones) or 1
+    for etapa, tiempos in sorted(por_etapa.items(), key=lambda par: sum(par[1]), reverse=True):
+        print(f"  {etapa:<16} {len(tiempos):>6}  {sum(tiempos):8.1f} s  {sum(tiempos) / total:6.1%}  "
+              f"{percentiles(tiempos)}")
+
+    print("\nEspera simulada en el servidor falso (LLM, Whisper y TTS):")
+    for ruta, despues in sorted(falso_despues["rutas"].items()):
+        antes = falso_antes["rutas"].get(ruta, {"peticiones": 0, "segundos": 0.0})
+        llamadas, segundos = despues["peticiones"] - antes["peticiones"], despues["segundos"] - antes["segundos"]
+        print(f"  {ruta:<12} {llamadas:>6} llamadas  {segundos:8.1f} s  "
+              f"({segundos / total:.1%} del tiempo de las peticiones)")
+    print("  (el TTS corre en la cola de fondo: solo cuenta para las peticiones a través de tts_espera)")
+
+    print(f"\nServidor: CPU={nucleos:.2f} núcleos  RSS máx (suma de procesos)={muestreo.rss:.0f} MB  hilos máx={muestreo.hilos}")
+
+
+def metricas_llm():
+    """Latencias del cliente LLM de un worker (/metrics es por proceso)."""
+    try:
+        operaciones = httpx.get(f"http://127.0.0.1:{PUERTO_APP}/metrics", timeout=10).json()["llm"]["operaciones"]
+    except (httpx.HTTPError, KeyError, ValueError):
+        return
+    print("\nCliente LLM de un worker (/metrics):")
+    for nombre, operacion in sorted(operaciones.items()):
+        latencia = operacion["latencia_ms"]
+        print(f"  {nombre:<14} llamadas={operacion['llamadas']:<5} errores={operacion['errores']:<4} "
+              f"p50={latencia['p50']} ms  p95={latencia['p95']} ms  p99={latencia['p99']} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modo", default="gunicorn", choices=["gunicorn", "flask", "asgi"])
+    parser.add_argument("--workers", type=int, default=2, help="workers de gunicorn")
+    parser.add_argument("--hilos", type=int, default=8, help="hilos por worker gthread")
+    parser.add_argument("--clase", default="gthread", help="gthread o uvicorn.workers.UvicornWorker")
+    parser.add_argument("--usuarias", type=int, default=20)
+    parser.add_argument("--recorridos", type=int, default=2, help="recorridos por usuaria")
+    parser.add_argument("--rampa", type=float, default=5, help="segundos en los que arrancan todas las usuarias")
+    parser.add_argument("--mezcla", default="denuncia:1,orientacion:2,voz:1,formulario:1")
+    parser.add_argument("--latencia", type=float, default=1.5, help="mediana de una respuesta del LLM falso")
+    parser.add_argument("--distribucion", default="uniforme", choices=["fija", "uniforme", "lognormal"])
+    parser.add_argument("--variacion", type=float, default=0.2)
+    parser.add_argument("--latencia-whisper", type=float, default=0.75)
+    parser.add_argument("--latencia-tts", type=float, default=0.4)
+    parser.add_argument("--unicas", type=float, default=0.0, help="fracción de respuestas del chat que no se repiten")
+    args = parser.parse_args()
+    ciclo = mezcla_de(args.mezcla)
+
+    falso = iniciar([sys.executable, os.path.join("benchmarks", "servidor_falso.py"), "--puerto", str(PUERTO_LLM),
+                     "--latencia", str(args.latencia), "--distribucion", args.distribucion,
+                     "--variacion", str(args.variacion), "--latencia-whisper", str(args.latencia_whisper),
+                     "--latencia-tts", str(args.latencia_tts), "--unicas", str(args.unicas)],
+                    dict(os.environ), f"http://127.0.0.1:{PUERTO_LLM}/estadisticas")
+    carpeta = tempfile.mkdtemp(prefix="carga_e2e_")
+    env = dict(os.environ,
+               OPENAI_BASE_URL=f"http://127.0.0.1:{PUERTO_LLM}/v1", OPENAI_API_KEY="falsa",
+               TTS_FALSO_URL=f"http://127.0.0.1:{PUERTO_LLM}/tts",  # ver con_tts_falso.py
+               TTS_VOZ="carga",  # otra clave de caché: los MP3 en silencio no se mezclan con los reales
+               PORT=str(PUERTO_APP), PDFS_CARPETA=carpeta,
+               SESIONES_SQLITE=os.path.join(carpeta, "sesiones.sqlite3"),
+               WEB_CONCURRENCY=str(args.workers), GUNICORN_HILOS=str(args.hilos), GUNICORN_WORKER_CLASS=args.clase)
+    descripcion = (f"gunicorn {args.workers} x {args.clase} ({args.hilos} hilos)" if args.modo == "gunicorn"
+                   else args.modo)
+    print(f"Servidor: {descripcion}. {args.usuarias} usuarias x {args.recorridos} recorridos ({args.mezcla}), "
+          f"LLM falso {args.distribucion} de {args.latencia} s, {os.cpu_count()} CPU en la máquina")
+    try:
+        app = iniciar(comando(args.modo), env, f"http://127.0.0.1:{PUERTO_APP}/ready")
+        try:
+            # Calentamiento: enrutador, modelo de embeddings, fpdf y los audios fijos del formulario
+            calentamiento = asyncio.run(carga(1, list(RECORRIDOS), len(RECORRIDOS), 0))
+            for nombre, _, desvio in calentamiento.recorridos:
+                if desvio is not None:
+                    raise SystemExit(f"❌ El recorrido {nombre} falla sin carga: {desvio}")
+
+            falso_antes = httpx.get(f"http://127.0.0.1:{PUERTO_LLM}/estadisticas").json()
+            cpu_antes = proceso_de(app.pid)[0]
+            muestreo = Muestreo(app.pid)
+            muestreo.start()
+            inicio = time.perf_counter()
+            registro = asyncio.run(carga(args.usuarias, ciclo, args.recorridos, args.rampa))
+            duracion = time.perf_counter() - inicio
+            muestreo.terminar.set()
+            muestreo.join()
+            nucleos = (proceso_de(app.pid)[0] - cpu_antes) / duracion
+            falso_despues = httpx.get(f"http://127.0.0.1:{PUERTO_LLM}/estadisticas").json()
+            reportar(registro, duracion, falso_antes, falso_despues, nucleos, muestreo)
+            metricas_llm()
+        finally:
+            app.terminate()
+            app.wait()
+    finally:
+        falso.terminate()
+        falso.wait()
+    sys.exit(0 if all(desvio is None for _, _, desvio in registro.recorridos) else 1)
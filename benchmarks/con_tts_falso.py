@@ -0,0 +1,66 @@
+"""
+Arranca el servidor de la app con el TTS de benchmarks/servidor_falso.py en
+lugar de gTTS, para las pruebas de carga. gTTS no se puede apuntar a otro
+servidor, así que aquí se reemplaza cache_audio.sintetizar por un POST a
+TTS_FALSO_URL antes de importar la app (paquete_audio la importa por nombre).
+El código de producción no sabe nada de esto.
+
+El resto de la línea de comandos es el servidor, en el mismo proceso:
+  - gunicorn ...: los workers salen del maestro por fork y heredan el reemplazo
+    (también con GUNICORN_PRECARGA=0 y con UvicornWorker);
+  - uvicorn ...: un solo proceso (sin --workers, que arranca con spawn);
+  - app.py: python app.py.
+
+Uso (desde la raíz del repo):
+    TTS_FALSO_URL=http://127.0.0.1:8095/tts python benchmarks/con_tts_falso.py gunicorn -c gunicorn.conf.py
+    TTS_FALSO_URL=... python benchmarks/con_tts_falso.py uvicorn asgi:aplicacion --port 8096
+    TTS_FALSO_URL=... python benchmarks/con_tts_falso.py app.py
+Con TTS_VOZ distinta de la real (carga_e2e.py usa "carga"), los MP3 en silencio
+quedan en otras claves de la caché de audio y no se mezclan con los de gTTS.
+"""
+import os
+import runpy
+import sys
+import threading
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import httpx  # noqa: E402
+
+import cache_audio  # noqa: E402
+
+TTS_FALSO_URL = os.environ["TTS_FALSO_URL"]
+TTS_FALSO_TIMEOUT = 30  # segundos por síntesis
+
+
+def sintetizar(texto, ruta, lang=cache_audio.AUDIO_LANG, voz=cache_audio.AUDIO_VOZ):
+    """Como cache_audio.sintetizar (escritura atómica), pero el MP3 viene del servidor falso."""
+    respuesta = httpx.post(TTS_FALSO_URL, json={"texto": texto, "lang": lang, "voz": voz}, timeout=TTS_FALSO_TIMEOUT)
+    respuesta.raise_for_status()
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporal, "wb") as f:
+            f.write(respuesta.content)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+cache_audio.sintetizar = sintetizar
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        raise SystemExit(__doc__)
+    sys.argv = sys.argv[1:]
+    if sys.argv[0] == "gunicorn":
+        from gunicorn.app.wsgiapp import run
+
+        sys.exit(run())
+    if sys.argv[0] == "uvicorn":
+        import uvicorn
+
+        sys.exit(uvicorn.main())
+    runpy.run_path(sys.argv[0], run_name="__main__")
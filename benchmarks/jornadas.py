@@ -0,0 +1,256 @@
+"""
+Recorridos completos de una usuaria, con guion, para las pruebas de carga de
+principio a fin (ver carga_e2e.py). Cada recorrido recibe su propio
+httpx.AsyncClient (su cookie de sesión) y anota cada petición en un Registro
+con la etapa a la que pertenece:
+  - denuncia: "quiero denunciar", los 28 campos de LISTA_CAMPOS_DENUNCIA uno
+    por uno (con una duda a media captura, la narración de hechos, los menús
+    de medidas y la prueba documental con sus campos extra), el PDF y su
+    descarga por /download_sue;
+  - orientacion: chat general, la opción 2 tras "quiero denunciar" y un turno
+    por /chat_stream;
+  - voz: notas de voz por /audio (Whisper) y un mensaje con voz por /chat,
+    esperando cada audio en /audio_status y descargando el MP3;
+  - formulario: la denuncia completa de una sola vez por /generar_denuncia y
+    la descarga por la URL /denuncias/<id> que devuelve.
+Cada respuesta se compara con lo que el guion espera; si no coincide el
+recorrido se corta y cuenta como fallido, con el paso en que se desvió.
+
+El LLM debe ser benchmarks/servidor_falso.py: confirma los datos que la app le
+pide validar, que es lo que deja avanzar la denuncia hasta el PDF.
+
+Para correr cada recorrido una vez contra una app ya levantada (desde la raíz del repo):
+    python benchmarks/jornadas.py [--url http://127.0.0.1:5000] [--recorridos denuncia,orientacion,voz,formulario]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from funciones_auxiliares import LISTA_CAMPOS_DENUNCIA  # noqa: E402
+
+# Valores válidos para las reglas locales de funciones_auxiliares.REGLAS_CAMPOS. Ninguno
+# contiene los disparadores de dudas ("como", "?", "porque"...) ni de "continuar" ("ok", "seguir"...)
+VALORES = {
+    "nombre_completo": "María Pérez González",
+    "telefono": "5523456789",
+    "domicilio": "Calle Reforma 123, Col. Centro, C.P. 06000",
+    "correo": "maria.perez@correo.mx",
+    "persona_autorizada1": "Ana López Ruiz",
+    "persona_autorizada2": "Laura Díaz Mena",
+    "fecha_hechos": "5 de febrero de 2023",
+    "lugar_hechos": "Sala de cabildo del ayuntamiento",
+    "ciudad": "Monterrey",
+    "persona_denunciada": "Juan Ramírez Soto",
+    "relacion_denunciada": "Regidor del mismo ayuntamiento",
+    "narraciones": ("El 5 de febrero de 2023, en la sala de cabildo del ayuntamiento, el regidor Juan Ramírez "
+                    "me impidió tomar la palabra y dijo: “las mujeres no deben opinar de presupuesto”. "
+                    "Se vulneró mi derecho a la participación política."),
+    "afectacion": "No pude votar el presupuesto y fui excluida de las comisiones",
+    "prueba_confesional": "Confesional a cargo del regidor denunciado",
+    "prueba_testimonial": "Testimonio de dos regidoras presentes en la sesión",
+    "quien_desahoga": "Juan Ramírez Soto",
+    "numero_notarial": "12345",
+    "notario_publico_numero": "27",
+    "donde_funciones_notario": "Monterrey",
+    "fecha_intrumento_notarial": "10 de marzo de 2023",
+    "numeros_prueba": "1, 2 y 3",
+    "documentos_oficiales": "Acta de la sesión de cabildo",
+    "folio": "ABC-2023-001",
+    "fecha_folio": "15 de marzo de 2023",
+    "documento_prueba": "Copia certificada del acta de cabildo",
+    "autoridad_emite": "Secretaría del ayuntamiento",
+    "acto_documento": "Acta de la sesión ordinaria de cabildo",
+}
+# Campos que app.chat agrega al elegir la prueba documental (opción 3)
+CAMPOS_DOCUMENTAL = ["documentos_oficiales", "folio", "fecha_folio", "autoridad_emite", "acto_documento",
+                     "documento_prueba", "numeros_prueba"]
+CAMPOS_CON_MENU = {"narraciones", "medidas_cautelares", "medidas_proteccion", "tipo_prueba"}
+PREGUNTAS = [
+    "Hola, ¿me puedes ayudar?",
+    "¿Qué es la violencia política contra las mujeres en razón de género?",
+    "¿Qué autoridad atiende una queja si soy regidora?",
+    "¿Qué pruebas me sirven para denunciar?",
+]
+NOTA_DE_VOZ = bytes(4096)  # el servidor falso no la escucha; solo importa el tamaño de la subida
+
+
+class Desvio(Exception):
+    """La respuesta no es la que espera el guion."""
+
+
+class Registro:
+    """Peticiones y recorridos de todas las usuarias (todas corren en el mismo event loop)."""
+
+    def __init__(self):
+        self.peticiones = []  # (recorrido, etapa, ruta, segundos, ok)
+        self.recorridos = []  # (recorrido, segundos, motivo del desvío o None)
+
+    def peticion(self, recorrido, etapa, ruta, segundos, ok):
+        self.peticiones.append((recorrido, etapa, ruta, segundos, ok))
+
+    def recorrido(self, nombre, segundos, desvio):
+        self.recorridos.append((nombre, segundos, desvio))
+
+
+def contenido(respuesta):
+    """Texto donde se busca lo esperado: el JSON sin escapar los acentos, o el tipo de contenido."""
+    tipo = respuesta.headers.get("content-type", "")
+    if tipo.startswith("application/json"):
+        return json.dumps(respuesta.json(), ensure_ascii=False)
+    if tipo.startswith("text/event-stream"):
+        return respuesta.text
+    return tipo
+
+
+async def paso(cliente, registro, recorrido, etapa, metodo, ruta, esperado=None, **kwargs):
+    inicio = time.perf_counter()
+    try:
+        respuesta = await cliente.request(metodo, ruta, **kwargs)
+    except httpx.HTTPError as e:
+        registro.peticion(recorrido, etapa, ruta, time.perf_counter() - inicio, False)
+        raise Desvio(f"{etapa} ({ruta}): {type(e).__name__}") from e
+    ok = respuesta.status_code == 200 and (esperado is None or esperado in contenido(respuesta))
+    registro.peticion(recorrido, etapa, ruta, time.perf_counter() - inicio, ok)
+    if not ok:
+        raise Desvio(f"{etapa} ({ruta}): HTTP {respuesta.status_code}, se esperaba {esperado!r} "
+                     f"y llegó {respuesta.text[:300]!r}")
+    return respuesta
+
+
+def mensaje(cliente, registro, recorrido, etapa, texto, esperado=None, voz=False, ruta="/chat"):
+    return paso(cliente, registro, recorrido, etapa, "POST", ruta, esperado,
+                json={"message": texto, "voice": voz})
+
+
+def guion_denuncia():
+    """[(etapa, mensaje, esperado)] de una denuncia completa, en el orden en que app.chat pide los campos."""
+    inicio_pruebas = LISTA_CAMPOS_DENUNCIA.index("tipo_prueba") + 1
+    campos = [c for c in LISTA_CAMPOS_DENUNCIA[:inicio_pruebas] if c not in CAMPOS_CON_MENU]
+    pasos = [("menu", "quiero denunciar", "Iniciar el proceso"), ("menu", "1", "<strong>nombre_completo</strong>")]
+    for campo in campos[:campos.index("afectacion")]:
+        if campo == "telefono":
+            pasos.append(("duda_llm", "¿para qué necesitan mi teléfono?", None))
+        pasos.append(("campo_local", VALORES[campo], f"<strong>{campo}</strong>"))
+    pasos += [
+        ("narracion", VALORES["narraciones"], "Ejemplo de narración"),  # el primer mensaje solo muestra el ejemplo
+        ("narracion_llm", VALORES["narraciones"], "Narración agregada"),
+        ("narracion", "terminar", "Se han registrado tus narraciones"),
+        ("campo_llm", VALORES["afectacion"], "<strong>afectacion</strong>"),
+        ("medidas", "1", "medidas cautelares disponibles"),
+        ("medidas", "1,2", "Medidas cautelares seleccionadas"),
+        ("medidas", "terminar", "Se han registrado tus medidas cautelares"),
+        ("medidas", "2,5", "Medidas de protección seleccionadas"),
+        ("medidas", "terminar", "Se han registrado tus medidas de protección"),
+        ("medidas", "3", "Qué tipo de prueba"),
+        ("medidas", "3", "prueba documental"),
+    ]
+    # La prueba documental deja pendientes los campos de pruebas de la lista y luego los suyos
+    pendientes = LISTA_CAMPOS_DENUNCIA[inicio_pruebas:] + CAMPOS_DOCUMENTAL
+    for i, campo in enumerate(pendientes):
+        ultimo = i == len(pendientes) - 1
+        pasos.append(("generar_pdf" if ultimo else "campo_local", VALORES[campo],
+                      "/download_sue" if ultimo else f"<strong>{campo}</strong>"))
+    return pasos
+
+
+def datos_formulario():
+    """La denuncia completa como la recibe /generar_denuncia."""
+    datos = {campo: VALORES.get(campo, "") for campo in LISTA_CAMPOS_DENUNCIA}
+    datos.update(medidas_cautelares="- Retirar propaganda de espectaculares con lenguaje excluyente.",
+                 medidas_proteccion="- Prohibición de comunicarse con la víctima.",
+                 tipo_prueba="Documental Pública o Privada",
+                 autoridad_emite=VALORES["autoridad_emite"], acto_documento=VALORES["acto_documento"])
+    return datos
+
+
+async def esperar_audio(cliente, registro, recorrido, datos):
+    """Espera el audio pendiente de una respuesta (long-polling) y descarga el MP3."""
+    if datos.get("audio_job"):
+        listo = False
+        while not listo:
+            r = await paso(cliente, registro, recorrido, "tts_espera", "GET",
+                           f"/audio_status/{datos['audio_job']}", params={"esperar": 10})
+            estado = r.json()["status"]
+            if estado == "error":
+                raise Desvio("tts_espera: la síntesis falló")
+            listo = estado == "ready"
+    if datos.get("audio_response"):
+        await paso(cliente, registro, recorrido, "audio_descarga", "GET", datos["audio_response"], "audio/mpeg")
+
+
+async def denuncia(cliente, registro, numero):
+    await paso(cliente, registro, "denuncia", "pagina", "GET", "/")
+    for etapa, texto, esperado in guion_denuncia():
+        await mensaje(cliente, registro, "denuncia", etapa, texto, esperado)
+    await paso(cliente, registro, "denuncia", "descarga_pdf", "GET", "/download_sue", "application/pdf")
+
+
+async def orientacion(cliente, registro, numero):
+    await paso(cliente, registro, "orientacion", "pagina", "GET", "/")
+    await mensaje(cliente, registro, "orientacion", "chat_general", PREGUNTAS[numero % len(PREGUNTAS)])
+    await mensaje(cliente, registro, "orientacion", "menu", "quiero denunciar", "Iniciar el proceso")
+    await mensaje(cliente, registro, "orientacion", "orientacion", "2", "Te puedo ayudar en algo más")
+    await mensaje(cliente, registro, "orientacion", "chat_general", PREGUNTAS[(numero + 1) % len(PREGUNTAS)])
+    await mensaje(cliente, registro, "orientacion", "chat_stream", PREGUNTAS[(numero + 2) % len(PREGUNTAS)],
+                  "event: done", ruta="/chat_stream")
+
+
+async def voz(cliente, registro, numero):
+    await paso(cliente, registro, "voz", "pagina", "GET", "/movile")
+    for turno in range(2):
+        r = await paso(cliente, registro, "voz", "nota_de_voz", "POST", "/audio", "transcription",
+                       files={"audio": (f"nota_{numero}_{turno}.webm", NOTA_DE_VOZ, "audio/webm")},
+                       data={"voice": "1"})
+        await esperar_audio(cliente, registro, "voz", r.json())
+    r = await mensaje(cliente, registro, "voz", "chat_general", PREGUNTAS[numero % len(PREGUNTAS)], voz=True)
+    await esperar_audio(cliente, registro, "voz", r.json())
+
+
+async def formulario(cliente, registro, numero):
+    r = await paso(cliente, registro, "formulario", "generar_denuncia", "POST", "/generar_denuncia",
+                   "Denuncia generada", json=datos_formulario())
+    await paso(cliente, registro, "formulario", "descarga_pdf", "GET", r.json()["url"], "application/pdf")
+
+
+RECORRIDOS = {"denuncia": denuncia, "orientacion": orientacion, "voz": voz, "formulario": formulario}
+
+
+async def correr(nombre, cliente, registro, numero):
+    """Corre un recorrido y lo anota; devuelve el motivo del desvío o None."""
+    inicio = time.perf_counter()
+    try:
+        await RECORRIDOS[nombre](cliente, registro, numero)
+        desvio = None
+    except Desvio as e:
+        desvio = str(e)
+    registro.recorrido(nombre, time.perf_counter() - inicio, desvio)
+    return desvio
+
+
+async def una_vez(url, nombres):
+    registro = Registro()
+    bien = True
+    for numero, nombre in enumerate(nombres):
+        async with httpx.AsyncClient(base_url=url, timeout=120) as cliente:
+            desvio = await correr(nombre, cliente, registro, numero)
+        pasos = [p for p in registro.peticiones if p[0] == nombre]
+        print(f"{'✅' if desvio is None else '❌'} {nombre}: {len(pasos)} peticiones en "
+              f"{registro.recorridos[-1][1]:.2f} s{'' if desvio is None else f' — {desvio}'}")
+        bien = bien and desvio is None
+    return bien
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--recorridos", default=",".join(RECORRIDOS))
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(una_vez(args.url, args.recorridos.split(","))) else 1)
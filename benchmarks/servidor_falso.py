@@ -0,0 +1,220 @@
+"""
+Servidor falso con la forma de la API de OpenAI para las pruebas de carga:
+responde /v1/chat/completions (normal y en stream), /v1/audio/transcriptions
+(Whisper) y /tts (MP3 en silencio, en lugar de gTTS) después de una latencia
+con la distribución elegida, sin gastar tokens. La app se apunta a él con
+OPENAI_BASE_URL=http://127.0.0.1:<puerto>/v1; para el audio se arranca con
+benchmarks/con_tts_falso.py y TTS_FALSO_URL=http://127.0.0.1:<puerto>/tts.
+
+Latencias: --latencia (chat), --latencia-whisper y --latencia-tts son la
+mediana; --distribucion dice cómo se reparten alrededor de ella:
+  - fija: siempre la misma;
+  - uniforme (por defecto): entre (1 - variacion) y (1 + variacion) veces;
+  - lognormal: cola larga a la derecha, con sigma = --variacion.
+Cuando la app valida un dato del formulario con el LLM (el prompt pide la frase
+"se ha registrado <campo>"), la respuesta es esa frase, así que una denuncia
+completa avanza hasta el PDF (ver jornadas.py). Con --unicas una fracción de
+las respuestas del chat lleva un folio distinto: no las absorben las cachés
+de respuestas ni de audio.
+
+Para probar cliente_llm.py también simula fallas: una fracción --errores de
+las peticiones responde --codigo-error (con Retry-After si es 429) y una
+fracción --lentas tarda --latencia-lenta segundos (la cola de latencia).
+POST /config cambia cualquiera de estos valores sin reiniciar el servidor.
+GET /estadisticas incluye, por ruta, peticiones y segundos de espera simulada.
+
+Uso (desde la raíz del repo):
+    python benchmarks/servidor_falso.py [--puerto 8089] [--latencia 1.5] [--tokens 60]
+                                        [--distribucion uniforme] [--variacion 0.2]
+                                        [--latencia-whisper 0.75] [--latencia-tts 0.4] [--unicas 0]
+                                        [--errores 0] [--codigo-error 503] [--lentas 0] [--latencia-lenta 10]
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+RESPUESTA = ("Puedes presentar una queja ante el Instituto Electoral de tu entidad. La **LGAMVLV** considera "
+             "violencia política en razón de género impedir que una mujer ejerza su cargo.\n\n"
+             "1. Reúne las pruebas.\n2. Presenta la denuncia por escrito.\n3. Pide medidas cautelares.\n")
+CONFIRMACION = re.compile(r"se ha registrado \**(\w+)")
+DISTRIBUCIONES = ("fija", "uniforme", "lognormal")
+# Un cuadro MPEG-1 Layer III de 32 kbps en silencio (104 bytes, 26 ms): el audio de /tts son cuadros así
+CUADRO_MP3 = b"\xff\xfb\x10\x64" + bytes(100)
+CARACTERES_POR_SEGUNDO = 15  # ritmo de lectura de gTTS, para el tamaño del MP3
+
+config = {"latencia": 1.5, "variacion": 0.2, "tokens": 60, "distribucion": "uniforme",
+          "latencia_whisper": 0.75, "latencia_tts": 0.4, "unicas": 0.0,
+          "transcripcion": "¿Qué hago si no me dejan tomar protesta como regidora?",
+          "errores": 0.0, "codigo_error": 503, "lentas": 0.0, "latencia_lenta": 10.0}
+estadisticas = {"peticiones": 0, "en_vuelo": 0, "max_en_vuelo": 0, "errores": 0, "lentas": 0, "rutas": {}}
+
+
+def muestra(mediana):
+    """Segundos de una respuesta según config["distribucion"]."""
+    if config["distribucion"] == "fija":
+        return mediana
+    if config["distribucion"] == "lognormal":
+        return mediana * random.lognormvariate(0, config["variacion"])
+    return mediana * random.uniform(1 - config["variacion"], 1 + config["variacion"])
+
+
+def acumular(ruta, segundos, peticiones=0):
+    por_ruta = estadisticas["rutas"].setdefault(ruta, {"peticiones": 0, "segundos": 0.0})
+    por_ruta["peticiones"] += peticiones
+    por_ruta["segundos"] += segundos
+
+
+async def esperar(ruta, mediana):
+    estadisticas["peticiones"] += 1
+    estadisticas["en_vuelo"] += 1
+    estadisticas["max_en_vuelo"] = max(estadisticas["max_en_vuelo"], estadisticas["en_vuelo"])
+    segundos = muestra(mediana)
+    if random.random() < config["lentas"]:
+        estadisticas["lentas"] += 1
+        segundos = config["latencia_lenta"]
+    inicio = time.perf_counter()
+    try:
+        await asyncio.sleep(segundos)
+    finally:
+        estadisticas["en_vuelo"] -= 1
+        acumular(ruta, time.perf_counter() - inicio, peticiones=1)
+
+
+def error_simulado():
+    """Respuesta de error con la forma de la API, o None si esta petición no falla."""
+    if random.random() >= config["errores"]:
+        return None
+    estadisticas["errores"] += 1
+    encabezados = {"retry-after-ms": "200"} if config["codigo_error"] == 429 else None
+    return JSONResponse({"error": {"message": "Falla simulada", "type": "server_error", "code": None}},
+                        status_code=config["codigo_error"], headers=encabezados)
+
+
+def texto_para(mensajes):
+    """La frase que pide el prompt de validación del formulario, o la respuesta de orientación."""
+    for mensaje in mensajes:
+        if mensaje.get("role") == "system" and isinstance(mensaje.get("content"), str):
+            confirmacion = CONFIRMACION.search(mensaje["content"])
+            if confirmacion:
+                return f"✅ Se ha registrado {confirmacion.group(1)}."
+    if random.random() < config["unicas"]:
+        return f"{RESPUESTA}\nFolio de orientación: {uuid.uuid4().hex[:8]}.\n"
+    return RESPUESTA
+
+
+def fragmentos(texto):
+    palabras = texto.split(" ")
+    por_token = max(1, len(palabras) // config["tokens"])
+    for i in range(0, len(palabras), por_token):
+        yield " ".join(palabras[i:i + por_token]) + " "
+
+
+def completion_json(texto):
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+        "model": "gpt-4-turbo",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": texto}}],
+        "usage": {"prompt_tokens": 500, "completion_tokens": config["tokens"], "total_tokens": 500 + config["tokens"]},
+    }
+
+
+async def chat_completions(request):
+    cuerpo = await request.json()
+    texto = texto_para(cuerpo.get("messages", []))
+    if not cuerpo.get("stream"):
+        await esperar("chat", config["latencia"])
+        return error_simulado() or JSONResponse(completion_json(texto))
+    error = error_simulado()
+    if error is not None:
+        return error
+
+    async def eventos():
+        # El primer token llega a un tercio de la latencia y el resto se reparte en lo que queda
+        await esperar("chat_stream", config["latencia"] / 3)
+        partes = list(fragmentos(texto))
+        identificador = f"chatcmpl-{uuid.uuid4().hex}"
+        inicio = time.perf_counter()
+        for parte in partes:
+            chunk = {"id": identificador, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": "gpt-4-turbo",
+                     "choices": [{"index": 0, "delta": {"content": parte}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(config["latencia"] * 2 / 3 / len(partes))
+        acumular("chat_stream", time.perf_counter() - inicio)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(eventos(), media_type="text/event-stream")
+
+
+async def transcripciones(request):
+    await request.body()
+    await esperar("whisper", config["latencia_whisper"])
+    return error_simulado() or JSONResponse({"text": config["transcripcion"]})
+
+
+async def tts(request):
+    """POST {"texto", "lang", "voz"} -> MP3 en silencio de la duración que tendría leído en voz alta."""
+    cuerpo = await request.json()
+    await esperar("tts", config["latencia_tts"])
+    error = error_simulado()
+    if error is not None:
+        return error
+    segundos = max(1.0, len(cuerpo.get("texto", "")) / CARACTERES_POR_SEGUNDO)
+    return Response(CUADRO_MP3 * int(segundos / 0.026), media_type="audio/mpeg")
+
+
+async def ver_estadisticas(request):
+    return JSONResponse(estadisticas)
+
+
+async def cambiar_config(request):
+    """POST /config con un JSON de los valores a cambiar (p. ej. {"errores": 1}); devuelve la configuración."""
+    cambios = await request.json()
+    desconocidos = set(cambios) - set(config)
+    if desconocidos:
+        return JSONResponse({"error": f"Claves desconocidas: {sorted(desconocidos)}"}, status_code=400)
+    if cambios.get("distribucion", config["distribucion"]) not in DISTRIBUCIONES:
+        return JSONResponse({"error": f"distribucion debe ser una de {list(DISTRIBUCIONES)}"}, status_code=400)
+    config.update(cambios)
+    return JSONResponse(config)
+
+
+aplicacion = Starlette(routes=[
+    Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+    Route("/v1/audio/transcriptions", transcripciones, methods=["POST"]),
+    Route("/tts", tts, methods=["POST"]),
+    Route("/estadisticas", ver_estadisticas),
+    Route("/config", cambiar_config, methods=["POST"]),
+])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puerto", type=int, default=8089)
+    parser.add_argument("--latencia", type=float, default=config["latencia"], help="segundos por respuesta")
+    parser.add_argument("--tokens", type=int, default=config["tokens"], help="fragmentos por respuesta en stream")
+    parser.add_argument("--distribucion", choices=DISTRIBUCIONES, default=config["distribucion"])
+    parser.add_argument("--variacion", type=float, default=config["variacion"])
+    parser.add_argument("--latencia-whisper", type=float, default=config["latencia_whisper"])
+    parser.add_argument("--latencia-tts", type=float, default=config["latencia_tts"])
+    parser.add_argument("--unicas", type=float, default=config["unicas"],
+                        help="fracción de respuestas del chat que no se repiten")
+    parser.add_argument("--errores", type=float, default=config["errores"], help="fracción de peticiones que fallan")
+    parser.add_argument("--codigo-error", type=int, default=config["codigo_error"])
+    parser.add_argument("--lentas", type=float, default=config["lentas"], help="fracción de peticiones lentas")
+    parser.add_argument("--latencia-lenta", type=float, default=config["latencia_lenta"])
+    args = parser.parse_args()
+    config.update(latencia=args.latencia, tokens=args.tokens, distribucion=args.distribucion,
+                  variacion=args.variacion, latencia_whisper=args.latencia_whisper, latencia_tts=args.latencia_tts,
+                  unicas=args.unicas, errores=args.errores, codigo_error=args.codigo_error,
+                  lentas=args.lentas, latencia_lenta=args.latencia_lenta)
+    uvicorn.run(aplicacion, host="127.0.0.1", port=args.puerto, log_level="warning", backlog=4096)
@@ -0,0 +1,219 @@
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+from cache_busqueda import ids_cercanos, normalizar_consulta
+from fragmentador_legal import PATRON_ENCABEZADO, SUFIJOS_ARTICULO, clave_articulo, quitar_acentos
+
+# ----------------------------------------------------------------------
+#            RECUPERACIÓN HÍBRIDA: BM25 + FAISS + RE-RANKING
+# ----------------------------------------------------------------------
+# La búsqueda densa falla justo en consultas como "artículo 461 de la LGIPE":
+# el número y la sigla pesan poco en el embedding. Aquí se combina:
+#   1) FAISS (denso, con la caché de cache_busqueda),
+#   2) BM25 sobre los mismos fragmentos (índice invertido en memoria),
+#   3) coincidencia exacta de artículo/documento cuando la consulta los menciona,
+# fusionados por Reciprocal Rank Fusion. Opcionalmente un cross-encoder local
+# (RERANKER_MODELO) reordena los mejores candidatos en CPU.
+#
+# Cada resultado lleva metadatos de documento, página y artículo para citarlos.
+
+RRF_K = 60
+PESO_ARTICULO_CITADO = 2.0  # la mención explícita de un artículo pesa más que BM25 o FAISS
+CANDIDATOS = int(os.getenv("BUSQUEDA_CANDIDATOS", "20"))  # por cada lista antes de fusionar
+BM25_K1 = 1.5
+BM25_B = 0.75
+RERANKER_MODELO = os.getenv("RERANKER_MODELO", "")  # ej: cross-encoder/mmarco-mMiniLMv2-L12-H384-v1
+
+# Siglas con que los usuarios citan cada documento -> prefijo del nombre del PDF
+SIGLAS_DOCUMENTOS = {
+    "cpeum": "CPEUM",
+    "lgamvlv": "LEY_GENERAL_DE_ACCESO_DE_LAS_MUJERES",
+    "lgipe": "LEY_GENERAL_DE_INSTITUCIONES_Y_PROCEDIMIENTOS",
+    "lgv": "LEY_GENERAL_DE_VICTIMAS",
+    "lgmde": "LEY_GENERAL_EN_MATERIA_DE_DELITOS",
+    "reglamento": "REGLAMENTO DE QUEJAS",
+}
+ALIAS_DOCUMENTOS = {
+    "constitucion": "cpeum",
+    "ley de acceso": "lgamvlv",
+    "ley general de instituciones": "lgipe",
+    "ley de victimas": "lgv",
+    "ley general de victimas": "lgv",
+    "delitos electorales": "lgmde",
+    "reglamento de quejas": "reglamento",
+}
+
+PATRON_CONSULTA = re.compile(rf"\b(?:articulo|art)\s*(\d+)\s*(?:o|º|°)?\s*({SUFIJOS_ARTICULO})?\b")
+
+PALABRAS_VACIAS = {
+    "a", "al", "de", "del", "el", "en", "la", "las", "lo", "los", "o", "para", "por",
+    "que", "se", "su", "sus", "un", "una", "y", "con", "es", "como", "me", "mi", "le",
+}
+
+_indices = {}  # versión del índice FAISS -> IndiceBM25
+_indices_lock = threading.Lock()
+_reranker = None
+
+
+def tokenizar(texto):
+    return [t for t in normalizar_consulta(texto).split() if t not in PALABRAS_VACIAS]
+
+
+def sigla_documento(fuente):
+    nombre = os.path.basename(fuente or "")
+    for sigla, prefijo in SIGLAS_DOCUMENTOS.items():
+        if nombre.startswith(prefijo):
+            return sigla
+    return os.path.splitext(nombre)[0]
+
+
+class IndiceBM25:
+    """Índice invertido BM25 sobre los fragmentos del docstore de FAISS."""
+
+    def __init__(self, db_instance):
+        self.ids = []
+        self.metadatos = {}
+        self.postings = defaultdict(list)  # término -> [(posición, frecuencia)]
+        self.longitudes = []
+        self.por_articulo = defaultdict(set)  # (sigla, artículo) -> {posición}
+        self.encabezados = []  # artículos que empiezan dentro de cada fragmento
+
+        docs = [(id_fragmento, db_instance.docstore.search(id_fragmento))
+                for id_fragmento in db_instance.index_to_docstore_id.values()]
+        # Orden de lectura para arrastrar el artículo en curso entre fragmentos
+        docs.sort(key=lambda par: (par[1].metadata.get("source", ""), par[1].metadata.get("page", 0)))
+
+        articulo_en_curso = {}
+        for posicion, (id_fragmento, doc) in enumerate(docs):
+            sigla = sigla_documento(doc.metadata.get("source"))
+            texto = quitar_acentos(doc.page_content)
+            articulos = [clave_articulo(n, s) for n, s in PATRON_ENCABEZADO.findall(texto)]
+            self.encabezados.append(set(articulos))
+            if doc.metadata.get("articulos"):  # Fragmentos de fragmentador_legal
+                articulos = doc.metadata["articulos"] + articulos
+            elif sigla in articulo_en_curso and not texto.lstrip().lower().startswith("articulo"):
+                articulos = [articulo_en_curso[sigla]] + articulos  # El fragmento continúa un artículo
+            if articulos:
+                articulo_en_curso[sigla] = articulos[-1]
+
+            self.ids.append(id_fragmento)
+            self.metadatos[id_fragmento] = {
+                "documento": sigla,
+                "pagina": doc.metadata.get("page", 0) + 1,
+                "articulos": list(dict.fromkeys(articulos)),
+            }
+            for articulo in articulos:
+                self.por_articulo[(sigla, articulo)].add(posicion)
+
+            terminos = Counter(tokenizar(doc.page_content))
+            self.longitudes.append(sum(terminos.values()))
+            for termino, frecuencia in terminos.items():
+                self.postings[termino].append((posicion, frecuencia))
+
+        self.promedio = (sum(self.longitudes) / len(self.longitudes)) if self.longitudes else 0.0
+
+    def buscar(self, query, k):
+        """Posiciones de los k fragmentos con mayor puntaje BM25."""
+        puntajes = defaultdict(float)
+        total = len(self.ids)
+        for termino in set(tokenizar(query)):
+            postings = self.postings.get(termino)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for posicion, frecuencia in postings:
+                norma = BM25_K1 * (1 - BM25_B + BM25_B * self.longitudes[posicion] / self.promedio)
+                puntajes[posicion] += idf * frecuencia * (BM25_K1 + 1) / (frecuencia + norma)
+        return sorted(puntajes, key=puntajes.get, reverse=True)[:k], puntajes
+
+    def articulos_citados(self, query, puntajes):
+        """Fragmentos del artículo (y documento) que la consulta menciona explícitamente."""
+        texto = normalizar_consulta(query)
+        citados = [clave_articulo(n, s) for n, s in PATRON_CONSULTA.findall(texto)]
+        if not citados:
+            return []
+        siglas = {s for s in SIGLAS_DOCUMENTOS if re.search(rf"\b{s}\b", texto)}
+        siglas |= {sigla for alias, sigla in ALIAS_DOCUMENTOS.items() if alias in texto}
+        posiciones = set()
+        for (sigla, articulo), encontradas in self.por_articulo.items():
+            if articulo in citados and (not siglas or sigla in siglas):
+                posiciones |= encontradas
+        # Primero los fragmentos donde empieza el artículo citado, luego por BM25
+        return sorted(posiciones, reverse=True, key=lambda p: (
+            any(a in self.encabezados[p] for a in citados), puntajes.get(p, 0.0)))
+
+
+def indice_bm25(db_instance):
+    version = getattr(db_instance, "manifiesto", {}).get("version", id(db_instance))
+    indice = _indices.get(version)
+    if indice is None:
+        with _indices_lock:
+            indice = _indices.get(version)
+            if indice is None:
+                indice = IndiceBM25(db_instance)
+                _indices.clear()  # Solo se conserva el índice vigente
+                _indices[version] = indice
+                print(f"🔎 Índice BM25 construido ({len(indice.ids)} fragmentos).")
+    return indice
+
+
+def fusionar(listas, pesos=None, k=RRF_K):
+    """Reciprocal Rank Fusion (ponderada) de varias listas ordenadas de ids."""
+    puntajes = defaultdict(float)
+    for lista, peso in zip(listas, pesos or [1.0] * len(listas)):
+        for rango, id_fragmento in enumerate(lista):
+            puntajes[id_fragmento] += peso / (k + rango + 1)
+    return sorted(puntajes, key=puntajes.get, reverse=True)
+
+
+def obtener_reranker():
+    """El cross-encoder de RERANKER_MODELO (se carga una vez por proceso) o None."""
+    global _reranker
+    if RERANKER_MODELO and _reranker is None:
+        from sentence_transformers import CrossEncoder
+
+        _reranker = CrossEncoder(RERANKER_MODELO, device="cpu")
+    return _reranker
+
+
+def reordenar(query, docs):
+    """Reordena con el cross-encoder si está configurado."""
+    if not RERANKER_MODELO or len(docs) < 2:
+        return docs
+    puntajes = obtener_reranker().predict([(query, doc.page_content) for doc in docs])
+    return [doc for _, doc in sorted(zip(puntajes, docs), key=lambda par: par[0], reverse=True)]
+
+
+def buscar_hibrido(db_instance, query, top_k=3):
+    """Fragmentos más relevantes para `query`, con metadatos de documento, página y artículo."""
+    from langchain_core.documents import Document  # ya importado por el índice; no al arrancar la app
+
+    bm25 = indice_bm25(db_instance)
+    densos = ids_cercanos(db_instance, query, CANDIDATOS)
+    posiciones, puntajes = bm25.buscar(query, CANDIDATOS)
+    exactos = bm25.articulos_citados(query, puntajes)[:CANDIDATOS]
+
+    fusion = fusionar([densos, [bm25.ids[p] for p in posiciones], [bm25.ids[p] for p in exactos]],
+                      pesos=[1.0, 1.0, PESO_ARTICULO_CITADO])
+    candidatos = fusion[:CANDIDATOS if RERANKER_MODELO else top_k]
+
+    docs = []
+    for id_fragmento in candidatos:
+        doc = db_instance.docstore.search(id_fragmento)
+        meta = bm25.metadatos.get(id_fragmento, {})
+        docs.append(Document(page_content=doc.page_content, metadata=dict(
+            doc.metadata, documento=meta.get("documento"), pagina=meta.get("pagina"),
+            articulo=(meta.get("articulos") or [None])[0], articulos=meta.get("articulos", []))))
+    return reordenar(query, docs)[:top_k]
+
+
+def cita(doc):
+    """'LGIPE, pág. 221, arts. 460, 461' para anteponer al fragmento en el contexto del LLM."""
+    partes = [doc.metadata.get("documento", "").upper(), f"pág. {doc.metadata.get('pagina')}"]
+    articulos = doc.metadata.get("articulos") or ([doc.metadata["articulo"]] if doc.metadata.get("articulo") else [])
+    if articulos:
+        partes.append(("art. " if len(articulos) == 1 else "arts. ") + ", ".join(articulos))
+    return ", ".join(p for p in partes if p)
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import threading
+import time
+
+# ----------------------------------------------------------------------
+#                   CACHÉ PERSISTENTE DE AUDIO (TTS)
+# ----------------------------------------------------------------------
+# Los archivos se nombran con un digest estable de (texto, idioma, voz), así que
+# el mismo mensaje produce siempre el mismo MP3 sin importar el proceso o el
+# reinicio. Como la caché vive en disco, todos los workers de gunicorn la comparten.
+# El orden LRU se lleva con el mtime de cada archivo (se "toca" en cada acierto).
+
+AUDIO_OUTPUT_FOLDER = "static/audio"
+AUDIO_LANG = "es"
+AUDIO_VOZ = os.getenv("TTS_VOZ", "com")  # tld de gTTS (acento)
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024
+AUDIO_CACHE_MAX_AGE = int(os.getenv("AUDIO_CACHE_MAX_DIAS", "30")) * 24 * 3600
+AUDIO_CACHE_BARRIDO_CADA = 25  # escrituras entre cada barrido de desalojo
+
+os.makedirs(AUDIO_OUTPUT_FOLDER, exist_ok=True)
+
+_lock = threading.Lock()
+_locks_por_clave = {}  # Evita sintetizar dos veces el mismo texto en paralelo
+_escrituras_desde_barrido = 0
+_estadisticas = {
+    "aciertos": 0,
+    "fallos": 0,
+    "segundos_sintesis": 0.0,
+    "caracteres_sintetizados": 0,
+    "omitidos_sin_voz": 0,
+    "caracteres_omitidos": 0,
+    "desalojados": 0,
+    "archivos": 0,
+    "bytes": 0,
+}
+
+
+def clave_audio(texto, lang=AUDIO_LANG, voz=AUDIO_VOZ):
+    """Digest estable (no usa hash() de Python, que cambia entre procesos)."""
+    contenido = f"{lang}\x00{voz}\x00{texto}".encode("utf-8")
+    return hashlib.sha256(contenido).hexdigest()[:32]
+
+
+def ruta_audio(clave):
+    return os.path.join(AUDIO_OUTPUT_FOLDER, f"{clave}.mp3")
+
+
+def url_audio(clave):
+    return f"/{AUDIO_OUTPUT_FOLDER}/{clave}.mp3"
+
+
+def sintetizar(texto, ruta, lang=AUDIO_LANG, voz=AUDIO_VOZ):
+    """Genera el MP3 con gTTS escribiendo primero a un temporal (escritura atómica)."""
+    import gtts  # Google Text-to-Speech; trae requests, así que se importa con el primer audio
+
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        gtts.gTTS(texto, lang=lang, tld=voz).save(temporal)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def obtener_audio(texto, lang=AUDIO_LANG, voz=AUDIO_VOZ):
+    """Devuelve la URL del audio del texto, sintetizándolo solo si no está en caché."""
+    global _escrituras_desde_barrido
+    clave = clave_audio(texto, lang, voz)
+    ruta = ruta_audio(clave)
+
+    if _tocar(ruta):
+        _contar("aciertos")
+        return url_audio(clave)
+
+    with _lock:
+        lock_clave = _locks_por_clave.setdefault(clave, threading.Lock())
+
+    try:
+        with lock_clave:
+            # Otro hilo pudo haberlo generado mientras esperábamos
+            if _tocar(ruta):
+                _contar("aciertos")
+                return url_audio(clave)
+
+            inicio = time.perf_counter()
+            sintetizar(texto, ruta, lang, voz)
+            duracion = time.perf_counter() - inicio
+    finally:
+        with _lock:
+            _locks_por_clave.pop(clave, None)
+
+    with _lock:
+        _estadisticas["fallos"] += 1
+        _estadisticas["segundos_sintesis"] += duracion
+        _estadisticas["caracteres_sintetizados"] += len(texto)
+        _escrituras_desde_barrido += 1
+        barrer = _escrituras_desde_barrido >= AUDIO_CACHE_BARRIDO_CADA
+        if barrer:
+            _escrituras_desde_barrido = 0
+
+    if barrer:
+        desalojar()
+
+    return url_audio(clave)
+
+
+def desalojar():
+    """Elimina audios vencidos por edad y luego los menos usados hasta respetar el tamaño máximo."""
+    ahora = time.time()
+    archivos = []
+    for nombre in os.listdir(AUDIO_OUTPUT_FOLDER):
+        if not nombre.endswith(".mp3"):
+            continue
+        ruta = os.path.join(AUDIO_OUTPUT_FOLDER, nombre)
+        try:
+            info = os.stat(ruta)
+        except FileNotFoundError:
+            continue  # Otro worker ya lo eliminó
+        archivos.append((info.st_mtime, info.st_size, ruta))
+
+    archivos.sort()  # Los menos usados primero
+    total = sum(tamano for _, tamano, _ in archivos)
+    eliminados = 0
+    conservados = []
+    for mtime, tamano, ruta in archivos:
+        if ahora - mtime > AUDIO_CACHE_MAX_AGE or total > AUDIO_CACHE_MAX_BYTES:
+            try:
+                os.remove(ruta)
+                eliminados += 1
+            except FileNotFoundError:
+                pass
+            total -= tamano
+        else:
+            conservados.append(ruta)
+
+    with _lock:
+        _estadisticas["desalojados"] += eliminados
+        _estadisticas["archivos"] = len(conservados)
+        _estadisticas["bytes"] = total
+
+    if eliminados:
+        print(f"🧹 Caché de audio: {eliminados} archivos desalojados ({total // 1024} KB en disco).")
+
+
+def registrar_omitido(texto):
+    """Cuenta una síntesis evitada porque el cliente no va a reproducir el audio."""
+    with _lock:
+        _estadisticas["omitidos_sin_voz"] += 1
+        _estadisticas["caracteres_omitidos"] += len(texto)
+
+
+def estadisticas_audio():
+    with _lock:
+        stats = dict(_estadisticas)
+    consultas = stats["aciertos"] + stats["fallos"]
+    stats["tasa_aciertos"] = round(stats["aciertos"] / consultas, 3) if consultas else 0.0
+    # Estimación del tiempo de síntesis evitado según el costo medio por carácter observado
+    if stats["caracteres_sintetizados"]:
+        por_caracter = stats["segundos_sintesis"] / stats["caracteres_sintetizados"]
+        stats["segundos_ahorrados_sin_voz"] = round(stats["caracteres_omitidos"] * por_caracter, 2)
+    return stats
+
+
+def _tocar(ruta):
+    """Marca el archivo como usado recientemente; False si no existe."""
+    try:
+        os.utime(ruta, None)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _contar(campo):
+    with _lock:
+        _estadisticas[campo] += 1
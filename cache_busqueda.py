@@ -0,0 +1,116 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# ----------------------------------------------------------------------
+#             CACHÉ DE EMBEDDINGS Y RESULTADOS DE BÚSQUEDA (RAG)
+# ----------------------------------------------------------------------
+# Dos niveles en memoria, con TTL y desalojo LRU:
+#   1) texto normalizado de la consulta -> embedding
+#   2) (embedding, top_k, versión del índice) -> ids de los fragmentos
+# Los usuarios repiten mucho las mismas preguntas, así que una consulta repetida
+# no vuelve a embeberse ni a recorrer FAISS. La versión del índice forma parte de
+# la clave del segundo nivel: tras /reload_index los resultados viejos ya no se
+# encuentran (y además se vacía con invalidar_busquedas()).
+
+BUSQUEDA_CACHE_MAX = int(os.getenv("BUSQUEDA_CACHE_MAX", "1024"))
+BUSQUEDA_CACHE_TTL = int(os.getenv("BUSQUEDA_CACHE_TTL", "3600"))  # segundos
+
+
+class CacheLRU:
+    """Diccionario acotado con caducidad; seguro entre hilos."""
+
+    def __init__(self, maximo=BUSQUEDA_CACHE_MAX, ttl=BUSQUEDA_CACHE_TTL):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (expira, valor)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] < time.monotonic():
+                self._datos.pop(clave, None)
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def vaciar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 3) if consultas else 0.0,
+                "entradas": len(self._datos),
+            }
+
+
+_embeddings = CacheLRU()
+_resultados = CacheLRU()
+
+
+def normalizar_consulta(texto):
+    """'¿Qué es  violencia política?' y 'que es violencia politica' comparten entrada."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^\w\s]", " ", texto)
+    return " ".join(texto.split())
+
+
+def embeber_consulta(embeddings, query):
+    """Embedding de la consulta (primer nivel de la caché)."""
+    clave_texto = normalizar_consulta(query)
+    vector = _embeddings.obtener(clave_texto)
+    if vector is None:
+        import numpy as np  # no hace falta al arrancar la app
+
+        vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        _embeddings.guardar(clave_texto, vector)
+    return vector
+
+
+def ids_cercanos(db_instance, query, top_k=3):
+    """Ids de docstore de los fragmentos más cercanos a `query`, pasando por los dos niveles de caché."""
+    vector = embeber_consulta(db_instance.embedding_function, query)
+    version = getattr(db_instance, "manifiesto", {}).get("version", id(db_instance))
+    clave = (hashlib.sha256(vector.tobytes()).hexdigest(), top_k, version)
+    ids = _resultados.obtener(clave)
+    if ids is None:
+        _, posiciones = db_instance.index.search(vector.reshape(1, -1), top_k)
+        ids = [db_instance.index_to_docstore_id[i] for i in posiciones[0] if i != -1]
+        _resultados.guardar(clave, ids)
+    return ids
+
+
+def buscar_fragmentos(db_instance, query, top_k=3):
+    """Documentos más cercanos a `query` (solo búsqueda densa)."""
+    return [db_instance.docstore.search(id_fragmento) for id_fragmento in ids_cercanos(db_instance, query, top_k)]
+
+
+def invalidar_busquedas():
+    """Olvida los resultados (se llama al cambiar el índice). Los embeddings siguen valiendo."""
+    _resultados.vaciar()
+
+
+def estadisticas_busqueda():
+    return {"embeddings": _embeddings.estadisticas(), "resultados": _resultados.estadisticas()}
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import threading
+import time
+
+from cache_busqueda import embeber_consulta
+
+# ----------------------------------------------------------------------
+#               CACHÉ SEMÁNTICA DE RESPUESTAS DEL CHAT GENERAL
+# ----------------------------------------------------------------------
+# La mayoría de las primeras preguntas son variantes de las mismas dudas
+# ("¿qué es violencia política?"). Se embebe la pregunta y, si una respuesta
+# anterior del mismo ámbito supera el umbral de similitud coseno, se devuelve
+# sin llamar al LLM (el audio sale de la caché de TTS porque el texto es el mismo).
+#
+# El ámbito es (versión del prompt de sistema, profundidad de la conversación):
+# cambiar SYSTEM_PROMPT invalida todo y una pregunta a mitad de conversación no
+# recibe la respuesta pensada para un primer turno. Por defecto solo se guardan
+# primeros turnos (RESPUESTAS_CACHE_PROFUNDIDAD=0), que no dependen del historial.
+# El encabezado X-Cache-Bypass: 1 fuerza una respuesta nueva del LLM.
+
+RESPUESTAS_CACHE_UMBRAL = float(os.getenv("RESPUESTAS_CACHE_UMBRAL", "0.92"))
+RESPUESTAS_CACHE_PROFUNDIDAD = int(os.getenv("RESPUESTAS_CACHE_PROFUNDIDAD", "0"))
+RESPUESTAS_CACHE_MAX = int(os.getenv("RESPUESTAS_CACHE_MAX", "512"))
+RESPUESTAS_CACHE_TTL = int(os.getenv("RESPUESTAS_CACHE_TTL", str(24 * 3600)))  # segundos
+
+_entradas = {}  # ámbito -> {clave_pregunta: entrada}
+_lock = threading.Lock()
+_embeddings = None
+_estadisticas = {
+    "aciertos": 0,
+    "fallos": 0,
+    "omitidos": 0,
+    "guardados": 0,
+    "desalojados": 0,
+    "segundos_ahorrados": 0.0,
+}
+
+
+def version_prompt(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def profundidad_conversacion(messages):
+    """Turnos del usuario que ya hay en el historial (sin contar el mensaje actual)."""
+    return sum(1 for m in messages if m.get("role") == "user")
+
+
+def buscar_respuesta(pregunta, prompt, profundidad):
+    """Respuesta guardada para una pregunta equivalente del mismo ámbito, o None."""
+    if profundidad > RESPUESTAS_CACHE_PROFUNDIDAD:
+        return None
+    vector = _vector(pregunta)
+    ahora = time.monotonic()
+    import numpy as np  # no hace falta al arrancar la app
+
+    with _lock:
+        entradas = _entradas.get((version_prompt(prompt), profundidad), {})
+        mejor, similitud = None, RESPUESTAS_CACHE_UMBRAL
+        for entrada in entradas.values():
+            if ahora - entrada["creado"] > RESPUESTAS_CACHE_TTL:
+                continue
+            valor = float(np.dot(vector, entrada["vector"]))
+            if valor >= similitud:
+                mejor, similitud = entrada, valor
+        if mejor is None:
+            _estadisticas["fallos"] += 1
+            return None
+        mejor["usado"] = ahora
+        _estadisticas["aciertos"] += 1
+        _estadisticas["segundos_ahorrados"] += mejor["segundos"]
+    print(f"♻️ Respuesta servida desde la caché semántica (similitud {similitud:.3f}).")
+    return mejor["respuesta"]
+
+
+def guardar_respuesta(pregunta, prompt, profundidad, respuesta, segundos):
+    """Guarda la respuesta del LLM junto con lo que tardó en generarse."""
+    if profundidad > RESPUESTAS_CACHE_PROFUNDIDAD or not respuesta.strip():
+        return
+    try:
+        vector = _vector(pregunta)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar la respuesta en caché: {str(e)}")
+        return
+    ahora = time.monotonic()
+    with _lock:
+        entradas = _entradas.setdefault((version_prompt(prompt), profundidad), {})
+        entradas[hashlib.sha256(vector.tobytes()).hexdigest()] = {
+            "vector": vector, "respuesta": respuesta, "segundos": segundos,
+            "creado": ahora, "usado": ahora,
+        }
+        _estadisticas["guardados"] += 1
+        _desalojar(ahora)
+
+
+def registrar_omitido():
+    """Cuenta una petición que pidió saltarse la caché (X-Cache-Bypass)."""
+    with _lock:
+        _estadisticas["omitidos"] += 1
+
+
+def estadisticas_respuestas():
+    with _lock:
+        stats = dict(_estadisticas)
+        stats["entradas"] = sum(len(e) for e in _entradas.values())
+    consultas = stats["aciertos"] + stats["fallos"]
+    stats["tasa_aciertos"] = round(stats["aciertos"] / consultas, 3) if consultas else 0.0
+    stats["segundos_ahorrados"] = round(stats["segundos_ahorrados"], 2)
+    return stats
+
+
+def _vector(pregunta):
+    import numpy as np
+
+    global _embeddings
+    if _embeddings is None:
+        from indice import crear_embeddings  # langchain y faiss, solo cuando hace falta
+
+        _embeddings = crear_embeddings()
+    vector = embeber_consulta(_embeddings, pregunta)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def _desalojar(ahora):
+    """Quita las entradas vencidas y luego las menos usadas (se llama con _lock tomado)."""
+    todas = [(entrada["usado"], ambito, clave)
+             for ambito, entradas in _entradas.items()
+             for clave, entrada in entradas.items()]
+    vencidas = [(u, a, c) for u, a, c in todas if ahora - _entradas[a][c]["creado"] > RESPUESTAS_CACHE_TTL]
+    sobrantes = sorted(set(todas) - set(vencidas))[:max(0, len(todas) - len(vencidas) - RESPUESTAS_CACHE_MAX)]
+    for _, ambito, clave in vencidas + sobrantes:
+        del _entradas[ambito][clave]
+        _estadisticas["desalojados"] += 1
@@ -0,0 +1,406 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# ----------------------------------------------------------------------
+#          PASARELA HACIA OPENAI: PLAZOS, REINTENTOS Y CIRCUITO
+# ----------------------------------------------------------------------
+# Todas las llamadas al LLM (chat, stream, Whisper y resúmenes del historial)
+# pasan por aquí. El SDK por defecto espera hasta 10 minutos por respuesta y
+# reintenta sin tope de tiempo: una respuesta lenta fijaba un hilo del worker y
+# una caída de OpenAI se llevaba todas las rutas con ella.
+#   - Pool HTTP explícito de LLM_CONEXIONES conexiones, con un timeout de
+#     conexión corto (LLM_TIMEOUT_CONEXION).
+#   - Plazo por llamada (LLM_PLAZO): incluye los reintentos y sus esperas; cada
+#     intento recibe como timeout lo que queda del plazo.
+#   - Reintentos (LLM_REINTENTOS) solo de errores transitorios (conexión,
+#     timeout, 408, 409, 429 y 5xx), con espera exponencial y jitter completo;
+#     se respeta Retry-After si cabe en el plazo.
+#   - Cobertura (hedging, LLM_COBERTURA_MS): si un intento no responde en ese
+#     tiempo ("p95": el p95 observado) se lanza otro igual y gana el primero.
+#     Solo en completions sin stream, y con un saldo de LLM_COBERTURA_MAX
+#     coberturas por llamada para no duplicar la carga durante una caída.
+#   - Circuito: si fallan LLM_CIRCUITO_FALLOS de los últimos
+#     LLM_CIRCUITO_VENTANA intentos se abre (con varias conversaciones a la vez
+#     unos cuantos fallos seguidos pasan aunque OpenAI esté sano) y las
+#     llamadas fallan al instante con LLMNoDisponible durante
+#     LLM_CIRCUITO_ESPERA s; luego pasa un solo intento de prueba y, según le
+#     vaya, el circuito se cierra o vuelve a abrirse. Quien llama responde con
+#     la caché semántica o un texto fijo (ver app.respuesta_de_respaldo).
+# El estado es por proceso: cada worker tiene su circuito y sus métricas.
+# asgi.py comparte ambos a través de llamar_async.
+
+LLM_CONEXIONES = int(os.getenv("LLM_CONEXIONES", "50"))
+LLM_TIMEOUT_CONEXION = float(os.getenv("LLM_TIMEOUT_CONEXION", "5"))
+LLM_PLAZO = float(os.getenv("LLM_PLAZO", "30"))  # segundos por llamada, reintentos incluidos
+LLM_REINTENTOS = int(os.getenv("LLM_REINTENTOS", "2"))
+LLM_ESPERA_BASE = float(os.getenv("LLM_ESPERA_BASE", "0.5"))
+LLM_ESPERA_MAX = float(os.getenv("LLM_ESPERA_MAX", "8"))
+LLM_COBERTURA_MS = os.getenv("LLM_COBERTURA_MS", "0")  # 0 = sin cobertura, milisegundos o "p95"
+LLM_COBERTURA_MAX = float(os.getenv("LLM_COBERTURA_MAX", "0.1"))
+LLM_COBERTURA_RAFAGA = 10  # coberturas que se pueden juntar en el saldo
+LLM_CIRCUITO_FALLOS = int(os.getenv("LLM_CIRCUITO_FALLOS", "15"))
+LLM_CIRCUITO_VENTANA = int(os.getenv("LLM_CIRCUITO_VENTANA", "30"))
+LLM_CIRCUITO_ESPERA = float(os.getenv("LLM_CIRCUITO_ESPERA", "30"))
+LLM_MUESTRAS = 1000  # latencias recientes por operación para los percentiles
+
+_cliente = None
+_cliente_pid = None  # el pool de conexiones no sobrevive a un fork
+_cliente_lock = threading.Lock()
+_ejecutor = None
+_ejecutor_pid = None
+_lock = threading.Lock()
+_circuito = {"estado": "cerrado", "abierto_desde": 0.0, "probando": False}
+_intentos = deque(maxlen=LLM_CIRCUITO_VENTANA)  # True si el intento falló
+_saldo_cobertura = 0.0
+_operaciones = {}  # operación -> {"llamadas", "errores", "latencias"}
+_estadisticas = {
+    "llamadas": 0,
+    "exitos": 0,
+    "errores": 0,
+    "reintentos": 0,
+    "timeouts": 0,
+    "coberturas": 0,
+    "coberturas_ganadas": 0,
+    "rechazadas_por_circuito": 0,
+    "aperturas_circuito": 0,
+    "respaldos": 0,
+}
+
+
+class LLMNoDisponible(Exception):
+    """El circuito está abierto o se agotaron los reintentos o el plazo."""
+
+
+def cliente():
+    """OpenAI de este proceso, sin reintentos propios (los hace la pasarela)."""
+    global _cliente, _cliente_pid
+    if _cliente_pid != os.getpid():
+        with _cliente_lock:
+            if _cliente_pid != os.getpid():
+                import httpx
+                from openai import DefaultHttpxClient, OpenAI  # ~0,3 s: con la primera llamada, no al arrancar
+
+                limites = httpx.Limits(max_connections=LLM_CONEXIONES, max_keepalive_connections=LLM_CONEXIONES)
+                _cliente = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0,
+                                  http_client=DefaultHttpxClient(limits=limites, timeout=tiempo_limite(LLM_PLAZO)))
+                _cliente_pid = os.getpid()
+    return _cliente
+
+
+def tiempo_limite(restante):
+    """Timeout de httpx para un intento al que le quedan `restante` segundos."""
+    import httpx
+
+    restante = max(restante, 0.001)
+    return httpx.Timeout(restante, connect=min(LLM_TIMEOUT_CONEXION, restante))
+
+
+def completar(nombre="chat", plazo=None, cubrir=True, **parametros):
+    """chat.completions.create a través de la pasarela (con cobertura salvo cubrir=False)."""
+    return llamar(lambda timeout: cliente().chat.completions.create(timeout=timeout, **parametros),
+                  nombre, plazo, cubrir)
+
+
+def transmitir(plazo=None, **parametros):
+    """chat.completions.create(stream=True): se reintenta la apertura, no el stream ya empezado."""
+    return llamar(lambda timeout: cliente().chat.completions.create(stream=True, timeout=timeout, **parametros),
+                  "chat_stream", plazo)
+
+
+def transcribir(archivo, plazo=None):
+    """Transcripción con Whisper; el archivo se rebobina en cada intento."""
+    def operacion(timeout):
+        archivo.seek(0)
+        return cliente().audio.transcriptions.create(model="whisper-1", file=archivo, timeout=timeout)
+
+    return llamar(operacion, "transcripcion", plazo)
+
+
+def llamar(operacion, nombre="chat", plazo=None, cubrir=False):
+    """
+    Ejecuta operacion(timeout) con el circuito, los reintentos y, si `cubrir`, la cobertura.
+    Los errores transitorios agotados y el circuito abierto se convierten en
+    LLMNoDisponible; los demás (400, 401...) se propagan tal cual.
+    """
+    limite, inicio = _empezar(nombre, plazo)
+    intento = 0
+    while True:
+        _permitir(nombre)
+        try:
+            if cubrir:
+                resultado = _intento_cubierto(operacion, limite, nombre)
+            else:
+                resultado = operacion(tiempo_limite(limite - time.monotonic()))
+        except Exception as e:
+            espera = _tras_error(nombre, e, intento, limite)
+            intento += 1
+            time.sleep(espera)
+            continue
+        _tras_exito(nombre, inicio)
+        return resultado
+
+
+async def llamar_async(operacion, nombre="chat", plazo=None, cubrir=False):
+    """llamar() para corrutinas: `operacion(timeout)` devuelve un awaitable (ver asgi.py)."""
+    import asyncio
+
+    limite, inicio = _empezar(nombre, plazo)
+    intento = 0
+    while True:
+        _permitir(nombre)
+        try:
+            if cubrir:
+                resultado = await _intento_cubierto_async(operacion, limite, nombre)
+            else:
+                resultado = await operacion(tiempo_limite(limite - time.monotonic()))
+        except asyncio.CancelledError:
+            _registrar_intento("otro")  # la usuaria se fue: si era la prueba del circuito, queda libre
+            raise
+        except Exception as e:
+            espera = _tras_error(nombre, e, intento, limite)
+            intento += 1
+            await asyncio.sleep(espera)
+            continue
+        _tras_exito(nombre, inicio)
+        return resultado
+
+
+def registrar_respaldo():
+    """Cuenta una respuesta servida sin el LLM (caché o texto fijo)."""
+    with _lock:
+        _estadisticas["respaldos"] += 1
+
+
+def estadisticas_llm():
+    with _lock:
+        stats = dict(_estadisticas)
+        stats["circuito"] = _circuito["estado"]
+        stats["fallos_recientes"] = sum(_intentos)
+        stats["saldo_cobertura"] = round(_saldo_cobertura, 2)
+        operaciones = {nombre: (op["llamadas"], op["errores"], sorted(op["latencias"]))
+                       for nombre, op in _operaciones.items()}
+    stats["tasa_errores"] = round(stats["errores"] / stats["llamadas"], 3) if stats["llamadas"] else 0.0
+    stats["operaciones"] = {}
+    for nombre, (llamadas, errores, latencias) in operaciones.items():
+        stats["operaciones"][nombre] = {
+            "llamadas": llamadas,
+            "errores": errores,
+            "tasa_errores": round(errores / llamadas, 3) if llamadas else 0.0,
+            "latencia_ms": {f"p{int(p * 100)}": _percentil(latencias, p) for p in (0.5, 0.95, 0.99)},
+        }
+    return stats
+
+
+def _percentil(ordenadas, p):
+    if not ordenadas:
+        return None
+    return round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))] * 1000, 1)
+
+
+def _operacion(nombre):
+    """Contadores de una operación (se llama con _lock tomado)."""
+    if nombre not in _operaciones:
+        _operaciones[nombre] = {"llamadas": 0, "errores": 0, "latencias": deque(maxlen=LLM_MUESTRAS)}
+    return _operaciones[nombre]
+
+
+def _empezar(nombre, plazo):
+    """(límite en time.monotonic, inicio en perf_counter) de una llamada nueva."""
+    global _saldo_cobertura
+    with _lock:
+        _estadisticas["llamadas"] += 1
+        _operacion(nombre)["llamadas"] += 1
+        _saldo_cobertura = min(LLM_COBERTURA_RAFAGA, _saldo_cobertura + LLM_COBERTURA_MAX)
+    return time.monotonic() + (LLM_PLAZO if plazo is None else plazo), time.perf_counter()
+
+
+def _permitir(nombre):
+    """Deja salir un intento o lanza LLMNoDisponible. Con el circuito semiabierto solo pasa la prueba."""
+    with _lock:
+        if _circuito["estado"] == "abierto" and time.monotonic() - _circuito["abierto_desde"] >= LLM_CIRCUITO_ESPERA:
+            _circuito.update(estado="semiabierto", probando=False)
+        if _circuito["estado"] == "cerrado":
+            return
+        if _circuito["estado"] == "semiabierto" and not _circuito["probando"]:
+            _circuito["probando"] = True
+            return
+        _estadisticas["rechazadas_por_circuito"] += 1
+        _estadisticas["errores"] += 1
+        _operacion(nombre)["errores"] += 1
+    raise LLMNoDisponible("El servicio del LLM no está disponible en este momento (circuito abierto).")
+
+
+def _tras_exito(nombre, inicio):
+    with _lock:
+        _estadisticas["exitos"] += 1
+        _operacion(nombre)["latencias"].append(time.perf_counter() - inicio)
+    _registrar_intento("exito")
+
+
+def _tras_error(nombre, error, intento, limite):
+    """Segundos a esperar antes de reintentar; si no se reintenta, lanza el error que corresponde."""
+    tipo, retry_after = _clasificar(error)
+    _registrar_intento(tipo)
+    espera = random.uniform(0, min(LLM_ESPERA_MAX, LLM_ESPERA_BASE * 2 ** intento))
+    if retry_after is not None:
+        espera = max(espera, retry_after)
+    reintentar = tipo == "fallo" and intento < LLM_REINTENTOS and time.monotonic() + espera < limite
+    with _lock:
+        if reintentar:
+            _estadisticas["reintentos"] += 1
+            return espera
+        _estadisticas["errores"] += 1
+        _operacion(nombre)["errores"] += 1
+        if _es_timeout(error):
+            _estadisticas["timeouts"] += 1
+    if tipo == "fallo":
+        raise LLMNoDisponible(f"El servicio del LLM no respondió: {str(error)}") from error
+    raise error
+
+
+def _clasificar(error):
+    """
+    ("fallo", retry_after) si es transitorio y cuenta para el circuito; ("respondio", None)
+    si OpenAI contestó con un error definitivo (400, 401...); ("otro", None) si no vino de la API.
+    """
+    import openai
+
+    if isinstance(error, openai.APIConnectionError):  # incluye APITimeoutError
+        return "fallo", None
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code in (408, 409, 429) or error.status_code >= 500:
+            return "fallo", _retry_after(error.response)
+        return "respondio", None
+    return "otro", None
+
+
+def _es_timeout(error):
+    import openai
+
+    return isinstance(error, openai.APITimeoutError)
+
+
+def _retry_after(respuesta):
+    try:
+        if "retry-after-ms" in respuesta.headers:
+            return float(respuesta.headers["retry-after-ms"]) / 1000
+        return float(respuesta.headers["retry-after"])
+    except (KeyError, ValueError, TypeError, AttributeError):
+        return None  # ausente o en formato de fecha
+
+
+def _registrar_intento(tipo):
+    """Actualiza el circuito con el resultado de un intento."""
+    with _lock:
+        if tipo == "otro":
+            _circuito["probando"] = False  # no dice nada de OpenAI: la prueba queda libre
+            return
+        if tipo in ("exito", "respondio"):
+            if _circuito["estado"] != "cerrado":
+                print("✅ OpenAI responde de nuevo; circuito del LLM cerrado.")
+                _intentos.clear()
+            _circuito.update(estado="cerrado", probando=False)
+            _intentos.append(False)
+            return
+        _intentos.append(True)
+        fallos = sum(_intentos)
+        if _circuito["estado"] == "semiabierto" or (
+                _circuito["estado"] == "cerrado" and fallos >= LLM_CIRCUITO_FALLOS):
+            _circuito.update(estado="abierto", abierto_desde=time.monotonic(), probando=False)
+            _intentos.clear()
+            _estadisticas["aperturas_circuito"] += 1
+            print(f"⛔ Circuito del LLM abierto ({fallos} de los últimos {LLM_CIRCUITO_VENTANA} intentos fallaron); "
+                  f"se probará de nuevo en {LLM_CIRCUITO_ESPERA:.0f} s.")
+
+
+def _retraso_cobertura(nombre, restante):
+    """Segundos antes de lanzar la cobertura de un intento, o None si no se cubre."""
+    if LLM_COBERTURA_MS in ("", "0"):
+        return None
+    with _lock:
+        if _circuito["estado"] != "cerrado":
+            return None
+        if LLM_COBERTURA_MS == "p95":
+            latencias = _operacion(nombre)["latencias"]
+            if len(latencias) < 20:
+                return None
+            retraso = sorted(latencias)[int(len(latencias) * 0.95)]
+        else:
+            retraso = float(LLM_COBERTURA_MS) / 1000
+    return retraso if retraso < restante else None
+
+
+def _gastar_cobertura():
+    global _saldo_cobertura
+    with _lock:
+        if _saldo_cobertura < 1:
+            return False
+        _saldo_cobertura -= 1
+        _estadisticas["coberturas"] += 1
+        return True
+
+
+def _ganada(es_cobertura):
+    if es_cobertura:
+        with _lock:
+            _estadisticas["coberturas_ganadas"] += 1
+
+
+def _intento_cubierto(operacion, limite, nombre):
+    retraso = _retraso_cobertura(nombre, limite - time.monotonic())
+    if retraso is None:
+        return operacion(tiempo_limite(limite - time.monotonic()))
+    primero = _obtener_ejecutor().submit(operacion, tiempo_limite(limite - time.monotonic()))
+    hechos, _ = wait([primero], timeout=retraso)
+    if hechos or not _gastar_cobertura():
+        return primero.result()
+    # httpx síncrono no se puede cancelar: el intento que pierda termina en su hilo y se descarta
+    cobertura = _obtener_ejecutor().submit(operacion, tiempo_limite(limite - time.monotonic()))
+    pendientes, error = {primero, cobertura}, None
+    while pendientes:
+        hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+        for futuro in hechos:
+            if futuro.exception() is None:
+                _ganada(futuro is cobertura)
+                return futuro.result()
+            error = futuro.exception()
+    raise error
+
+
+async def _intento_cubierto_async(operacion, limite, nombre):
+    import asyncio
+
+    retraso = _retraso_cobertura(nombre, limite - time.monotonic())
+    if retraso is None:
+        return await operacion(tiempo_limite(limite - time.monotonic()))
+    primero = asyncio.ensure_future(operacion(tiempo_limite(limite - time.monotonic())))
+    hechos, _ = await asyncio.wait({primero}, timeout=retraso)
+    if hechos or not _gastar_cobertura():
+        return await primero
+    cobertura = asyncio.ensure_future(operacion(tiempo_limite(limite - time.monotonic())))
+    pendientes, error = {primero, cobertura}, None
+    try:
+        while pendientes:
+            hechos, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+            for tarea in hechos:
+                if tarea.exception() is None:
+                    _ganada(tarea is cobertura)
+                    return tarea.result()
+                error = tarea.exception()
+        raise error
+    finally:
+        for tarea in pendientes:
+            tarea.cancel()  # aquí sí: se cierra la conexión del intento que perdió
+
+
+def _obtener_ejecutor():
+    global _ejecutor, _ejecutor_pid
+    with _lock:
+        if _ejecutor_pid != os.getpid():
+            _ejecutor = ThreadPoolExecutor(max_workers=LLM_CONEXIONES, thread_name_prefix="llm")
+            _ejecutor_pid = os.getpid()
+        return _ejecutor
@@ -0,0 +1,152 @@
+import os
+import queue
+import threading
+import time
+
+from cache_audio import clave_audio, obtener_audio, ruta_audio, url_audio
+
+# ----------------------------------------------------------------------
+#                 COLA DE SÍNTESIS DE VOZ EN SEGUNDO PLANO
+# ----------------------------------------------------------------------
+# /chat y /audio ya no esperan a gTTS: encolan el texto y devuelven de inmediato
+# la URL final del MP3 (es determinista, ver cache_audio.clave_audio) junto con
+# un id de trabajo. El cliente consulta /audio_status/<id> hasta que esté listo.
+# El id del trabajo es la misma clave de la caché, así que cualquier worker puede
+# responder el estado revisando si el archivo ya existe en disco. Si la síntesis
+# falla se deja un marcador <clave>.err junto al MP3, para que los demás workers
+# (o este mismo tras un reinicio) respondan 'error' en vez de 'pending' para siempre.
+
+TTS_ASINCRONO = os.getenv("TTS_ASINCRONO", "1") == "1"
+TTS_HILOS = int(os.getenv("TTS_HILOS", "4"))
+TTS_COLA_MAX = int(os.getenv("TTS_COLA_MAX", "64"))  # límite de contrapresión
+TTS_TRABAJO_TTL = 600  # segundos que se recuerda un trabajo terminado
+
+_cola = queue.Queue(maxsize=TTS_COLA_MAX)
+_trabajos = {}  # clave -> {"estado", "evento", "creado", "terminado"}
+_lock = threading.Lock()
+_hilos_pid = None  # los hilos no sobreviven a un fork, se arrancan por proceso
+_estadisticas = {
+    "encolados": 0,
+    "rechazados": 0,
+    "completados": 0,
+    "errores": 0,
+    "segundos_espera": 0.0,
+}
+
+
+def encolar_audio(texto):
+    """
+    Devuelve (url, id_trabajo). id_trabajo es None si el audio ya existe.
+    Si la cola está llena devuelve (None, None): la respuesta se envía sin audio.
+    """
+    clave = clave_audio(texto)
+    if os.path.exists(ruta_audio(clave)):
+        obtener_audio(texto)  # cuenta el acierto y actualiza el orden LRU
+        return url_audio(clave), None
+
+    _arrancar_hilos()
+    with _lock:
+        trabajo = _trabajos.get(clave)
+        if trabajo and trabajo["estado"] != "error":
+            return url_audio(clave), clave
+        _purgar_trabajos()
+        _borrar_marcador(clave)  # reintento de un trabajo que falló antes (antes de que un hilo lo tome)
+        try:
+            _cola.put_nowait((clave, texto, time.monotonic()))
+        except queue.Full:
+            _estadisticas["rechazados"] += 1
+            print("⚠️ Cola de TTS llena; la respuesta se enviará sin audio.")
+            return None, None
+        _trabajos[clave] = {"estado": "pending", "evento": threading.Event(),
+                            "creado": time.monotonic(), "terminado": None}
+        _estadisticas["encolados"] += 1
+    return url_audio(clave), clave
+
+
+def estado_trabajo(clave, esperar=0):
+    """Estado del trabajo ('ready', 'pending' o 'error'), esperando hasta `esperar` segundos."""
+    limite = time.monotonic() + esperar
+    with _lock:
+        trabajo = _trabajos.get(clave)
+    if trabajo:
+        trabajo["evento"].wait(max(0, esperar))
+        if trabajo["estado"] != "pending":
+            return trabajo["estado"]
+
+    # Trabajo de otro worker (o ya olvidado): el archivo en disco es la fuente de verdad
+    while True:
+        if os.path.exists(ruta_audio(clave)):
+            return "ready"
+        if os.path.exists(_ruta_error(clave)):
+            return "error"
+        if time.monotonic() >= limite:
+            return "pending"
+        time.sleep(0.2)
+
+
+def estadisticas_cola():
+    with _lock:
+        stats = dict(_estadisticas)
+        stats["en_cola"] = _cola.qsize()
+        stats["pendientes"] = sum(1 for t in _trabajos.values() if t["estado"] == "pending")
+    return stats
+
+
+def _arrancar_hilos():
+    global _hilos_pid
+    if _hilos_pid == os.getpid():
+        return
+    with _lock:
+        if _hilos_pid == os.getpid():
+            return
+        for i in range(TTS_HILOS):
+            threading.Thread(target=_trabajador, name=f"tts-{i}", daemon=True).start()
+        _hilos_pid = os.getpid()
+
+
+def _trabajador():
+    while True:
+        clave, texto, encolado = _cola.get()
+        try:
+            obtener_audio(texto)
+            estado = "ready"
+            _borrar_marcador(clave)
+        except Exception as e:
+            print(f"❌ Error al generar audio en segundo plano: {str(e)}")
+            estado = "error"
+            try:
+                with open(_ruta_error(clave), "w", encoding="utf-8") as f:
+                    f.write(str(e))
+            except OSError as e_marcador:
+                print(f"⚠️ No se pudo escribir el marcador de error del audio: {e_marcador}")
+
+        with _lock:
+            _estadisticas["completados" if estado == "ready" else "errores"] += 1
+            _estadisticas["segundos_espera"] += time.monotonic() - encolado
+            trabajo = _trabajos.get(clave)
+            if trabajo:
+                trabajo["estado"] = estado
+                trabajo["terminado"] = time.monotonic()
+                trabajo["evento"].set()
+        _cola.task_done()
+
+
+def _purgar_trabajos():
+    """Olvida los trabajos terminados hace más de TTS_TRABAJO_TTL (se llama con _lock tomado)."""
+    ahora = time.monotonic()
+    vencidos = [clave for clave, t in _trabajos.items()
+                if t["terminado"] is not None and ahora - t["terminado"] > TTS_TRABAJO_TTL]
+    for clave in vencidos:
+        del _trabajos[clave]
+
+
+def _ruta_error(clave):
+    """Marcador que deja un trabajo fallido junto a su MP3 (static/audio/<clave>.err)."""
+    return os.path.splitext(ruta_audio(clave))[0] + ".err"
+
+
+def _borrar_marcador(clave):
+    try:
+        os.remove(_ruta_error(clave))
+    except OSError:
+        pass
@@ -0,0 +1,74 @@
+import os
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# ----------------------------------------------------------------------
+#                EMBEDDINGS LOCALES (SentenceTransformer en CPU)
+# ----------------------------------------------------------------------
+# Proveedor de embeddings para LangChain/FAISS que corre en el propio proceso:
+# indexar no necesita red y embeber una consulta cuesta milisegundos. Los
+# vectores salen normalizados (float32), así la distancia L2 de FAISS ordena
+# igual que la similitud coseno.
+#
+# Backend ONNX opcional (EMBEDDINGS_BACKEND=onnx). Para int8 se elige uno de los
+# modelos cuantizados publicados junto al modelo, por ejemplo:
+#   EMBEDDINGS_ONNX_ARCHIVO=onnx/model_qint8_avx512_vnni.onnx
+
+EMBEDDINGS_LOCAL_MODELO = os.getenv("EMBEDDINGS_LOCAL_MODELO", "all-MiniLM-L6-v2")
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "torch")  # torch | onnx
+EMBEDDINGS_ONNX_ARCHIVO = os.getenv("EMBEDDINGS_ONNX_ARCHIVO", "")
+EMBEDDINGS_LOTE = int(os.getenv("EMBEDDINGS_LOTE", "64"))
+
+_modelo = None
+_modelo_lock = threading.Lock()
+
+
+def obtener_modelo():
+    """Carga el modelo una sola vez por proceso (es compartido por todos los índices)."""
+    global _modelo
+    if _modelo is None:
+        with _modelo_lock:
+            if _modelo is None:
+                from sentence_transformers import SentenceTransformer
+
+                kwargs = {"device": "cpu"}
+                if EMBEDDINGS_BACKEND == "onnx":
+                    kwargs["backend"] = "onnx"
+                    if EMBEDDINGS_ONNX_ARCHIVO:
+                        kwargs["model_kwargs"] = {"file_name": EMBEDDINGS_ONNX_ARCHIVO}
+                _modelo = SentenceTransformer(EMBEDDINGS_LOCAL_MODELO, **kwargs)
+                print(f"🧠 Modelo de embeddings {id_embeddings_locales()} cargado.")
+    return _modelo
+
+
+def id_embeddings_locales():
+    """Identifica modelo y backend: vectores de backends distintos no se mezclan en un índice."""
+    backend = EMBEDDINGS_BACKEND
+    if backend == "onnx" and EMBEDDINGS_ONNX_ARCHIVO:
+        backend = f"onnx:{EMBEDDINGS_ONNX_ARCHIVO}"
+    return f"local:{EMBEDDINGS_LOCAL_MODELO}:{backend}"
+
+
+class EmbeddingsLocales(Embeddings):
+    """Embeddings de SentenceTransformer con la interfaz que espera LangChain."""
+
+    def __init__(self, lote=EMBEDDINGS_LOTE):
+        self.lote = lote
+
+    def codificar(self, textos):
+        vectores = obtener_modelo().encode(
+            textos,
+            batch_size=self.lote,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.asarray(vectores, dtype=np.float32)
+
+    def embed_documents(self, texts):
+        return self.codificar(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self.codificar([text])[0].tolist()
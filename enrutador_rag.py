@@ -0,0 +1,128 @@
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+from busqueda_hibrida import ALIAS_DOCUMENTOS, PATRON_CONSULTA, SIGLAS_DOCUMENTOS, indice_bm25, tokenizar
+from cache_busqueda import normalizar_consulta
+
+# ----------------------------------------------------------------------
+#           ENRUTADOR RAG: ¿HAY QUE BUSCAR EN LOS DOCUMENTOS?
+# ----------------------------------------------------------------------
+# Antes se llamaba a gpt-4-turbo sin contexto y, solo si la respuesta decía
+# "no estoy seguro" o similar, se buscaba en los PDFs y se volvía a llamar con
+# todo el historial: dos llamadas justo en las preguntas que necesitan el corpus.
+# Ahora se decide ANTES de la única llamada, con señales locales y baratas:
+#   1) charla (saludos, gracias, despedidas) -> sin búsqueda;
+#   2) referencia jurídica explícita (un artículo, una ley o su sigla, una
+#      autoridad electoral) -> búsqueda. Las palabras del tema ("mujer",
+#      "violencia", "candidata") salen en casi cualquier mensaje, así que no
+#      deciden solas: esas preguntas pasan al punto 3;
+#   3) cobertura léxica: qué parte del peso (IDF) de los términos de la
+#      pregunta está en el vocabulario del índice BM25; un término que no
+#      aparece en el corpus pesa lo máximo. Si supera ENRUTADOR_COBERTURA -> búsqueda.
+# El contexto recuperado se inyecta una sola vez en el prompt de sistema.
+
+ENRUTADOR_COBERTURA = float(os.getenv("ENRUTADOR_COBERTURA", "0.6"))
+
+# Mensajes formados solo por estas palabras son charla ("hola, ¿qué tal?", "muchas gracias")
+PALABRAS_CHARLA = {
+    "hola", "buen", "buenas", "buenos", "dia", "dias", "tardes", "noches", "que", "tal", "como", "estas",
+    "gracias", "muchas", "mil", "ok", "okay", "vale", "perfecto", "de", "acuerdo", "entendido", "adios",
+    "hasta", "luego", "pronto", "bye", "si", "no", "listo", "saludos", "muy", "bien", "amable",
+}
+# Palabras de la pregunta que no dicen nada del tema
+PALABRAS_PREGUNTA = {
+    "que", "cual", "cuales", "como", "quien", "quienes", "donde", "cuando", "cuanto", "cuantos", "porque",
+    "puedo", "puede", "pueden", "hacer", "hago", "debo", "significa", "quiere", "decir", "dime", "dame",
+    "explica", "explicame", "sabes", "te", "tu", "yo", "es", "son", "hay", "si", "no", "pasa", "eres",
+}
+AUTORIDADES = {"ine", "ople", "tepjf", "fepade", "fgr", "cndh"}
+
+_lock = threading.Lock()
+_estadisticas = {
+    "consultas": 0,
+    "con_contexto": 0,
+    "sin_contexto": 0,
+    "llamadas_llm": 0,
+    "llamadas_con_contexto": 0,
+    "vagas_sin_contexto": 0,
+    "segundos_decision": 0.0,
+}
+_motivos = Counter()
+
+
+def decidir(db_instance, pregunta):
+    """(buscar, motivo): si conviene recuperar fragmentos antes de llamar al LLM."""
+    inicio = time.perf_counter()
+    buscar, motivo = _decidir(db_instance, pregunta)
+    with _lock:
+        _estadisticas["consultas"] += 1
+        _estadisticas["con_contexto" if buscar else "sin_contexto"] += 1
+        _estadisticas["segundos_decision"] += time.perf_counter() - inicio
+        _motivos[motivo] += 1
+    print(f"🧭 Enrutador RAG: {'buscar' if buscar else 'sin búsqueda'} ({motivo}).")
+    return buscar, motivo
+
+
+def _decidir(db_instance, pregunta):
+    if db_instance is None:
+        return False, "sin_indice"
+    texto = normalizar_consulta(pregunta)
+    if not texto or set(texto.split()) <= PALABRAS_CHARLA:
+        return False, "charla"
+    if PATRON_CONSULTA.search(texto):
+        return True, "articulo"
+    palabras = set(texto.split())
+    if palabras & set(SIGLAS_DOCUMENTOS) or any(alias in texto for alias in ALIAS_DOCUMENTOS):
+        return True, "documento"
+    if palabras & AUTORIDADES:
+        return True, "autoridad"
+
+    terminos = set(tokenizar(pregunta)) - PALABRAS_PREGUNTA
+    if not terminos:
+        return False, "sin_terminos"
+    if cobertura(indice_bm25(db_instance), terminos) >= ENRUTADOR_COBERTURA:
+        return True, "cobertura"
+    return False, "cobertura_baja"
+
+
+def cobertura(bm25, terminos):
+    """Fracción del IDF de `terminos` que el corpus cubre (los términos ausentes pesan el IDF máximo)."""
+    total = len(bm25.ids)
+    maximo = math.log(1 + (total + 0.5) / 0.5)
+    cubierto = pesado = 0.0
+    for termino in terminos:
+        frecuencia = len(bm25.postings.get(termino, ()))
+        idf = math.log(1 + (total - frecuencia + 0.5) / (frecuencia + 0.5)) if frecuencia else maximo
+        pesado += idf
+        if frecuencia:
+            cubierto += idf
+    return cubierto / pesado if pesado else 0.0
+
+
+def registrar_llamada(con_contexto, respuesta_vaga):
+    """
+    Cuenta la única llamada al LLM de la petición y si llevó contexto. Antes solo
+    se ahorraba una llamada cuando la primera respuesta sin contexto salía vaga,
+    cosa que ya no se puede saber, así que no se cuentan "llamadas ahorradas".
+    Las respuestas vagas sin contexto indican preguntas que el enrutador debió
+    mandar a la búsqueda.
+    """
+    with _lock:
+        _estadisticas["llamadas_llm"] += 1
+        if con_contexto:
+            _estadisticas["llamadas_con_contexto"] += 1
+        elif respuesta_vaga:
+            _estadisticas["vagas_sin_contexto"] += 1
+
+
+def estadisticas_enrutador():
+    with _lock:
+        stats = dict(_estadisticas)
+        stats["motivos"] = dict(_motivos)
+    consultas = stats["consultas"]
+    stats["llamadas_por_consulta"] = round(stats["llamadas_llm"] / consultas, 3) if consultas else 0.0
+    stats["ms_decision_promedio"] = round(stats.pop("segundos_decision") * 1000 / consultas, 2) if consultas else 0.0
+    return stats
@@ -1,5 +1,12 @@
-from fpdf import FPDF
+from fpdf import FPDF, FPDF_VERSION
+try:
+    from fpdf.enums import Align, WrapMode, XPos, YPos
+    from fpdf.fonts import CoreFont
+    from fpdf.line_break import MultiLineBreak
+except ImportError:  # otra versión de fpdf: sin caché de líneas (ver LINEAS_EN_CACHE)
+    CoreFont = MultiLineBreak = None
 from datetime import datetime
+from almacen_pdfs import guardar_pdf
 import re
 
 # Diccionario para traducir los meses al español
@@ -35,17 +42,19 @@ def solicitar_datos_faltantes(datos, datos_faltantes):
         datos[dato] = "_________________________"  # Se deja un espacio en blanco en el PDF
     return datos
 
+TEXTOS_PRUEBAS = {
+    "confesional": "LA CONFESIONAL. Prueba que se ofrece en términos del artículo 461, párrafo 4 de la LGIPE y que corre a cargo de: {quien_desahoga}, misma que consta en la fe de hechos notarial número: {numero_notarial}, levantada ante la o el Notario Público número: {notario_publico_numero} con ejercicio en: {donde_funciones_notario}, el día: {fecha_intrumento_notarial}.\n\nCon esta prueba pretendo acreditar que la persona denunciada ha ejercido violencia en contra de la suscrita, consistente en: {prueba_confesional}.\n\nEsta prueba la relaciono con los hechos marcados con los números de la presente denuncia. {numeros_prueba}",
+    "testimonial": "LA TESTIMONIAL. Prueba que se ofrece en términos del artículo 461 párrafo 4 de la LGIPE y que corre a cargo de: {quien_desahoga}, misma que consta en el instrumento notarial número: {numero_notarial}, levantado ante la o el Notario Público número: {notario_publico_numero} con ejercicio en: {donde_funciones_notario}, el día: {fecha_intrumento_notarial}.\n\nCon esta prueba pretendo acreditar que la persona denunciada ha ejercido violencia en contra de la suscrita, consistente en: {prueba_testimonial}.\n\nEsta prueba la relaciono con los hechos marcados con los números de la presente denuncia. {numeros_prueba}",
+    "documental": "DOCUMENTAL PÚBLICA (PRIVADA): Consistente en el: {documentos_oficiales} identificado bajo el folio: {folio}, de fecha: {fecha_folio} por medio del cual: {autoridad_emite} señala que: {acto_documento}.\n\nCon esta prueba pretendo acreditar: {documento_prueba}.\n\nEsta prueba la relaciono con los hechos marcados con los números de la presente denuncia. {numeros_prueba}",
+    "presuncional": "PRESUNCIONAL LEGAL Y HUMANA. En todo lo que favorezca a la suscrita consistente en los razonamientos lógico-jurídicos que realice esa autoridad.",
+    "instrumental": "INSTRUMENTAL DE ACTUACIONES. Consistente en todas y cada una de las constancias que integran el expediente y que favorezcan a la suscrita."
+}
+# Párrafos de los textos de prueba: no cambian entre denuncias (ver parrafo_justificado)
+PARRAFOS_PRUEBAS = {parrafo for texto in TEXTOS_PRUEBAS.values() for parrafo in texto.split("\n\n")}
+
 def generar_texto_prueba(datos):
-    textos_pruebas = {
-        "confesional": "LA CONFESIONAL. Prueba que se ofrece en términos del artículo 461, párrafo 4 de la LGIPE y que corre a cargo de: {quien_desahoga}, misma que consta en la fe de hechos notarial número: {numero_notarial}, levantada ante la o el Notario Público número: {notario_publico_numero} con ejercicio en: {donde_funciones_notario}, el día: {fecha_intrumento_notarial}.\n\nCon esta prueba pretendo acreditar que la persona denunciada ha ejercido violencia en contra de la suscrita, consistente en: {prueba_confesional}.\n\nEsta prueba la relaciono con los hechos marcados con los números de la presente denuncia. {numeros_prueba}",
-        "testimonial": "LA TESTIMONIAL. Prueba que se ofrece en términos del artículo 461 párrafo 4 de la LGIPE y que corre a cargo de: {quien_desahoga}, misma que consta en el instrumento notarial número: {numero_notarial}, levantado ante la o el Notario Público número: {notario_publico_numero} con ejercicio en: {donde_funciones_notario}, el día: {fecha_intrumento_notarial}.\n\nCon esta prueba pretendo acreditar que la persona denunciada ha ejercido violencia en contra de la suscrita, consistente en: {prueba_testimonial}.\n\nEsta prueba la relaciono con los hechos marcados con los números de la presente denuncia. {numeros_prueba}",
-        "documental": "DOCUMENTAL PÚBLICA (PRIVADA): Consistente en el: {documentos_oficiales} identificado bajo el folio: {folio}, de fecha: {fecha_folio} por medio del cual: {autoridad_emite} señala que: {acto_documento}.\n\nCon esta prueba pretendo acreditar: {documento_prueba}.\n\nEsta prueba la relaciono con los hechos marcados con los números de la presente denuncia. {numeros_prueba}",
-        "presuncional": "PRESUNCIONAL LEGAL Y HUMANA. En todo lo que favorezca a la suscrita consistente en los razonamientos lógico-jurídicos que realice esa autoridad.",
-        "instrumental": "INSTRUMENTAL DE ACTUACIONES. Consistente en todas y cada una de las constancias que integran el expediente y que favorezcan a la suscrita."
-    }
-    
     tipo_prueba = datos.get("tipo_prueba", "")
-    return textos_pruebas.get(tipo_prueba, "")
+    return TEXTOS_PRUEBAS.get(tipo_prueba, "")
 
 TEXTO_BASE = """
 
@@ -136,26 +145,135 @@ PROTESTO LO NECESARIO
 
 """
 
+# ----------------------------------------------------------------------
+#             PLANTILLA PRECOMPILADA Y LÍNEAS FIJAS EN CACHÉ
+# ----------------------------------------------------------------------
+# Casi todo el formato es texto legal fijo, pero cada denuncia volvía a hacer
+# TEXTO_BASE.format(**datos), partir el resultado en secciones, buscar los
+# títulos por subcadenas y, sobre todo, cortar en líneas cada párrafo con
+# multi_cell: el corte de líneas era más del 90% del tiempo de generar_pdf.
+# Ahora:
+#   1) TEXTO_BASE se parte en secciones una sola vez, al importar: títulos,
+#      párrafos fijos y párrafos con campos (con su parte fija inicial);
+#   2) las líneas ya cortadas (TextLine de fpdf2) de los párrafos fijos y de la
+#      parte fija con que empieza un párrafo con campos se calculan una vez por
+#      proceso y se vuelven a imprimir tal cual; solo se corta en cada denuncia
+#      el texto a partir del primer campo;
+#   3) las fuentes se crean una vez y se comparten entre documentos, así las
+#      líneas en caché (que apuntan a su fuente) sirven para cualquier PDF.
+# El PDF que sale es el mismo byte a byte (ver benchmarks/bench_pdf.py).
+# Los puntos 2 y 3 usan métodos internos de fpdf2 (probados con la 2.8): con
+# otra versión, o si faltan, cada párrafo vuelve a ser multi_cell(0, 7, texto, align="J").
+
+TITULOS = ("HECHOS", "MEDIDAS CAUTELARES", "MEDIDAS DE PROTECCIÓN", "PRUEBAS", "PROTESTO LO NECESARIO")
+FUENTES_DOCUMENTO = (("Times", "B"), ("Times", ""))  # en el orden en que el documento las usa
+ENCABEZADO_AUTORIDAD = "UNIDAD TÉCNICA DE LO CONTENCIOSO ELECTORAL DE LA SECRETARÍA EJECUTIVA DEL INSTITUTO NACIONAL ELECTORAL"
+
+LINEAS_EN_CACHE = (FPDF_VERSION.startswith("2.8.") and MultiLineBreak is not None
+                   and all(hasattr(FPDF, metodo) for metodo in
+                           ("_render_styled_text_line", "_perform_page_break", "_preload_font_styles")))
+
+_fuentes = {}  # clave de fpdf ("timesB") -> CoreFont compartida por los PDF del proceso
+_lineas_fijas = {}  # (fuente, tamaño, ancho, texto) -> (TextLines, posición en el texto donde empieza cada una)
+
+
+def es_titulo(seccion):
+    return any(titulo in seccion for titulo in TITULOS)
+
+
+def compilar_plantilla(plantilla):
+    """
+    Secciones de `plantilla` como (tipo, texto, parte fija): tipo "titulo",
+    "fijo" (sin campos; todo el texto es fijo) o "campos" (la parte fija es lo
+    que va antes del primer campo).
+    """
+    secciones = []
+    for seccion in plantilla.split("\n\n"):
+        if not seccion.strip():
+            continue
+        if es_titulo(seccion):
+            secciones.append(("titulo", seccion.strip(), ""))
+        elif "{" not in seccion:
+            secciones.append(("fijo", seccion, seccion))
+        else:
+            secciones.append(("campos", seccion, seccion[:seccion.index("{")]))
+    return secciones
+
+
+PLANTILLA = compilar_plantilla(TEXTO_BASE)
+
 class PDF(FPDF):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not LINEAS_EN_CACHE:
+            return
+        # Mismas fuentes (y mismo número /F1, /F2) que registraría set_font, pero compartidas
+        for familia, estilo in FUENTES_DOCUMENTO:
+            clave = familia.lower() + estilo
+            if clave not in _fuentes:
+                _fuentes[clave] = CoreFont(self, clave, estilo)
+            self.fonts[clave] = _fuentes[clave]
+
     def header(self):
         if self.page_no() == 1:
             self.set_font("Times", "B", 12)
             self.cell(0, 10, "FORMATO DE DENUNCIA EN MATERIA DE VIOLENCIA POLÍTICA", ln=True, align="C")
             self.ln(10)
 
-    def chapter_body(self, body):
+    def chapter_body(self, body, fijo=""):
         body = normalizar_texto(body)
         self.set_font("Times", "", 12)
         body = body.replace("\n", " ")
-        self.multi_cell(0, 7, body, align="J")
+        self.parrafo_justificado(body, normalizar_texto(fijo).replace("\n", " "))
         self.ln()
         
-    def texto_negrita(self, texto):
+    def texto_negrita(self, texto, fijo=""):
         """Función para hacer el texto en negrita"""
         self.set_font("Times", "B", 12)
         texto = texto.replace("\n", " ")
-        self.multi_cell(0, 7, texto, align="J")
+        self.parrafo_justificado(texto, fijo.replace("\n", " "))
         self.ln()
+
+    def parrafo_justificado(self, texto, fijo=""):
+        """
+        Igual que multi_cell(0, 7, texto, align="J"), pero las líneas de `fijo`
+        (el inicio de `texto` que no cambia entre denuncias) salen de la caché.
+        """
+        if not LINEAS_EN_CACHE:
+            self.multi_cell(0, 7, texto, align="J")
+            return
+        lineas, cubierto = (), 0
+        if fijo and texto.startswith(fijo):
+            lineas, inicios = self._cortar_fijo(fijo)
+            if texto != fijo:
+                # La última línea de la parte fija depende de lo que sigue: se vuelve a cortar
+                lineas, cubierto = lineas[:-1], inicios[-1]
+            else:
+                cubierto = len(texto)
+        for i, linea in enumerate(lineas):
+            if self.will_page_break(7):
+                self._perform_page_break()
+            ultima = cubierto == len(texto) and i == len(lineas) - 1
+            self._render_styled_text_line(linea, h=7, new_x=XPos.RIGHT if ultima else XPos.LEFT, new_y=YPos.NEXT)
+        if cubierto < len(texto):
+            self.multi_cell(0, 7, texto[cubierto:], align="J")
+
+    def _cortar_fijo(self, fijo):
+        """Líneas de `fijo` con la fuente y el ancho actuales, cortadas una vez por proceso."""
+        ancho = self.w - self.r_margin - self.x
+        clave = (self.current_font.fontkey, self.font_size_pt, ancho, fijo)
+        if clave not in _lineas_fijas:
+            corte = MultiLineBreak(self._preload_font_styles(self.normalize_text(fijo), False), ancho,
+                                   [self.c_margin, self.c_margin], align=Align.J, wrapmode=WrapMode.WORD)
+            lineas, inicios, posicion = [], [], 0
+            while (linea := corte.get_line()) is not None:
+                cadena = "".join(fragmento.string for fragmento in linea.fragments)
+                posicion = fijo.index(cadena, posicion)
+                lineas.append(linea)
+                inicios.append(posicion)
+                posicion += len(cadena)
+            _lineas_fijas[clave] = (lineas, inicios)
+        return _lineas_fijas[clave]
         
     def agregar_titulo_centrado(self, texto):
         """Agrega un título centrado en negritas."""
@@ -242,24 +360,33 @@ def extraer_datos(texto):
     
     return datos, datos_faltantes
 
-def generar_pdf(datos, output_path="formato_denuncia.pdf"):
-    """Genera el PDF de la denuncia con los datos obtenidos, centrando los títulos y firma."""
+def generar_pdf(datos, output_path=None):
+    """
+    Genera el PDF de la denuncia con los datos obtenidos, centrando los títulos y firma.
+    Sin `output_path` devuelve los bytes del PDF (no toca el disco).
+    """
+    datos = dict(datos)  # no modificar los datos de la sesión
     pdf = PDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
-    pdf.texto_negrita("UNIDAD TÉCNICA DE LO CONTENCIOSO ELECTORAL DE LA SECRETARÍA EJECUTIVA DEL INSTITUTO NACIONAL ELECTORAL")
+    pdf.texto_negrita(ENCABEZADO_AUTORIDAD, fijo=ENCABEZADO_AUTORIDAD)
     
-    # Contenido
+    # Contenido: solo se formatean las secciones con campos
     datos["tipo_prueba"] = generar_texto_prueba(datos)
-    texto_completo = TEXTO_BASE.format(**datos)
-    secciones = texto_completo.split("\n\n")
-    for seccion in secciones:
-        if seccion.strip():
-            if "HECHOS" in seccion or "MEDIDAS CAUTELARES" in seccion or "MEDIDAS DE PROTECCIÓN" in seccion or "PRUEBAS" in seccion or "PROTESTO LO NECESARIO"in seccion or "HECHOS" in seccion:
-                pdf.agregar_titulo_centrado(seccion.strip())
-            else:
-                pdf.chapter_body(seccion)
-                
+    for tipo, seccion, fijo in PLANTILLA:
+        if tipo == "titulo":
+            pdf.agregar_titulo_centrado(seccion)
+        elif tipo == "fijo":
+            pdf.chapter_body(seccion, fijo)
+        else:
+            # Un campo puede traer varios párrafos (el texto de la prueba): se separan como antes
+            for i, bloque in enumerate(seccion.format(**datos).split("\n\n")):
+                if not bloque.strip():
+                    continue
+                if es_titulo(bloque):
+                    pdf.agregar_titulo_centrado(bloque.strip())
+                else:
+                    pdf.chapter_body(bloque, bloque if bloque in PARRAFOS_PRUEBAS else fijo if i == 0 else "")
 
     # Fecha centrada
     pdf.agregar_fecha_centrada(datos["ciudad"])
@@ -268,11 +395,13 @@ def generar_pdf(datos, output_path="formato_denuncia.pdf"):
     pdf.agregar_firma_centrada()
 
     # Guardar PDF
+    if output_path is None:
+        return bytes(pdf.output())
     pdf.output(output_path)
     return output_path
 
 def procesar_denuncia(entrada):
-    """Procesa la denuncia y genera un PDF."""
+    """Procesa la denuncia, genera el PDF y devuelve su id en almacen_pdfs."""
     
     if isinstance(entrada, str):  
         datos, datos_faltantes = extraer_datos(entrada)
@@ -288,8 +417,7 @@ def procesar_denuncia(entrada):
         datos = solicitar_datos_faltantes(datos, datos_faltantes)  # Se llenan con espacios en blanco
         return {"error": "Faltan datos", "faltantes": datos_faltantes}
 
-    # Generar el PDF
-    pdf_path = generar_pdf(datos)
-    return pdf_path
+    # Generar el PDF en memoria y guardarlo en el almacén; la sesión solo guarda el id
+    return guardar_pdf(generar_pdf(datos))
 
 
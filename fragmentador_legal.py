@@ -0,0 +1,251 @@
+import itertools
+import os
+import re
+import unicodedata
+from collections import Counter
+
+# ----------------------------------------------------------------------
+#           FRAGMENTADOR ESTRUCTURAL PARA LOS PDFs JURÍDICOS
+# ----------------------------------------------------------------------
+# En lugar de cortar cada 1000 caracteres con 200 de traslape, se sigue la
+# jerarquía de las leyes: Libro/Título -> Capítulo -> Artículo -> fracción.
+# Cada fragmento es un artículo completo (o varios artículos cortos seguidos
+# del mismo capítulo); solo los artículos largos se parten, por fracciones o
+# numerales, repitiendo el encabezado del artículo en cada parte. El traslape
+# únicamente se usa si una sola fracción excede el tamaño máximo.
+#
+# Antes se eliminan los encabezados y pies de página repetidos ("Última
+# Reforma DOF...", "6 de 287"), las notas de reforma ("Párrafo reformado DOF
+# 10-02-2014") y las líneas del índice, que solo gastaban embeddings y tokens.
+#
+# Todo el recorrido es un flujo: las páginas entran una por una (ingesta_pdfs
+# las extrae en paralelo) y los fragmentos salen en cuanto se cierra su
+# artículo. Los encabezados repetidos se detectan sobre las primeras
+# MUESTRA_ENCABEZADOS páginas, así no hace falta tener el PDF entero en memoria.
+
+FRAGMENTO_MAX = 1500  # caracteres
+FRAGMENTO_MIN = 300  # artículos más cortos se juntan con el siguiente del mismo capítulo
+FRAGMENTO_TRASLAPE = 100  # solo para fracciones que no caben en un fragmento
+
+SUFIJOS_ARTICULO = ("bis|ter|quater|quinquies|sexies|septies|octies|nonies|decies|"
+                    "undecies|duodecies|terdecies")
+# Encabezado de artículo al inicio de línea y con mayúscula ("ARTÍCULO 20 Bis.-", "Artículo 3o."),
+# sobre el texto sin acentos. Excluye las líneas del índice ("Artículo 11 ........ 23") y las
+# citas que quedaron al inicio de un renglón ("artículo 2o. de la Constitución").
+PATRON_ENCABEZADO = re.compile(
+    rf"(?m)^\s*(?:Articulo|ARTICULO)\s+(\d+)\s*(?:o\b|º|°)?\s*(?:((?i:{SUFIJOS_ARTICULO}))\b)?"
+    r"\s*(?:\.(?!\.)|-|–|$)")
+PATRON_DIVISION = re.compile(
+    r"^\s*(libro|titulo|capitulo|seccion)\s+([a-z]+|[ivxlc]+|\d+)\s*$")
+PATRON_TRANSITORIOS = re.compile(r"^\s*(?:articulos?\s+)?transitorios?\s*\.?\s*$")
+PATRON_TRANSITORIO = re.compile(
+    r"^\s*(?:articulo\s+)?(unico|primero|segundo|tercero|cuarto|quinto|sexto|septimo|octavo|"
+    r"noveno|decimo\w*|vigesimo\w*|trigesimo\w*)\s*\.?\s*[-–.]")
+PATRON_FRACCION = re.compile(r"^\s*(?:[IVXL]+\.|\d+\.|[a-z]\))\s")
+PATRON_NOTA_REFORMA = re.compile(
+    r"(DOF\s+\d{2}-\d{2}-\d{4}|^\s*(?:de\s+)?Inconstitucionalidad notificada|"
+    r"^\s*(?:Artículo|Párrafo|Fracción|Inciso|Numeral|Apartado|Base|Denominación|Fe de erratas)"
+    r"[\w\s()]*\s(?:reformad|adicionad|derogad|recorrid|declarad|suprimid))")
+PATRON_INDICE = re.compile(r"\.{5,}\s*\d*\s*$")
+PATRON_NUMERO_PAGINA = re.compile(r"^\s*\d+(?:\s+de\s+\d+)?\s*$")
+LINEAS_BORDE = 10  # líneas al inicio/fin de cada página donde se buscan encabezados y pies
+MUESTRA_ENCABEZADOS = 40  # páginas con que se deciden los encabezados/pies repetidos
+
+DIVISIONES = ("libro", "titulo", "capitulo", "seccion")
+
+
+def quitar_acentos(texto):
+    """Sin acentos pero con puntuación y saltos de línea (los encabezados dependen de ellos)."""
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def clave_articulo(numero, sufijo=None):
+    return f"{int(numero)} {sufijo.lower()}" if sufijo else str(int(numero))
+
+
+def _plantilla(linea):
+    # Sin comodines para los dígitos: "Artículo 12." no debe confundirse con un encabezado de página
+    return " ".join(linea.split())
+
+
+def lineas_repetidas(paginas):
+    """Encabezados y pies de página: líneas del borde que se repiten en la mayoría de las páginas."""
+    conteo = Counter()
+    for lineas in paginas:
+        utiles = [l for l in lineas if l.strip()]
+        conteo.update({_plantilla(l) for l in utiles[:LINEAS_BORDE] + utiles[-LINEAS_BORDE:]})
+    minimo = max(3, len(paginas) // 2)
+    return {plantilla for plantilla, veces in conteo.items() if veces >= minimo}
+
+
+def limpiar_paginas(docs):
+    """Genera (página, [líneas]) sin encabezados/pies repetidos, notas de reforma ni índice."""
+    docs = iter(docs)
+    muestra = [(doc.metadata.get("page", 0), doc.page_content.splitlines())
+               for doc in itertools.islice(docs, MUESTRA_ENCABEZADOS)]
+    repetidas = lineas_repetidas([lineas for _, lineas in muestra])
+    resto = ((doc.metadata.get("page", 0), doc.page_content.splitlines()) for doc in docs)
+    for pagina, lineas in itertools.chain(muestra, resto):
+        yield pagina, [l.rstrip() for l in lineas
+                       if _plantilla(l) not in repetidas
+                       and not PATRON_NUMERO_PAGINA.match(l)
+                       and not PATRON_NOTA_REFORMA.search(l)
+                       and not PATRON_INDICE.search(l)]
+
+
+def bloques_legales(docs):
+    """
+    Recorre el documento y genera sus bloques con la jerarquía:
+    {"pagina", "libro", "titulo", "capitulo", "seccion", "articulo", "lineas"}.
+    Cada bloque sale en cuanto empieza el siguiente.
+    """
+    jerarquia = dict.fromkeys(DIVISIONES)
+    actual = None
+    pendiente = None  # división cuyo nombre viene en la línea siguiente
+
+    for pagina, lineas in limpiar_paginas(docs):
+        for linea in lineas:
+            sin_acentos = quitar_acentos(linea)
+            normal = sin_acentos.lower()
+            if not linea.strip():
+                if actual is not None and actual["lineas"] and actual["lineas"][-1]:
+                    actual["lineas"].append("")
+                continue
+
+            division = PATRON_DIVISION.match(normal)
+            if division and len(linea) < 60:
+                nivel = division.group(1)
+                jerarquia[nivel] = " ".join(linea.split())
+                for inferior in DIVISIONES[DIVISIONES.index(nivel) + 1:]:
+                    jerarquia[inferior] = None
+                pendiente = nivel
+                if actual is not None and any(actual["lineas"]):
+                    yield actual
+                actual = None
+                continue
+
+            if pendiente and not PATRON_ENCABEZADO.match(sin_acentos) and len(linea) < 120:
+                jerarquia[pendiente] = f"{jerarquia[pendiente]} - {linea.strip()}"
+                pendiente = None
+                continue
+            pendiente = None
+
+            if PATRON_TRANSITORIOS.match(normal):
+                jerarquia.update(dict.fromkeys(DIVISIONES), titulo="Transitorios")
+                if actual is not None and any(actual["lineas"]):
+                    yield actual
+                actual = None
+                continue
+
+            encabezado = PATRON_ENCABEZADO.match(sin_acentos)
+            transitorio = jerarquia["titulo"] == "Transitorios" and PATRON_TRANSITORIO.match(normal)
+            if encabezado or transitorio or actual is None:
+                if actual is not None and any(actual["lineas"]):
+                    yield actual
+                if encabezado:
+                    articulo, texto = clave_articulo(*encabezado.groups()), linea[:encabezado.end()]
+                elif transitorio:
+                    articulo, texto = f"transitorio {transitorio.group(1)}", linea[:transitorio.end()]
+                else:
+                    articulo, texto = None, ""  # Preámbulo o texto fuera de un artículo
+                actual = dict(jerarquia, pagina=pagina, articulo=articulo,
+                              encabezado=texto.strip(" .-–"), lineas=[])
+            actual["lineas"].append(linea.strip())
+
+    if actual is not None and any(actual["lineas"]):
+        yield actual
+
+
+def _partir_por_fracciones(lineas):
+    """Unidades que empiezan en cada fracción/numeral/inciso del artículo."""
+    unidades = [[]]
+    for linea in lineas:
+        if PATRON_FRACCION.match(linea) and unidades[-1]:
+            unidades.append([])
+        unidades[-1].append(linea)
+    return ["\n".join(u).strip() for u in unidades if any(u)]
+
+
+def fragmentar_bloque(bloque):
+    """Textos de los fragmentos de un bloque (uno solo si el artículo cabe completo)."""
+    texto = "\n".join(bloque["lineas"]).strip()
+    if len(texto) <= FRAGMENTO_MAX:
+        return [texto]
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter  # langchain tarda en importarse
+
+    encabezado = bloque["encabezado"]
+    divisor = RecursiveCharacterTextSplitter(chunk_size=FRAGMENTO_MAX - len(encabezado),
+                                             chunk_overlap=FRAGMENTO_TRASLAPE)
+    partes = []
+    for unidad in _partir_por_fracciones(bloque["lineas"]):
+        for pieza in (divisor.split_text(unidad) if len(unidad) > FRAGMENTO_MAX else [unidad]):
+            if partes and len(partes[-1]) + len(pieza) + 1 <= FRAGMENTO_MAX:
+                partes[-1] = f"{partes[-1]}\n{pieza}"
+            else:
+                partes.append(pieza)
+    # Cada parte lleva el encabezado del artículo para no perder de qué artículo es
+    return [partes[0]] + [f"{encabezado} (continuación)\n{p}" if encabezado else p for p in partes[1:]]
+
+
+def iterar_fragmentos(docs):
+    """Genera los fragmentos (Documents de LangChain) con metadatos jerárquicos de las páginas de un PDF."""
+    from langchain_core.documents import Document  # solo al indexar; busqueda_hibrida importa este módulo
+
+    docs = iter(docs)
+    primero = next(docs, None)
+    if primero is None:
+        return
+    base = {k: v for k, v in primero.metadata.items() if k in ("source", "total_pages", "title")}
+    anterior = None  # Se retiene por si el siguiente artículo corto se le junta
+    for bloque in bloques_legales(itertools.chain([primero], docs)):
+        jerarquia = {k: bloque[k] for k in DIVISIONES if bloque[k]}
+        for parte, texto in enumerate(fragmentar_bloque(bloque)):
+            # Artículos cortos consecutivos del mismo capítulo van juntos
+            if (anterior is not None and parte == 0 and bloque["articulo"]
+                    and len(anterior.page_content) < FRAGMENTO_MIN
+                    and len(anterior.page_content) + len(texto) + 2 <= FRAGMENTO_MAX
+                    and all(anterior.metadata.get(k) == jerarquia.get(k) for k in DIVISIONES)
+                    and anterior.metadata.get("articulos")):
+                anterior.page_content = f"{anterior.page_content}\n\n{texto}"
+                anterior.metadata["articulos"].append(bloque["articulo"])
+                continue
+            if anterior is not None:
+                yield anterior
+            metadata = dict(base, **jerarquia, page=bloque["pagina"], parte=parte)
+            if bloque["articulo"]:
+                metadata.update(articulo=bloque["articulo"], articulos=[bloque["articulo"]])
+            anterior = Document(page_content=texto, metadata=metadata)
+    if anterior is not None:
+        yield anterior
+
+
+def fragmentar_documento(docs):
+    """Lista de fragmentos de las páginas de un PDF (ver iterar_fragmentos)."""
+    return list(iterar_fragmentos(docs))
+
+
+if __name__ == "__main__":
+    import argparse
+    import statistics
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.document_loaders import PyPDFLoader
+
+    parser = argparse.ArgumentParser(description="Muestra cómo quedan fragmentados los PDFs jurídicos.")
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--mostrar", type=int, default=0, help="imprime los primeros N fragmentos")
+    args = parser.parse_args()
+
+    for ruta in args.pdfs:
+        docs = PyPDFLoader(ruta).load()
+        fragmentos = fragmentar_documento(docs)
+        recursivos = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(docs)
+        tam = [len(f.page_content) for f in fragmentos]
+        print(f"📄 {os.path.basename(ruta)}: {len(fragmentos)} fragmentos "
+              f"({sum(tam)} caracteres, mediana {statistics.median(tam):.0f}); "
+              f"recursivo: {len(recursivos)} fragmentos ({sum(len(d.page_content) for d in recursivos)} caracteres)")
+        for f in fragmentos[:args.mostrar]:
+            print("---", {k: v for k, v in f.metadata.items() if k not in ("source", "total_pages", "title")})
+            print(f.page_content[:400])
@@ -1,11 +1,11 @@
-from flask import jsonify, session
-from flask_session import Session
-import os
-import gtts  # Google Text-to-Speech
-from pydub import AudioSegment
-from formato_denuncia import procesar_denuncia
+from flask import jsonify, session, g
+from cache_audio import obtener_audio, registrar_omitido
+from paquete_audio import buscar_en_paquete
+from cola_tts import TTS_ASINCRONO, encolar_audio
 import markdown
 import re
+import unicodedata
+from datetime import date
 
 
 
@@ -14,18 +14,39 @@ import re
 # ----------------------------------------------------------------------
 
 
-AUDIO_OUTPUT_FOLDER = "static/audio"
-os.makedirs(AUDIO_OUTPUT_FOLDER, exist_ok=True)
-
 def text_to_speech(text):
-    """Genera un archivo de audio a partir del texto usando gTTS"""
-    filename = f"response_{hash(text)}.mp3"
-    filepath = os.path.join(AUDIO_OUTPUT_FOLDER, filename)
-
-    tts = gtts.gTTS(text, lang="es")  # Generar audio en español
-    tts.save(filepath)
-
-    return f"/{filepath}"  # Retorna la URL relativa del archivo
+    """
+    Devuelve la URL del audio del texto: primero el paquete pre-renderizado, luego la caché.
+    Si hay que sintetizar, se encola en segundo plano y el id del trabajo queda en
+    g.audio_job para que la respuesta lo incluya (ver app.adjuntar_trabajo_audio).
+    Si el cliente pidió respuesta solo en texto (g.voz = False) no se hace nada.
+    """
+    url, trabajo = audio_de(text, g.get("voz", True))
+    if trabajo:
+        g.audio_job = trabajo
+    return url
+
+
+def audio_de(text, voz=True):
+    """(url, id del trabajo pendiente o None): lo mismo que text_to_speech, sin el contexto de Flask."""
+    if not voz:
+        registrar_omitido(text)
+        return None, None
+    url = buscar_en_paquete(text)
+    if url:
+        return url, None
+    if not TTS_ASINCRONO:
+        return obtener_audio(text), None
+    return encolar_audio(text)
+
+
+def quiere_voz(valor):
+    """Interpreta la bandera 'voice' del cliente; si no la envía se asume que sí quiere audio."""
+    if valor is None:
+        return True
+    if isinstance(valor, str):
+        return valor.strip().lower() not in ["0", "false", "no", "off"]
+    return bool(valor)
 
 
 # ----------------------------------------------------------------------
@@ -36,7 +57,7 @@ def handle_cancelar_proceso():
     """Cancelar el llenado de datos."""
     session.pop("datos_faltantes", None)
     session.pop("datos_usuario", None)
-    texto = "Proceso cancelado. ¿En qué más puedo ayudarte?"
+    texto = TEXTO_PROCESO_CANCELADO
     audio_response_path = text_to_speech(texto)
     return jsonify({
         "response": "❌ Proceso cancelado. ¿En qué más puedo ayudarte?",
@@ -90,12 +111,10 @@ def handle_omitir_dato(dato_actual, datos_faltantes, datos_usuario):
     session["datos_faltantes"] = remaining_faltantes
     session["datos_usuario"] = datos_usuario
 
-    # Construir el texto y su audio
-    texto = f"Se ha omitido **{dato_actual}** automáticamente porque omitiste `tipo_prueba`"
-    audio_response_path = text_to_speech(texto)
-    
     # Si este mismo dato es dependiente de tipo_prueba
     if dato_actual in session.get("campos_dependientes_tipo_prueba", set()):
+        texto = texto_omitido_dependiente(dato_actual)
+        audio_response_path = text_to_speech(texto)
         return jsonify({
             "response": markdown.markdown(f"✅ Se ha omitido **{dato_actual}** automáticamente porque omitiste `tipo_prueba`."),
             "audio_response": audio_response_path
@@ -113,11 +132,7 @@ def handle_omitir_dato(dato_actual, datos_faltantes, datos_usuario):
         if siguiente_dato == "medidas_cautelares":
             opciones_str = "\n".join(f"{i+1}. {op}" for i, op in enumerate(MEDIDAS_CAUTELARES_OPCIONES))
             session["pidiendo_medidas_cautelares"] = True
-            texto_ret = (
-                f"Se ha omitido **{dato_actual}**. Ahora, selecciona las **medidas cautelares** que solicitas. "
-                f"Opciones:\n{opciones_str}\nPara seleccionar, escribe los números separados por comas (ej: '1,3'). "
-                "Escribe 'otra' para agregar una medida no listada. Cuando termines, escribe 'terminar'."
-            )
+            texto_ret = texto_omitido_cautelares(dato_actual)
             audio_response = text_to_speech(texto_ret)
             return jsonify({
                 "response": markdown.markdown(
@@ -133,11 +148,7 @@ def handle_omitir_dato(dato_actual, datos_faltantes, datos_usuario):
         elif siguiente_dato == "medidas_proteccion":
             opciones_str = "\n".join(f"{i+1}. {op}" for i, op in enumerate(MEDIDAS_PROTECCION_OPCIONES))
             session["pidiendo_medidas_proteccion"] = True
-            texto_ret = (
-                f"✅ Se ha omitido **{dato_actual}**. "
-                "Ahora, selecciona las **medidas de protección** que solicitas. "
-                f"Estas son las opciones:\n{opciones_str}"
-            )
+            texto_ret = texto_omitido_proteccion(dato_actual)
             audio_response = text_to_speech(texto_ret)
             return jsonify({
                 "response": markdown.markdown(
@@ -152,12 +163,7 @@ def handle_omitir_dato(dato_actual, datos_faltantes, datos_usuario):
             })
         elif siguiente_dato == "tipo_prueba":
             session["ha_preguntado_tipo_prueba"] = True
-            texto_ret = (
-                "¿Qué tipo de prueba deseas ofrecer? Elige una opción:\n"
-                "1️⃣ Confesional\n2️⃣ Testimonial\n3️⃣ Documental Pública o Privada\n"
-                "4️⃣ Presuncional Legal y Humana\n5️⃣ Instrumental de Actuaciones\n"
-                "Escribe el número de la opción o 'omitir/cancelar'."
-            )
+            texto_ret = TEXTO_MENU_TIPO_PRUEBA_OMITIR
             audio_response = text_to_speech(texto_ret)
             return jsonify({
                 "response": texto_ret,
@@ -166,10 +172,7 @@ def handle_omitir_dato(dato_actual, datos_faltantes, datos_usuario):
         # Pregunta de forma genérica por el siguiente dato
         desc = field_info.get(siguiente_dato, {}).get("descripcion", "")
         ejemp = field_info.get(siguiente_dato, {}).get("ejemplo", "")
-        texto_ret = (
-            f"Se ha omitido **{dato_actual}**. Ahora, **{siguiente_dato}** es importante {desc}. {ejemp}. "
-            "¿Podrías proporcionarlo ahora? O escribe 'omitir' si no deseas darlo, o 'cancelar' para detener."
-        )
+        texto_ret = texto_omitido_siguiente(dato_actual, siguiente_dato)
         audio_response = text_to_speech(texto_ret)
         return jsonify({
             "response": markdown.markdown(
@@ -186,6 +189,13 @@ def handle_omitir_dato(dato_actual, datos_faltantes, datos_usuario):
         return handle_generar_denuncia(datos_usuario)
     
 
+def procesar_denuncia(datos):
+    """formato_denuncia.procesar_denuncia; fpdf se importa con la primera denuncia y no al arrancar."""
+    from formato_denuncia import procesar_denuncia as procesar
+
+    return procesar(datos)
+
+
 def handle_generar_denuncia(datos_usuario):
     """Genera la denuncia y retorna la respuesta final en JSON."""
     try:
@@ -196,16 +206,14 @@ def handle_generar_denuncia(datos_usuario):
             return jsonify({
                 "response": markdown.markdown(f"⚠️ Faltan datos: {', '.join(resultado['faltantes'])}. Por favor, ingrésalos para continuar.")
             })
-        session["pdf_path"] = resultado
+        session["pdf_id"] = resultado
         # Limpiar la sesión
         session.pop("datos_faltantes", None)
         session.pop("datos_usuario", None)
         session.pop("tipo_prueba_omitido", None)
         session.pop("campos_dependientes_tipo_prueba", None)
         
-        texto = ("La denuncia ha sido generada correctamente. Puedes descargarla en el link que te genere. "
-                 "Este es un formato de denuncia con los datos proporcionados. "
-                 "Puedes revisarlo y editarlo si lo deseas. ¡Estoy aquí para ayudarte!")
+        texto = TEXTO_DENUNCIA_GENERADA
         audio_response_path = text_to_speech(texto)
         return jsonify({
             "response": (
@@ -247,17 +255,181 @@ def es_domicilio_valido(valor: str) -> bool:
 def es_narracion_valida(texto: str) -> bool:
     return len(texto.strip()) >= 10
 
-# ... Repite para los campos que quieras ...
+# ----------------------------------------------------------------------
+#                   MOTOR DE VALIDACIÓN POR CAMPO
+# ----------------------------------------------------------------------
+# Cada campo de la denuncia tiene un tipo de regla. Las reglas locales aceptan o
+# rechazan el valor (y lo normalizan) sin llamar al LLM; solo los campos de texto
+# libre (tipo "llm") se siguen validando con gpt-4-turbo.
+#
+# validar_campo(campo, valor) -> (estado, valor_normalizado, motivo)
+#   estado: "valido", "invalido" o "llm" (hay que preguntarle al LLM)
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10,
+    "noviembre": 11, "diciembre": 12,
+    "ene": 1, "feb": 2, "mar": 3, "abr": 4, "may": 5, "jun": 6, "jul": 7,
+    "ago": 8, "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dic": 12
+}
+NOMBRES_MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+                 "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+
+REGLAS_CAMPOS = {
+    "nombre_completo":           {"tipo": "nombre"},
+    "telefono":                  {"tipo": "telefono"},
+    "domicilio":                 {"tipo": "domicilio"},
+    "correo":                    {"tipo": "correo"},
+    "persona_autorizada1":       {"tipo": "nombre"},
+    "persona_autorizada2":       {"tipo": "nombre"},
+    "fecha_hechos":              {"tipo": "fecha"},
+    "lugar_hechos":              {"tipo": "texto", "minimo": 5},
+    "ciudad":                    {"tipo": "ciudad"},
+    "persona_denunciada":        {"tipo": "nombre"},
+    "relacion_denunciada":       {"tipo": "texto", "minimo": 3},
+    "narraciones":               {"tipo": "llm"},
+    "afectacion":                {"tipo": "llm"},
+    "medidas_cautelares":        {"tipo": "opcion"},  # menú propio en app.chat
+    "medidas_proteccion":        {"tipo": "opcion"},  # menú propio en app.chat
+    "tipo_prueba":               {"tipo": "opcion"},  # menú propio en app.chat
+    "prueba_confesional":        {"tipo": "texto", "minimo": 10},
+    "prueba_testimonial":        {"tipo": "texto", "minimo": 10},
+    "quien_desahoga":            {"tipo": "texto", "minimo": 5},
+    "numero_notarial":           {"tipo": "numero"},
+    "notario_publico_numero":    {"tipo": "numero"},
+    "donde_funciones_notario":   {"tipo": "ciudad"},
+    "fecha_intrumento_notarial": {"tipo": "fecha"},
+    "numeros_prueba":            {"tipo": "numeros"},
+    "documentos_oficiales":      {"tipo": "texto", "minimo": 5},
+    "folio":                     {"tipo": "folio"},
+    "fecha_folio":               {"tipo": "fecha"},
+    "documento_prueba":          {"tipo": "texto", "minimo": 10},
+    # Campos extra de la prueba documental
+    "autoridad_emite":           {"tipo": "texto", "minimo": 3},
+    "acto_documento":            {"tipo": "texto", "minimo": 10},
+}
+
+
+def quitar_acentos(texto: str) -> str:
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
 
-VALIDATION_RULES = {
-    "nombre_completo": es_nombre_valido,
-    "telefono": es_telefono_valido,
-    "correo": es_correo_valido,
-    "domicilio": es_domicilio_valido,
-    "narraciones": es_narracion_valida,
-    # etc...
+def interpretar_fecha(valor: str):
+    """Reconoce '5 de febrero de 2023', '05/02/2023', '5-2-2023' o '2023-02-05'."""
+    texto = quitar_acentos(valor.strip().lower())
+    m = re.search(r"(\d{1,2})\s*(?:de\s+)?([a-z]+)\.?\s*(?:de[l]?\s+)?(\d{4})", texto)
+    if m and m.group(2) in MESES:
+        dia, mes, anio = int(m.group(1)), MESES[m.group(2)], int(m.group(3))
+    else:
+        m = re.search(r"(\d{4})[/\-.](\d{1,2})[/\-.](\d{1,2})", texto)
+        if m:
+            anio, mes, dia = int(m.group(1)), int(m.group(2)), int(m.group(3))
+        else:
+            m = re.search(r"(\d{1,2})[/\-.](\d{1,2})[/\-.](\d{4})", texto)
+            if not m:
+                return None
+            dia, mes, anio = int(m.group(1)), int(m.group(2)), int(m.group(3))
+    try:
+        return date(anio, mes, dia)
+    except ValueError:
+        return None
+
+def _validar_nombre(valor, regla):
+    nombre = " ".join(valor.split())
+    if not es_nombre_valido(nombre):
+        return False, valor, "debe incluir al menos nombre y apellido"
+    if not re.fullmatch(r"[^\W\d_]+(?:[ .'\-][^\W\d_]*)*", nombre):
+        return False, valor, "solo puede contener letras"
+    return True, nombre.title(), None
+
+def _validar_telefono(valor, regla):
+    digitos = re.sub(r"[\s\-().]", "", valor)
+    if digitos.startswith("+52"):
+        digitos = digitos[3:]
+    if not es_telefono_valido(digitos):
+        return False, valor, "debe tener solo dígitos (entre 7 y 15)"
+    return True, digitos, None
+
+def _validar_correo(valor, regla):
+    correo = valor.strip()
+    if not es_correo_valido(correo):
+        return False, valor, "debe tener el formato usuario@dominio.com"
+    return True, correo, None
+
+def _validar_domicilio(valor, regla):
+    if not es_domicilio_valido(valor) or not re.search(r"[^\W\d_]", valor):
+        return False, valor, "debe incluir calle, número y colonia"
+    return True, valor.strip(), None
+
+def _validar_fecha(valor, regla):
+    fecha = interpretar_fecha(valor)
+    if fecha is None:
+        return False, valor, "no reconozco la fecha (usa por ejemplo '5 de febrero de 2023')"
+    if fecha > date.today():
+        return False, valor, "la fecha no puede ser posterior a hoy"
+    return True, f"{fecha.day} de {NOMBRES_MESES[fecha.month - 1]} de {fecha.year}", None
+
+def _validar_ciudad(valor, regla):
+    from formato_denuncia import ciudad_estado
+
+    ciudad = " ".join(valor.split()).lower()
+    buscada = quitar_acentos(ciudad)
+    for conocida in ciudad_estado:
+        if quitar_acentos(conocida) == buscada:
+            return True, conocida, None
+    if not re.fullmatch(r"[^\W\d_]+(?:[ ,.'\-]+[^\W\d_]+)*", ciudad):
+        return False, valor, "solo puede contener el nombre de la ciudad"
+    return None, valor, None  # Ciudad plausible pero desconocida: decide el LLM
+
+def _validar_texto(valor, regla):
+    texto = valor.strip()
+    if len(texto) < regla.get("minimo", 3) or not re.search(r"[^\W\d_]", texto):
+        return False, valor, "es demasiado corto; describe un poco más"
+    return True, texto, None
+
+def _validar_numero(valor, regla):
+    m = re.search(r"\d[\d/\-]*", valor)
+    if not m:
+        return False, valor, "debe contener el número"
+    return True, m.group(0), None
+
+def _validar_numeros(valor, regla):
+    if not re.search(r"\d", valor):
+        return False, valor, "indica los números de los hechos (ej: '1, 2 y 3')"
+    return True, valor.strip(), None
+
+def _validar_folio(valor, regla):
+    folio = re.sub(r"^(folio|n[uú]mero|n[uú]m\.?|no\.?)\s*:?\s*", "", valor.strip(), flags=re.IGNORECASE)
+    if not re.fullmatch(r"[\w][\w/\-. ]*", folio) or not re.search(r"\d", folio):
+        return False, valor, "debe contener el número de folio"
+    return True, folio.upper(), None
+
+def _validar_opcion(valor, regla):
+    return bool(valor.strip()), valor.strip(), None
+
+VALIDADORES = {
+    "nombre": _validar_nombre,
+    "telefono": _validar_telefono,
+    "correo": _validar_correo,
+    "domicilio": _validar_domicilio,
+    "fecha": _validar_fecha,
+    "ciudad": _validar_ciudad,
+    "texto": _validar_texto,
+    "numero": _validar_numero,
+    "numeros": _validar_numeros,
+    "folio": _validar_folio,
+    "opcion": _validar_opcion,
 }
 
+def validar_campo(campo: str, valor: str):
+    """Valida localmente un dato de la denuncia. Ver REGLAS_CAMPOS."""
+    regla = REGLAS_CAMPOS.get(campo, {"tipo": "llm"})
+    if regla["tipo"] == "llm":
+        return "llm", valor.strip(), None
+    ok, normalizado, motivo = VALIDADORES[regla["tipo"]](valor, regla)
+    if ok is None:
+        return "llm", normalizado.strip(), None
+    return ("valido" if ok else "invalido"), normalizado, motivo
+
 # ----------------------------------------------------------------------
 #                                LISTAS
 # ----------------------------------------------------------------------
@@ -421,3 +593,94 @@ field_info = {
 }
 
 
+# ----------------------------------------------------------------------
+#                       TEXTOS FIJOS DEL BOT (AUDIO)
+# ----------------------------------------------------------------------
+# Textos que se convierten a voz y que solo dependen de las listas anteriores
+# o del nombre de los campos. Se generan desde aquí para que paquete_audio.py
+# pueda enumerarlos y pre-renderizar su audio.
+
+TEXTO_PROCESO_CANCELADO = "Proceso cancelado. ¿En qué más puedo ayudarte?"
+
+TEXTO_DENUNCIA_GENERADA = (
+    "La denuncia ha sido generada correctamente. Puedes descargarla en el link que te genere. "
+    "Este es un formato de denuncia con los datos proporcionados. "
+    "Puedes revisarlo y editarlo si lo deseas. ¡Estoy aquí para ayudarte!"
+)
+
+TEXTO_OTRA_CAUTELAR = "Escribe la medida cautelar adicional que deseas. Cuando termines, escribe 'terminar'."
+
+TEXTO_OTRA_PROTECCION = "Escribe la medida de protección adicional que deseas. Cuando termines, escribe 'terminar'."
+
+TEXTO_MENU_TIPO_PRUEBA = "¿Qué tipo de prueba deseas ofrecer? Elige una opción: 1️.Confesional,2️.Testimonial, 3️.Documental Pública o Privada, 4️.Presuncional Legal y Humana, 5️.Instrumental de Actuaciones, Escribe el número de la opción que deseas elegir. puedes escribir para omitir o cancelar para terminar el proceso"
+
+TEXTO_MENU_TIPO_PRUEBA_OMITIR = (
+    "¿Qué tipo de prueba deseas ofrecer? Elige una opción:\n"
+    "1️⃣ Confesional\n2️⃣ Testimonial\n3️⃣ Documental Pública o Privada\n"
+    "4️⃣ Presuncional Legal y Humana\n5️⃣ Instrumental de Actuaciones\n"
+    "Escribe el número de la opción o 'omitir/cancelar'."
+)
+
+TEXTO_NARRACION_AGREGADA = "Narración agregada. ¿Deseas **agregar** otro hecho o **terminar**?"
+
+TEXTO_MENU_DECISION = "🔍 ¿Qué deseas hacer?. 1️.**📄 Iniciar el proceso de denuncia.**,2️.**🧠 Recibir orientación antes de denunciar.** Escribe '1' para iniciar la denuncia o '2' para orientación."
+
+
+def opciones_medidas_cautelares():
+    return "\n".join(f"{i+1}. {op}" for i, op in enumerate(MEDIDAS_CAUTELARES_OPCIONES))
+
+def opciones_medidas_proteccion():
+    return "\n".join(f"{i+1}. {op}" for i, op in enumerate(MEDIDAS_PROTECCION_OPCIONES))
+
+def texto_menu_medidas_cautelares():
+    return f"Estas son las medidas cautelares disponibles: {opciones_medidas_cautelares()}. Para seleccionar, escribe los números separados por comas (ej: '1,3'). Escribe 'otra' para agregar una medida no listada. Cuando termines, escribe 'terminar'."
+
+def texto_menu_medidas_proteccion():
+    return f"Estas son las medidas de protección disponibles: {opciones_medidas_proteccion()}.Para seleccionar, escribe los números separados por comas (ej: '1,3').Escribe 'otra' para agregar una medida no listada. Cuando termines, escribe 'terminar'."
+
+def texto_cautelares_registradas():
+    return f"Se han registrado tus medidas cautelares. Ahora, selecciona las **medidas de protección** que solicitas para proteger tus derechos. Estas son las medidas de protección disponibles: {opciones_medidas_proteccion()}. Para seleccionar, escribe los números separados por comas (ej: '1,3'). Escribe 'otra' para agregar una medida no listada. Cuando termines, escribe 'terminar'."
+
+def texto_proteccion_registrada(siguiente_dato):
+    return f"✅ Se han registrado tus medidas de protección.Ahora necesito **{siguiente_dato}**.¿Qué tipo de prueba deseas ofrecer? Elige una opción: 1️.Confesional,2️.Testimonial,3️.Documental Pública o Privada,4️.Presuncional Legal y Humana,5️.Instrumental de Actuaciones,Escribe el número de la opción que deseas elegir, o escribe 'omitir' si no deseas proporcionarlo, o 'cancelar' para salir."
+
+def texto_prueba_registrada(tipo_prueba, siguiente_dato):
+    return f"✅ Se ha registrado tu prueba {tipo_prueba}. Ahora necesito **{siguiente_dato}**."
+
+def texto_narraciones_registradas(siguiente_dato):
+    desc = field_info.get("narraciones", {}).get("descripcion", "Información no disponible.")
+    ejemp = field_info.get("narraciones", {}).get("ejemplo", "Ejemplo no disponible.")
+    return f"Se han registrado tus narraciones. Ahora necesitamos **{siguiente_dato}**, {desc}. un ejemplo de como llenarlo seria: {ejemp}. ¿Podrías proporcionarlo ahora?. Si no deseas darlo, escribe 'omitir', o 'cancelar'."
+
+def texto_dato_registrado(dato_actual, siguiente_dato):
+    desc = field_info.get(siguiente_dato, {}).get("descripcion", "Información no disponible.")
+    ejemp = field_info.get(siguiente_dato, {}).get("ejemplo", "Ejemplo no disponible.")
+    return f"se ha registrado **{dato_actual}**. El siguiente dato es **{siguiente_dato}**, que sirve {desc}. {ejemp},¿Podrías proporcionarlo?"
+
+def texto_inicio_denuncia(primer_dato):
+    return f"Perfecto, iniciaremos la denuncia. A continuación te mostraré la lista de datos que necesitaremos y por qué son importantes: 1.Nombre completo: Para identificar formalmente a la persona que presenta la denuncia. 2.Teléfono Un medio de contacto para resolver dudas o enviar notificaciones. 3.Domicilio: Tu dirección oficial, necesaria en algunos trámites legales. 4.Correo Para envío de notificaciones y seguimiento digital. 5.Personas autorizadas: Si deseas que alguien más reciba notificaciones o te ayude en el proceso. 6.Fecha de los hechos: El día en que ocurrieron los hechos que denuncias. 7.Lugar de los hechos: Dónde sucedieron esos hechos. 8.Ciudad: Ubicación general para contextualizar lo ocurrido. 9.Persona denunciada: Nombre completo de la persona a quien diriges la denuncia. 10.Relación con la persona denunciada: Si es familiar, colega, etc. 11.Narración de los hechos: Descripción detallada de lo que ocurrió. 12.Afectación: Cómo te impactaron estos hechos. 13.Medidas cautelares: Acciones urgentes que solicitas para proteger tus derechos. 14.Protección: Medidas adicionales de protección que consideras necesarias.15.Pruebas: Testimonios, documentos u otras evidencias que respalden la denuncia. Te iré solicitando estos datos uno por uno. Puedes omitir un dato si no lo deseas proporcionar, o escribir cancelar para detener el proceso en cualquier momento. Para comenzar, por favor, indícame {primer_dato}."
+
+def texto_omitido_dependiente(dato_actual):
+    return f"Se ha omitido **{dato_actual}** automáticamente porque omitiste `tipo_prueba`"
+
+def texto_omitido_cautelares(dato_actual):
+    return (
+        f"Se ha omitido **{dato_actual}**. Ahora, selecciona las **medidas cautelares** que solicitas. "
+        f"Opciones:\n{opciones_medidas_cautelares()}\nPara seleccionar, escribe los números separados por comas (ej: '1,3'). "
+        "Escribe 'otra' para agregar una medida no listada. Cuando termines, escribe 'terminar'."
+    )
+
+def texto_omitido_proteccion(dato_actual):
+    return (
+        f"✅ Se ha omitido **{dato_actual}**. "
+        "Ahora, selecciona las **medidas de protección** que solicitas. "
+        f"Estas son las opciones:\n{opciones_medidas_proteccion()}"
+    )
+
+def texto_omitido_siguiente(dato_actual, siguiente_dato):
+    desc = field_info.get(siguiente_dato, {}).get("descripcion", "")
+    ejemp = field_info.get(siguiente_dato, {}).get("ejemplo", "")
+    return (
+        f"Se ha omitido **{dato_actual}**. Ahora, **{siguiente_dato}** es importante {desc}. {ejemp}. "
+        "¿Podrías proporcionarlo ahora? O escribe 'omitir' si no deseas darlo, o 'cancelar' para detener."
+    )
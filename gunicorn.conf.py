@@ -0,0 +1,49 @@
+import os
+
+# ----------------------------------------------------------------------
+#                     CONFIGURACIÓN DE GUNICORN
+# ----------------------------------------------------------------------
+# Uso:  gunicorn -c gunicorn.conf.py
+# Con GUNICORN_PRECARGA=1 (por defecto) el maestro importa la app y, con
+# GUNICORN_PRECALENTAR=maestro, carga índice y modelos una sola vez; los workers
+# los heredan por copy-on-write. Con GUNICORN_PRECALENTAR=workers cada worker los
+# carga en segundo plano y atiende desde que arranca (ver wsgi.py).
+# Se puede elegir el tipo de worker:
+#   - gthread (por defecto): Flask con GUNICORN_HILOS hilos por worker.
+#   - uvicorn.workers.UvicornWorker: el modo ASGI de asgi.py.
+# /health indica que el proceso vive y /ready que el índice ya está cargado.
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", str(max(2, os.cpu_count() or 1))))
+threads = int(os.getenv("GUNICORN_HILOS", "8"))
+preload_app = os.getenv("GUNICORN_PRECARGA", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))  # respuestas del LLM y lotes de PDFs
+graceful_timeout = 30
+keepalive = 5
+
+wsgi_app = "wsgi:crear_app_asgi()" if "uvicorn" in worker_class.lower() else "wsgi:crear_app()"
+
+# Los tokenizers de Hugging Face se bloquean si se hace fork después de usar su paralelismo
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+# lote_denuncias reparte los núcleos entre los workers según WEB_CONCURRENCY
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# El paquete de audio lo arranca el primer worker y no el maestro: un hilo del
+# maestro que esté a medias durante el fork deja sus candados tomados en los workers
+PAQUETE_AUDIO = os.environ.pop("AUDIO_PAQUETE_AL_INICIAR", "0") == "1"
+
+
+def when_ready(server):
+    server.log.info(f"Workers: {workers} x {worker_class} ({threads} hilos), precarga={preload_app}")
+
+
+def post_worker_init(worker):
+    if os.getenv("GUNICORN_PRECALENTAR", "maestro") == "workers":
+        import app
+
+        app.cargar_recursos_en_segundo_plano()
+    if PAQUETE_AUDIO and worker.age == 1:
+        from paquete_audio import iniciar_precalentamiento
+
+        iniciar_precalentamiento()
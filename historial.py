@@ -0,0 +1,216 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from cliente_llm import completar
+
+# ----------------------------------------------------------------------
+#          HISTORIAL DE LA CONVERSACIÓN CON PRESUPUESTO DE TOKENS
+# ----------------------------------------------------------------------
+# Cada llamada al LLM enviaba [SYSTEM_PROMPT] + session["messages"] completo:
+# el costo y la latencia crecían con cada turno y, al final de una denuncia,
+# el prompt cargaba decenas de valores del formulario que no venían al caso.
+# Ahora el contexto de cada llamada es:
+#   [prompt de sistema] + [resumen de lo anterior] + [últimos turnos que caben
+#   en HISTORIAL_MAX_TOKENS]
+# Los mensajes del llenado del formulario se marcan con "tipo": "formulario" y
+# no entran al contexto del chat general. Cuando los turnos sin resumir pasan de
+# HISTORIAL_RESUMIR_TOKENS, un hilo en segundo plano resume los más viejos (fuera
+# del camino de la petición); el resumen se guarda en la sesión en la petición
+# siguiente. Mientras tanto, los turnos que no caben simplemente se omiten.
+# Los resúmenes que nadie recoge (la usuaria se fue, o su siguiente petición
+# llegó a otro worker) se desalojan por LRU y vencen tras HISTORIAL_RESUMEN_TTL.
+
+HISTORIAL_MAX_TOKENS = int(os.getenv("HISTORIAL_MAX_TOKENS", "2000"))  # historial por llamada, sin el prompt de sistema
+HISTORIAL_RESUMIR_TOKENS = int(os.getenv("HISTORIAL_RESUMIR_TOKENS", "1500"))
+HISTORIAL_TURNOS_RECIENTES = 6  # mensajes que nunca se resumen
+HISTORIAL_MODELO_RESUMEN = os.getenv("HISTORIAL_MODELO_RESUMEN", "gpt-4-turbo")
+HISTORIAL_RESUMEN_MAX_TOKENS = 300
+HISTORIAL_RESUMENES_MAX = int(os.getenv("HISTORIAL_RESUMENES_MAX", "1000"))  # terminados sin recoger, por proceso
+HISTORIAL_RESUMEN_TTL = int(os.getenv("HISTORIAL_RESUMEN_TTL", "3600"))  # segundos
+TOKENS_POR_MENSAJE = 4  # formato de cada mensaje del chat (rol, separadores)
+
+PROMPT_RESUMEN = """
+Resume en español, en máximo 8 viñetas, la conversación entre una usuaria y un
+asistente sobre violencia política contra las mujeres en razón de género.
+Conserva los hechos que contó la usuaria, sus dudas, las leyes o artículos
+mencionados y lo que el asistente ya le explicó. No inventes nada.
+"""
+
+_codificador = None
+_codificador_cargado = False
+_lock = threading.Lock()
+_resumenes = OrderedDict()  # id de sesión -> (expira, estado del resumen terminado en segundo plano)
+_en_curso = set()
+_ejecutor = None
+_ejecutor_pid = None  # los hilos no sobreviven a un fork
+_estadisticas = {
+    "llamadas": 0,
+    "tokens_contexto": 0,
+    "tokens_contexto_max": 0,
+    "mensajes_omitidos": 0,
+    "resumenes": 0,
+    "errores_resumen": 0,
+}
+
+
+def contar_tokens(texto):
+    """Tokens de `texto` con tiktoken; si no está disponible, ~4 caracteres por token."""
+    global _codificador, _codificador_cargado
+    if not _codificador_cargado:
+        try:
+            import tiktoken
+
+            _codificador = tiktoken.get_encoding("cl100k_base")  # el de gpt-4-turbo
+        except Exception as e:
+            print(f"⚠️ tiktoken no disponible ({str(e)}); se estiman los tokens por caracteres.")
+        _codificador_cargado = True
+    if _codificador is None:
+        return len(texto) // 4 + 1
+    return len(_codificador.encode(texto, disallowed_special=()))
+
+
+def tokens_mensaje(mensaje):
+    return TOKENS_POR_MENSAJE + contar_tokens(mensaje.get("content") or "")
+
+
+def huella(mensaje):
+    return hashlib.sha256((mensaje.get("content") or "").encode("utf-8")).hexdigest()[:16]
+
+
+def estado_vigente(estado, messages):
+    """El resumen sirve si los mensajes que cubre siguen en el historial (no se borró la sesión)."""
+    if not estado or not estado.get("hasta"):
+        return None
+    hasta = estado["hasta"]
+    if len(messages) < hasta or huella(messages[hasta - 1]) != estado.get("huella"):
+        return None
+    return estado
+
+
+def sincronizar_resumen(clave, estado, messages):
+    """Estado del resumen para la sesión: el guardado o uno más nuevo terminado en segundo plano."""
+    estado = estado_vigente(estado, messages)
+    with _lock:
+        # Una vez en la sesión ya no hace falta en memoria
+        expira, nuevo = _resumenes.pop(clave, (0, None))
+    nuevo = estado_vigente(nuevo, messages) if expira > time.monotonic() else None
+    if nuevo and (estado is None or nuevo["hasta"] > estado["hasta"]):
+        return nuevo
+    return estado
+
+
+def construir_contexto(system_prompt, messages, estado=None, incluir_formulario=False):
+    """
+    Mensajes para el LLM: prompt de sistema, resumen (si hay) y los turnos más
+    recientes que caben en HISTORIAL_MAX_TOKENS. El último mensaje siempre va.
+    """
+    desde = estado["hasta"] if estado else 0
+    presupuesto = HISTORIAL_MAX_TOKENS
+    contexto = [{"role": "system", "content": system_prompt}]
+    if estado:
+        texto = f"Resumen de la conversación anterior:\n{estado['texto']}"
+        contexto.append({"role": "system", "content": texto})
+        presupuesto -= TOKENS_POR_MENSAJE + contar_tokens(texto)
+
+    ventana = []
+    candidatos = [m for m in messages[desde:] if incluir_formulario or m.get("tipo") != "formulario"]
+    for mensaje in reversed(candidatos):
+        costo = tokens_mensaje(mensaje)
+        if ventana and costo > presupuesto:
+            break
+        ventana.append({"role": mensaje["role"], "content": mensaje["content"]})
+        presupuesto -= costo
+    ventana.reverse()
+
+    tokens = sum(tokens_mensaje(m) for m in contexto + ventana)
+    with _lock:
+        _estadisticas["llamadas"] += 1
+        _estadisticas["tokens_contexto"] += tokens
+        _estadisticas["tokens_contexto_max"] = max(_estadisticas["tokens_contexto_max"], tokens)
+        _estadisticas["mensajes_omitidos"] += len(candidatos) - len(ventana)
+    return contexto + ventana
+
+
+def programar_resumen(clave, messages, estado=None):
+    """Si los turnos sin resumir pesan demasiado, los resume en segundo plano (no bloquea)."""
+    if clave is None:
+        return
+    desde = estado["hasta"] if estado else 0
+    hasta = len(messages) - HISTORIAL_TURNOS_RECIENTES
+    pendientes = [m for m in messages[desde:hasta] if m.get("tipo") != "formulario"]
+    if hasta <= desde or not pendientes:
+        return
+    if sum(tokens_mensaje(m) for m in messages[desde:] if m.get("tipo") != "formulario") < HISTORIAL_RESUMIR_TOKENS:
+        return
+
+    with _lock:
+        if clave in _en_curso:
+            return
+        _en_curso.add(clave)
+    _obtener_ejecutor().submit(_resumir, clave, estado, pendientes, hasta, huella(messages[hasta - 1]))
+
+
+def _resumir(clave, estado, pendientes, hasta, huella_final):
+    try:
+        inicio = time.perf_counter()
+        conversacion = "\n".join(f"{'Usuaria' if m['role'] == 'user' else 'Asistente'}: {m['content']}"
+                                 for m in pendientes)
+        if estado:
+            conversacion = f"Resumen previo:\n{estado['texto']}\n\nContinuación:\n{conversacion}"
+        completion = completar(
+            nombre="resumen",
+            cubrir=False,  # va en segundo plano: no vale la pena duplicar la llamada
+            model=HISTORIAL_MODELO_RESUMEN,
+            messages=[{"role": "system", "content": PROMPT_RESUMEN},
+                      {"role": "user", "content": conversacion}],
+            max_tokens=HISTORIAL_RESUMEN_MAX_TOKENS
+        )
+        texto = completion.choices[0].message.content if completion.choices else ""
+        if not texto:
+            raise ValueError("respuesta vacía")
+        ahora = time.monotonic()
+        with _lock:
+            _resumenes[clave] = (ahora + HISTORIAL_RESUMEN_TTL,
+                                 {"texto": texto.strip(), "hasta": hasta, "huella": huella_final})
+            _resumenes.move_to_end(clave)
+            # Los más viejos van al frente: se sacan los vencidos y lo que pase del máximo
+            while _resumenes and (len(_resumenes) > HISTORIAL_RESUMENES_MAX
+                                  or next(iter(_resumenes.values()))[0] <= ahora):
+                _resumenes.popitem(last=False)
+            _estadisticas["resumenes"] += 1
+        print(f"🗜️ Historial resumido ({len(pendientes)} mensajes) en {time.perf_counter() - inicio:.1f} s.")
+    except Exception as e:
+        with _lock:
+            _estadisticas["errores_resumen"] += 1
+        print(f"⚠️ No se pudo resumir el historial: {str(e)}")
+    finally:
+        with _lock:
+            _en_curso.discard(clave)
+
+
+def _obtener_ejecutor():
+    global _ejecutor, _ejecutor_pid
+    with _lock:
+        if _ejecutor_pid != os.getpid():
+            _ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="resumen")
+            _ejecutor_pid = os.getpid()
+        return _ejecutor
+
+
+def olvidar_resumen(clave):
+    """Se llama al borrar la conversación."""
+    with _lock:
+        _resumenes.pop(clave, None)
+
+
+def estadisticas_historial():
+    with _lock:
+        stats = dict(_estadisticas)
+        stats["resumenes_en_memoria"] = len(_resumenes)
+    llamadas = stats["llamadas"]
+    stats["tokens_contexto_promedio"] = round(stats.pop("tokens_contexto") / llamadas, 1) if llamadas else 0.0
+    return stats
@@ -0,0 +1,360 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+import faiss
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_openai import OpenAIEmbeddings
+
+from embeddings_locales import EmbeddingsLocales, id_embeddings_locales
+from fragmentador_legal import FRAGMENTO_MAX, FRAGMENTO_MIN, FRAGMENTO_TRASLAPE, iterar_fragmentos
+from ingesta_pdfs import INGESTA_LOTE_EMBEDDINGS, Ingesta, limpiar_cache
+import pools_procesos
+
+# ----------------------------------------------------------------------
+#                  ÍNDICE FAISS VERSIONADO CON MANIFIESTO
+# ----------------------------------------------------------------------
+# Cada índice vive en faiss_index/<version>/ junto a un manifest.json con el
+# hash de cada PDF del corpus, los parámetros de fragmentación y el modelo de
+# embeddings. La versión es un digest de ese manifiesto: si nada cambió, el
+# arranque solo verifica los hashes y mapea el índice a memoria (sin llamar a
+# la API de embeddings). Si algo cambió, se reconstruye y se publica con un
+# rename atómico, así otros workers nunca ven un índice a medio escribir.
+#
+# La actualización es incremental: cada fragmento tiene un id derivado de su
+# PDF, página y contenido, y el manifiesto guarda los ids de cada PDF. Solo se
+# vuelven a fragmentar los PDFs cuyo hash cambió, solo se embeben los
+# fragmentos nuevos y se borran los vectores de los que ya no existen.
+#
+# Las páginas llegan de ingesta_pdfs (extracción en paralelo con caché) y
+# fluyen hacia la fragmentación y los embeddings en lotes de
+# INGESTA_LOTE_EMBEDDINGS fragmentos; el resumen incluye el rendimiento de cada etapa.
+#
+# Uso:  python indice.py [--reconstruir] [--limpiar]
+
+PDF_FOLDER = "static/pdfs"
+INDEX_PATH = "faiss_index"  # Carpeta raíz de las versiones del índice
+INDEX_FORMATO = 3  # Cambiarlo invalida todos los índices guardados
+FRAGMENTADOR = os.getenv("FRAGMENTADOR", "legal")  # legal (por artículos) | recursivo
+CHUNK_SIZE = 1000  # solo para el fragmentador recursivo
+CHUNK_OVERLAP = 200
+EMBEDDINGS_PROVIDER = os.getenv("EMBEDDINGS_PROVIDER", "local")  # local | openai
+EMBEDDINGS_MODELO = os.getenv("EMBEDDINGS_MODELO", "text-embedding-ada-002")  # modelo de OpenAI
+
+
+def crear_embeddings():
+    if EMBEDDINGS_PROVIDER == "openai":
+        return OpenAIEmbeddings(model=EMBEDDINGS_MODELO)
+    return EmbeddingsLocales()
+
+
+def id_embeddings():
+    """Identificador del modelo de embeddings que se guarda en el manifiesto."""
+    if EMBEDDINGS_PROVIDER == "openai":
+        return f"openai:{EMBEDDINGS_MODELO}"
+    return id_embeddings_locales()
+
+
+def hash_archivo(ruta):
+    digest = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+def archivos_corpus():
+    """PDFs del corpus en orden estable."""
+    if not os.path.exists(PDF_FOLDER):
+        return []
+    return sorted(f for f in os.listdir(PDF_FOLDER) if f.endswith(".pdf"))
+
+
+def manifiesto_esperado():
+    """Manifiesto que debería tener el índice para el corpus y la configuración actuales."""
+    manifiesto = {
+        "formato": INDEX_FORMATO,
+        "embeddings": id_embeddings(),
+        "fragmentacion": parametros_fragmentacion(),
+        "corpus": {nombre: hash_archivo(os.path.join(PDF_FOLDER, nombre))
+                   for nombre in archivos_corpus()},
+    }
+    manifiesto["version"] = version_manifiesto(manifiesto)
+    return manifiesto
+
+
+def parametros_fragmentacion():
+    if FRAGMENTADOR == "legal":
+        return {"metodo": "legal", "max": FRAGMENTO_MAX, "min": FRAGMENTO_MIN, "traslape": FRAGMENTO_TRASLAPE}
+    return {"metodo": "recursivo", "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+
+def compatible(manifiesto, otro):
+    """True si los vectores de `otro` se pueden reutilizar con la configuración de `manifiesto`."""
+    return all(manifiesto.get(k) == otro.get(k) for k in ("formato", "embeddings", "fragmentacion"))
+
+
+def version_manifiesto(manifiesto):
+    contenido = {k: v for k, v in manifiesto.items() if k not in ("version", "fragmentos")}
+    serializado = json.dumps(contenido, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()[:12]
+
+
+# Función para cargar y procesar documentos PDF
+def load_pdfs():
+    documents = []
+    if not os.path.exists(PDF_FOLDER):
+        print("❌ Carpeta de PDFs no encontrada.")
+        return []
+
+    with Ingesta() as ingesta:
+        for filename in archivos_corpus():
+            documents.extend(cargar_pdf(filename, ingesta))
+
+    return documents
+
+
+def cargar_pdf(filename, ingesta=None):
+    if ingesta is None:
+        with Ingesta() as ingesta:
+            return cargar_pdf(filename, ingesta)
+    ruta = os.path.join(PDF_FOLDER, filename)
+    docs = list(ingesta.paginas(ruta, hash_archivo(ruta)))
+    if docs:
+        print(f"📄 Cargado {filename} con {len(docs)} páginas.")
+    return docs
+
+
+def fragmentar_pdf(filename, ingesta, hash_pdf):
+    """Genera (fragmento, id) del PDF a medida que se extraen sus páginas; el id es estable por (PDF, página, contenido)."""
+    paginas = ingesta.paginas(os.path.join(PDF_FOLDER, filename), hash_pdf)
+    if FRAGMENTADOR == "legal":
+        fragmentos = iterar_fragmentos(paginas)
+    else:
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        fragmentos = (fragmento for pagina in paginas for fragmento in text_splitter.split_documents([pagina]))
+    vistos = {}
+    for doc in ingesta.medir("fragmentacion", fragmentos):
+        base = f"{filename}\x00{doc.metadata.get('page')}\x00{doc.page_content}"
+        repeticion = vistos[base] = vistos.get(base, -1) + 1  # Fragmentos idénticos en la misma página
+        yield doc, hashlib.sha256(f"{base}\x00{repeticion}".encode("utf-8")).hexdigest()[:32]
+
+
+def load_or_create_index(reconstruir=False):
+    """Carga el índice vigente si su manifiesto coincide con el corpus; si no, lo actualiza."""
+    manifiesto = manifiesto_esperado()
+    if not manifiesto["corpus"]:
+        print("❌ No hay documentos PDF disponibles. No se generará FAISS.")
+        return None
+
+    if reconstruir:
+        return actualizar_indice(None, manifiesto)[0]
+
+    db_instance = cargar_indice(os.path.join(INDEX_PATH, manifiesto["version"]), manifiesto)
+    if db_instance is not None:
+        return db_instance
+
+    # Se parte de la versión anterior más reciente para embeber solo lo que cambió
+    return actualizar_indice(indice_anterior(manifiesto), manifiesto)[0]
+
+
+def cargar_indice(carpeta, manifiesto):
+    """Abre el índice guardado en `carpeta` (mapeado a memoria) o None si no sirve."""
+    try:
+        with open(os.path.join(carpeta, "manifest.json"), encoding="utf-8") as f:
+            guardado = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        print(f"⚠️ No hay índice FAISS para la versión {manifiesto['version']}.")
+        return None
+
+    if version_manifiesto(guardado) != manifiesto["version"]:
+        print("⚠️ El manifiesto del índice FAISS no coincide con el corpus actual.")
+        return None
+
+    try:
+        index = faiss.read_index(os.path.join(carpeta, "index.faiss"),
+                                 faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        with open(os.path.join(carpeta, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    except Exception as e:
+        print(f"⚠️ Error al cargar índice FAISS: {str(e)}. Se intentará regenerar.")
+        return None
+
+    print(f"🔄 Índice FAISS {manifiesto['version']} cargado ({index.ntotal} vectores).")
+    db_instance = FAISS(crear_embeddings(), index, docstore, index_to_docstore_id)
+    db_instance.manifiesto = guardado
+    return db_instance
+
+
+def indice_anterior(manifiesto):
+    """La versión guardada más reciente cuyos vectores son compatibles, o None."""
+    if not os.path.isdir(INDEX_PATH):
+        return None
+    carpetas = [os.path.join(INDEX_PATH, nombre) for nombre in os.listdir(INDEX_PATH)
+                if not nombre.endswith(".tmp")]
+    for carpeta in sorted(filter(os.path.isdir, carpetas), key=os.path.getmtime, reverse=True):
+        try:
+            with open(os.path.join(carpeta, "manifest.json"), encoding="utf-8") as f:
+                guardado = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        if compatible(manifiesto, guardado) and "fragmentos" in guardado:
+            return cargar_indice(carpeta, guardado)
+    return None
+
+
+def copiar_indice(db_instance):
+    """Copia independiente (y escribible) de un índice, para modificarla sin tocar el original."""
+    index = faiss.deserialize_index(faiss.serialize_index(db_instance.index))
+    docstore = InMemoryDocstore(dict(db_instance.docstore._dict))
+    copia = FAISS(db_instance.embedding_function, index, docstore, dict(db_instance.index_to_docstore_id))
+    copia.manifiesto = db_instance.manifiesto
+    return copia
+
+
+def actualizar_indice(actual, manifiesto=None):
+    """
+    Lleva el índice `actual` (puede ser None) al corpus actual embebiendo solo los
+    fragmentos nuevos. No modifica `actual`: devuelve (índice_nuevo, resumen).
+    Pensado para correr fuera de db_lock; el llamador intercambia el índice al final.
+    """
+    inicio = time.perf_counter()
+    manifiesto = manifiesto or manifiesto_esperado()
+    previo = getattr(actual, "manifiesto", None)
+    if actual is not None and (previo is None or not compatible(manifiesto, previo)):
+        actual = None  # Otro modelo o fragmentación: hay que embeber todo
+    previo = previo if actual is not None else {"corpus": {}, "fragmentos": {}}
+
+    resumen = {"version": manifiesto["version"], "pdfs_nuevos": [], "pdfs_modificados": [],
+               "pdfs_eliminados": sorted(set(previo["corpus"]) - set(manifiesto["corpus"])),
+               "fragmentos_embebidos": 0, "fragmentos_eliminados": 0, "fragmentos_reutilizados": 0}
+
+    fragmentos_por_pdf = {}
+    existentes = set(actual.index_to_docstore_id.values()) if actual is not None else set()
+    embeddings = actual.embedding_function if actual is not None else crear_embeddings()
+    nuevo = None  # Copia de `actual` (o índice nuevo) que se crea con el primer lote
+    lote = []
+
+    def embeber_lote():
+        # Los fragmentos se embeben y se agregan por lotes: nunca están todos en memoria
+        nonlocal nuevo
+        textos = [doc.page_content for doc, _ in lote]
+        with ingesta.etapa("embeddings", len(lote)):
+            vectores = embeddings.embed_documents(textos)
+        with ingesta.etapa("indice", len(lote)):
+            pares = list(zip(textos, vectores))
+            metadatos = [doc.metadata for doc, _ in lote]
+            ids = [id_fragmento for _, id_fragmento in lote]
+            if nuevo is None and actual is not None:
+                nuevo = copiar_indice(actual)
+            if nuevo is None:
+                nuevo = FAISS.from_embeddings(pares, embeddings, metadatas=metadatos, ids=ids)
+            else:
+                nuevo.add_embeddings(pares, metadatas=metadatos, ids=ids)
+        resumen["fragmentos_embebidos"] += len(lote)
+        lote.clear()
+
+    with Ingesta() as ingesta:
+        for nombre, hash_pdf in manifiesto["corpus"].items():
+            if previo["corpus"].get(nombre) == hash_pdf:
+                fragmentos_por_pdf[nombre] = previo["fragmentos"][nombre]
+                continue
+            resumen["pdfs_modificados" if nombre in previo["corpus"] else "pdfs_nuevos"].append(nombre)
+            ids = fragmentos_por_pdf[nombre] = []
+            for doc, id_fragmento in fragmentar_pdf(nombre, ingesta, hash_pdf):
+                ids.append(id_fragmento)
+                if id_fragmento not in existentes:
+                    lote.append((doc, id_fragmento))
+                    if len(lote) >= INGESTA_LOTE_EMBEDDINGS:
+                        embeber_lote()
+            print(f"📄 {nombre}: {len(ids)} fragmentos.")
+        if lote:
+            embeber_lote()
+        resumen["etapas"] = ingesta.reporte()
+        if ingesta.etapas:
+            ingesta.imprimir_reporte()
+
+    vigentes = {i for ids in fragmentos_por_pdf.values() for i in ids}
+    obsoletos = sorted(existentes - vigentes)
+    resumen["fragmentos_reutilizados"] = len(existentes & vigentes)
+    resumen["fragmentos_eliminados"] = len(obsoletos)
+
+    if nuevo is None and not obsoletos and actual is not None and previo.get("version") == manifiesto["version"]:
+        return actual, dict(resumen, segundos=round(time.perf_counter() - inicio, 2))
+
+    print(f"📌 Índice FAISS {manifiesto['version']}: {resumen['fragmentos_embebidos']} fragmentos embebidos, "
+          f"{len(obsoletos)} por eliminar, {resumen['fragmentos_reutilizados']} reutilizados.")
+
+    if nuevo is None and actual is not None:
+        nuevo = copiar_indice(actual)
+    if nuevo is not None and obsoletos:
+        nuevo.delete(obsoletos)
+
+    if nuevo is None or not vigentes:
+        print("❌ No se pudieron generar fragmentos de texto. Verifica los documentos PDF.")
+        return None, dict(resumen, segundos=round(time.perf_counter() - inicio, 2))
+
+    nuevo.manifiesto = dict(manifiesto, fragmentos=fragmentos_por_pdf)
+    guardar_indice(nuevo, nuevo.manifiesto)
+    limpiar_cache(manifiesto["corpus"].values())
+    return nuevo, dict(resumen, segundos=round(time.perf_counter() - inicio, 2))
+
+
+def guardar_indice(db_instance, manifiesto):
+    """
+    Escribe el índice en una carpeta temporal y la publica con un rename atómico.
+    Una versión ya publicada no se toca nunca (otro worker puede estar leyéndola):
+    la carpeta lleva el hash del contenido, así que si ya existe es el mismo índice.
+    """
+    os.makedirs(INDEX_PATH, exist_ok=True)
+    carpeta = os.path.join(INDEX_PATH, manifiesto["version"])
+    if os.path.isdir(carpeta):
+        print(f"✅ Índice FAISS ya publicado en {carpeta}")
+        return
+    temporal = f"{carpeta}.{os.getpid()}.tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    db_instance.save_local(temporal)
+    with open(os.path.join(temporal, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+
+    try:
+        os.replace(temporal, carpeta)  # falla si otro worker ya publicó la carpeta
+    except OSError:
+        # Otro worker publicó la misma versión al mismo tiempo; se queda la suya
+        shutil.rmtree(temporal, ignore_errors=True)
+    print(f"✅ Índice FAISS guardado en {carpeta}")
+
+
+def limpiar_versiones(conservar):
+    """Elimina las versiones del índice distintas de `conservar`."""
+    if not os.path.isdir(INDEX_PATH):
+        return
+    for nombre in os.listdir(INDEX_PATH):
+        if nombre != conservar:
+            ruta = os.path.join(INDEX_PATH, nombre)
+            if os.path.isdir(ruta):
+                shutil.rmtree(ruta, ignore_errors=True)
+            else:
+                os.remove(ruta)
+            print(f"🧹 Índice FAISS obsoleto eliminado: {nombre}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    pools_procesos.PROCESOS_ARRANQUE = "fork"  # línea de comandos: un solo hilo, fork es seguro
+    parser = argparse.ArgumentParser(description="Construye o verifica el índice FAISS del corpus de PDFs.")
+    parser.add_argument("--reconstruir", action="store_true", help="ignora el índice guardado")
+    parser.add_argument("--limpiar", action="store_true", help="elimina versiones anteriores del índice")
+    args = parser.parse_args()
+
+    db_instance = load_or_create_index(reconstruir=args.reconstruir)
+    if db_instance is not None and args.limpiar:
+        limpiar_versiones(manifiesto_esperado()["version"])
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pypdf
+from langchain_core.documents import Document
+
+import pools_procesos
+
+# ----------------------------------------------------------------------
+#          INGESTA DE PDFs: EXTRACCIÓN EN PARALELO CON CACHÉ EN DISCO
+# ----------------------------------------------------------------------
+# PyPDFLoader leía cada PDF completo, página por página, en el hilo que
+# construía el índice (la CPEUM y la LGIPE tienen cientos de páginas) y
+# devolvía todas las páginas en una lista. Aquí:
+#   1) las páginas se extraen en un pool de procesos, en tareas de
+#      INGESTA_PAGINAS_POR_TAREA páginas, con pocas tareas en vuelo a la vez;
+#   2) el texto de cada página se guarda en cache_paginas/<hash del PDF>/,
+#      así un PDF ya visto (o reconstruir el índice con otro modelo de
+#      embeddings) no vuelve a pasar por pypdf;
+#   3) las páginas salen en orden como un generador, para que la fragmentación
+#      y los embeddings por lotes (ver indice.actualizar_indice) las consuman
+#      sin juntar todos los Documents en memoria.
+# Cada corrida mide cuánto tiempo pasa en cada etapa y su rendimiento.
+#
+# Uso:  python ingesta_pdfs.py [pdf ...] [--procesos N] [--sin-cache]
+
+INGESTA_PROCESOS = int(os.getenv("INGESTA_PROCESOS", str(os.cpu_count() or 1)))
+INGESTA_PAGINAS_POR_TAREA = int(os.getenv("INGESTA_PAGINAS_POR_TAREA", "16"))
+INGESTA_CACHE = os.getenv("INGESTA_CACHE", "cache_paginas")
+INGESTA_LOTE_EMBEDDINGS = int(os.getenv("INGESTA_LOTE_EMBEDDINGS", "256"))  # fragmentos por lote
+
+# El texto extraído depende de la versión de pypdf: otra versión usa otra carpeta
+VERSION_EXTRACCION = f"pypdf-{pypdf.__version__}"
+
+
+def carpeta_cache(hash_pdf):
+    return os.path.join(INGESTA_CACHE, f"{hash_pdf[:32]}-{VERSION_EXTRACCION}")
+
+
+def _escribir(ruta, contenido):
+    """Escritura atómica: otro proceso nunca lee un archivo a medias."""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def _extraer_paginas(ruta, paginas, carpeta):
+    """
+    Corre en los procesos del pool: extrae el texto de `paginas` (igual que
+    PyPDFLoader) y lo deja en la caché. Devuelve [(página, texto)].
+    """
+    lector = pypdf.PdfReader(ruta)
+    extraidas = []
+    for pagina in paginas:
+        texto = lector.pages[pagina].extract_text(extraction_mode="plain").strip()
+        if carpeta:
+            _escribir(os.path.join(carpeta, f"{pagina}.txt"), texto)
+        extraidas.append((pagina, texto))
+    return extraidas
+
+
+class Ingesta:
+    """
+    Una corrida de ingesta: el pool de procesos (se crea solo si alguna página
+    no está en caché) se comparte entre PDFs y se cierra al salir del `with`.
+    """
+
+    def __init__(self, procesos=INGESTA_PROCESOS, usar_cache=True):
+        self.procesos = max(1, procesos)
+        self.usar_cache = usar_cache
+        self._pool = None
+        self._inicio = time.perf_counter()
+        self._medido = 0.0  # tiempo ya atribuido a alguna etapa (para descontar las anidadas)
+        self.etapas = {}  # etapa -> {"elementos", "segundos"}
+        self.paginas_en_cache = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _obtener_pool(self):
+        if self._pool is None and self.procesos > 1:
+            try:
+                # /reload_index corre en un worker con hilos: nada de fork (ver pools_procesos.py)
+                self._pool = ProcessPoolExecutor(self.procesos, mp_context=pools_procesos.contexto(__name__))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ No se pudo crear el pool de ingesta ({str(e)}); se extrae en este proceso.")
+                self.procesos = 1
+        return self._pool
+
+    # --- Medición por etapa -------------------------------------------------
+
+    def _sumar(self, etapa, inicio, medido_antes, elementos):
+        # Solo el tiempo propio de la etapa: se descuenta lo que midieron las etapas anidadas
+        propio = time.perf_counter() - inicio - (self._medido - medido_antes)
+        self._medido += propio
+        datos = self.etapas.setdefault(etapa, {"elementos": 0, "segundos": 0.0})
+        datos["elementos"] += elementos
+        datos["segundos"] += propio
+
+    def medir(self, etapa, iterable):
+        """Envuelve un generador y atribuye a `etapa` el tiempo de producir cada elemento."""
+        iterador = iter(iterable)
+        while True:
+            inicio, medido_antes = time.perf_counter(), self._medido
+            try:
+                elemento = next(iterador)
+            except StopIteration:
+                self._sumar(etapa, inicio, medido_antes, 0)
+                return
+            self._sumar(etapa, inicio, medido_antes, 1)
+            yield elemento
+
+    @contextmanager
+    def etapa(self, nombre, elementos):
+        inicio, medido_antes = time.perf_counter(), self._medido
+        try:
+            yield
+        finally:
+            self._sumar(nombre, inicio, medido_antes, elementos)
+
+    def reporte(self):
+        """{etapa: {"elementos", "segundos", "por_segundo"}} más el total de la corrida."""
+        reporte = {
+            etapa: {"elementos": datos["elementos"], "segundos": round(datos["segundos"], 2),
+                    "por_segundo": round(datos["elementos"] / datos["segundos"], 1) if datos["segundos"] else None}
+            for etapa, datos in self.etapas.items()
+        }
+        if "extraccion" in reporte:
+            reporte["extraccion"]["en_cache"] = self.paginas_en_cache
+        reporte["total_segundos"] = round(time.perf_counter() - self._inicio, 2)
+        return reporte
+
+    def imprimir_reporte(self):
+        for etapa, datos in self.reporte().items():
+            if etapa != "total_segundos":
+                extra = f", {datos['en_cache']} de caché" if "en_cache" in datos else ""
+                print(f"⏱️ {etapa}: {datos['elementos']} en {datos['segundos']} s "
+                      f"({datos['por_segundo'] or '-'}/s{extra})")
+
+    # --- Páginas ------------------------------------------------------------
+
+    def paginas(self, ruta, hash_pdf):
+        """Genera en orden los Documents de cada página del PDF (como PyPDFLoader)."""
+        return self.medir("extraccion", self._paginas(ruta, hash_pdf))
+
+    def _paginas(self, ruta, hash_pdf):
+        carpeta = carpeta_cache(hash_pdf) if self.usar_cache else None
+        info = self._info(ruta, carpeta)
+        base = {"source": ruta, "total_pages": info["total_pages"]}
+        if info.get("title"):
+            base["title"] = info["title"]
+
+        faltantes = [p for p in range(info["total_pages"])
+                     if carpeta is None or not os.path.exists(os.path.join(carpeta, f"{p}.txt"))]
+        tareas = [faltantes[i:i + INGESTA_PAGINAS_POR_TAREA]
+                  for i in range(0, len(faltantes), INGESTA_PAGINAS_POR_TAREA)]
+        tarea_de = {pagina: i for i, tarea in enumerate(tareas) for pagina in tarea}
+        pool = self._obtener_pool() if len(tareas) > 1 else None
+        en_vuelo = {}  # índice de la tarea -> future
+        siguiente = 0  # próxima tarea por enviar al pool
+        extraidas = {}
+
+        for pagina in range(info["total_pages"]):
+            if pagina not in tarea_de:
+                with open(os.path.join(carpeta, f"{pagina}.txt"), encoding="utf-8") as f:
+                    texto = f.read()
+                self.paginas_en_cache += 1
+            else:
+                if pagina not in extraidas:
+                    actual = tarea_de[pagina]
+                    # Hasta 2 tareas por proceso en vuelo: memoria acotada y el pool no se queda sin trabajo
+                    while pool is not None and siguiente < len(tareas) and siguiente - actual < 2 * self.procesos:
+                        en_vuelo[siguiente] = pool.submit(_extraer_paginas, ruta, tareas[siguiente], carpeta)
+                        siguiente += 1
+                    if actual in en_vuelo:
+                        extraidas.update(en_vuelo.pop(actual).result())
+                    else:
+                        extraidas.update(_extraer_paginas(ruta, tareas[actual], carpeta))
+                texto = extraidas.pop(pagina)
+            yield Document(page_content=texto, metadata=dict(base, page=pagina))
+
+    def _info(self, ruta, carpeta):
+        """Número de páginas y título del PDF (guardados junto a las páginas en caché)."""
+        archivo = os.path.join(carpeta, "info.json") if carpeta else None
+        if archivo and os.path.exists(archivo):
+            with open(archivo, encoding="utf-8") as f:
+                return json.load(f)
+        lector = pypdf.PdfReader(ruta)
+        titulo = (lector.metadata or {}).get("/Title")
+        info = {"total_pages": len(lector.pages), "title": str(titulo) if titulo else None}
+        if archivo:
+            os.makedirs(carpeta, exist_ok=True)
+            _escribir(archivo, json.dumps(info, ensure_ascii=False))
+        return info
+
+
+def limpiar_cache(vigentes):
+    """Borra las páginas en caché de PDFs que ya no están en el corpus (`vigentes`: hashes)."""
+    if not os.path.isdir(INGESTA_CACHE):
+        return
+    conservar = {os.path.basename(carpeta_cache(h)) for h in vigentes}
+    for nombre in os.listdir(INGESTA_CACHE):
+        if nombre not in conservar:
+            shutil.rmtree(os.path.join(INGESTA_CACHE, nombre), ignore_errors=True)
+            print(f"🧹 Páginas en caché obsoletas eliminadas: {nombre}")
+
+
+if __name__ == "__main__":
+    from fragmentador_legal import iterar_fragmentos
+    from indice import PDF_FOLDER, archivos_corpus, hash_archivo
+
+    parser = argparse.ArgumentParser(description="Extrae y fragmenta los PDFs midiendo el rendimiento por etapa.")
+    parser.add_argument("pdfs", nargs="*", help="por defecto, todos los de static/pdfs")
+    parser.add_argument("--procesos", type=int, default=INGESTA_PROCESOS)
+    parser.add_argument("--sin-cache", action="store_true", help="extrae todas las páginas con pypdf")
+    args = parser.parse_args()
+    pools_procesos.PROCESOS_ARRANQUE = "fork"  # aquí no hay otros hilos
+
+    rutas = args.pdfs or [os.path.join(PDF_FOLDER, nombre) for nombre in archivos_corpus()]
+    with Ingesta(args.procesos, usar_cache=not args.sin_cache) as ingesta:
+        for ruta in rutas:
+            fragmentos = sum(1 for _ in ingesta.medir("fragmentacion", iterar_fragmentos(
+                ingesta.paginas(ruta, hash_archivo(ruta)))))
+            print(f"📄 {os.path.basename(ruta)}: {fragmentos} fragmentos.")
+        ingesta.imprimir_reporte()
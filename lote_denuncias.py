@@ -0,0 +1,358 @@
+import argparse
+import csv
+import hmac
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from string import Formatter
+
+import pools_procesos
+from almacen_pdfs import guardar_pdf
+from formato_denuncia import TEXTO_BASE, TEXTOS_PRUEBAS, generar_pdf
+from funciones_auxiliares import (MEDIDAS_CAUTELARES_OPCIONES, MEDIDAS_PROTECCION_OPCIONES, REGLAS_CAMPOS,
+                                  quitar_acentos, validar_campo)
+
+# ----------------------------------------------------------------------
+#               GENERACIÓN DE DENUNCIAS EN LOTE (JSONL / CSV)
+# ----------------------------------------------------------------------
+# /generar_denuncia recibe una sola denuncia. Las organizaciones aliadas nos
+# mandan hojas de captura con muchas; aquí se procesan en lote:
+#   1) cada fila (una línea JSONL o un renglón CSV con los nombres de los campos
+#      como encabezados) se valida con las mismas reglas locales del chat
+#      (validar_campo); los campos vacíos quedan en blanco como al "omitir";
+#   2) las filas válidas se convierten en PDF en un pool de procesos, con a lo
+#      más 2 tareas por proceso en vuelo: la memoria no crece con el lote;
+#   3) los resultados salen en el orden de entrada, como un ZIP (un PDF por
+#      denuncia y resultados.ndjson con el estado de cada fila) o como NDJSON
+#      (una línea por fila con el id del PDF en almacen_pdfs), sin armar la
+#      respuesta completa en memoria.
+# Cada worker de gunicorn tiene su propio pool: por defecto se reparten los
+# núcleos entre los workers (WEB_CONCURRENCY) en lugar de darle todos a cada
+# uno. El pool arranca con forkserver (ver pools_procesos.py).
+#
+# Uso:  python lote_denuncias.py entrada.csv [-o denuncias.zip | --ndjson] [--procesos N]
+
+LOTE_PROCESOS = int(os.getenv("LOTE_PROCESOS", str(max(1, (os.cpu_count() or 1)
+                                                      // int(os.getenv("WEB_CONCURRENCY", "1"))))))
+LOTE_MAX_FILAS = int(os.getenv("LOTE_MAX_FILAS", "5000"))  # por petición a /generar_denuncias_lote
+LOTE_PROGRESO_CADA = 25  # filas entre cada reporte de avance
+LOTE_TOKEN = os.getenv("LOTE_TOKEN")  # /generar_denuncias_lote pide "Authorization: Bearer <token>"; sin él, la ruta está apagada
+
+BLANCO = "_________________________"  # lo mismo que deja "omitir" en el chat
+# Los de la plantilla más los que pide el chat (los de cada tipo de prueba), sin repetir
+CAMPOS = list(dict.fromkeys([campo for _, campo, _, _ in Formatter().parse(TEXTO_BASE) if campo] + list(REGLAS_CAMPOS)))
+CAMPOS_OBLIGATORIOS = ("nombre_completo", "persona_denunciada", "narraciones")
+TIPOS_PRUEBA = {str(i): tipo for i, tipo in enumerate(TEXTOS_PRUEBAS, 1)}  # "1" -> "confesional", como el menú
+OPCIONES_MEDIDAS = {
+    "medidas_cautelares": MEDIDAS_CAUTELARES_OPCIONES,
+    "medidas_proteccion": MEDIDAS_PROTECCION_OPCIONES,
+}
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None  # un pool heredado por fork no sirve en el hijo
+_pool_procesos = 0
+_estadisticas = {
+    "lotes": 0,
+    "filas": 0,
+    "pdfs": 0,
+    "invalidas": 0,
+    "errores": 0,
+    "segundos": 0.0,
+}
+
+
+# --- Entrada ----------------------------------------------------------------
+
+def formato_de(nombre="", tipo_contenido=""):
+    """"csv" o "jsonl" según la extensión del archivo o el Content-Type."""
+    if nombre.lower().endswith(".csv") or "csv" in (tipo_contenido or ""):
+        return "csv"
+    return "jsonl"
+
+
+def autorizado(cabecera):
+    """True si la cabecera Authorization trae LOTE_TOKEN (comparación en tiempo constante)."""
+    if not LOTE_TOKEN:
+        return False
+    return hmac.compare_digest((cabecera or "").encode(), f"Bearer {LOTE_TOKEN}".encode())
+
+
+def leer_registros(texto, formato):
+    """Genera (fila, registro, error) leyendo `texto` (archivo de texto) de a una fila."""
+    if formato == "csv":
+        # fila = renglón de la hoja de cálculo (el 1 es el encabezado), aunque una celda traiga saltos de línea
+        for fila, registro in enumerate(csv.DictReader(texto), 2):
+            yield fila, {k.strip(): v for k, v in registro.items() if k}, None
+        return
+    for fila, linea in enumerate(texto, 1):
+        if not linea.strip():
+            continue
+        try:
+            registro = json.loads(linea)
+        except ValueError as e:
+            yield fila, None, f"JSON inválido: {str(e)}"
+            continue
+        if not isinstance(registro, dict):
+            yield fila, None, "cada línea debe ser un objeto JSON"
+            continue
+        yield fila, registro, None
+
+
+# --- Validación -------------------------------------------------------------
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, list):
+        return "\n\n".join(str(v).strip() for v in valor if str(v).strip())
+    return str(valor).strip()
+
+
+def _medidas(campo, valor):
+    """Lista o números del menú ("1, 3") -> el mismo texto que arma el chat."""
+    opciones = OPCIONES_MEDIDAS[campo]
+    elegidas = valor if isinstance(valor, list) else [valor]
+    if not isinstance(valor, list) and re.fullmatch(r"\s*\d+(\s*[,y ]\s*\d+)*\s*", str(valor)):
+        elegidas = re.findall(r"\d+", str(valor))
+    medidas = []
+    for medida in elegidas:
+        medida = str(medida).strip()
+        if medida.isdigit():
+            if not 1 <= int(medida) <= len(opciones):
+                return None, f"no hay opción {medida} (elige de 1 a {len(opciones)})"
+            medida = opciones[int(medida) - 1]
+        if medida:
+            medidas.append(medida)
+    return "\n".join(f"- {m}" for m in medidas), None
+
+
+def normalizar_registro(registro):
+    """
+    (datos, errores): `datos` trae todos los campos de la plantilla, validados y
+    normalizados con validar_campo; `errores` es {campo: motivo} (vacío si la fila sirve).
+    """
+    datos, errores = {}, {}
+    for campo in CAMPOS:
+        valor = registro.get(campo)
+        if campo in OPCIONES_MEDIDAS and valor not in (None, "", []):
+            valor, motivo = _medidas(campo, valor)
+            if motivo:
+                errores[campo] = motivo
+                continue
+        texto = _texto(valor)
+        if not texto:
+            if campo in CAMPOS_OBLIGATORIOS:
+                errores[campo] = "es obligatorio"
+            datos[campo] = BLANCO
+            continue
+
+        if campo == "tipo_prueba":
+            tipo = TIPOS_PRUEBA.get(texto, quitar_acentos(texto.lower()).split(" ")[0])
+            if tipo not in TEXTOS_PRUEBAS:
+                errores[campo] = f"debe ser uno de: {', '.join(TEXTOS_PRUEBAS)} (o 1 a {len(TEXTOS_PRUEBAS)})"
+            datos[campo] = tipo
+            continue
+
+        estado, normalizado, motivo = validar_campo(campo, texto)
+        if estado == "invalido":
+            errores[campo] = motivo
+        datos[campo] = normalizado  # "llm": texto libre, en lote se acepta tal cual
+    return datos, errores
+
+
+# --- Procesamiento ----------------------------------------------------------
+
+def _renderizar(datos):
+    """Corre en los procesos del pool: los bytes del PDF."""
+    return generar_pdf(datos)
+
+
+def _obtener_pool(procesos):
+    """(pool, procesos que tiene): el pool es uno por proceso y su tamaño lo fija quien lo crea."""
+    global _pool, _pool_pid, _pool_procesos
+    with _lock:
+        if _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(procesos, mp_context=pools_procesos.contexto(__name__))
+            _pool_pid, _pool_procesos = os.getpid(), procesos
+        return _pool, _pool_procesos
+
+
+def procesar_lote(registros, procesos=LOTE_PROCESOS, maximo=None, al_avanzar=None):
+    """
+    Genera un resultado por fila, en orden: {"fila", "id", "estado", "errores"}
+    más "pdf" (bytes) si estado == "ok". estado: "ok", "invalido" o "error".
+    `al_avanzar(resumen)` se llama cada LOTE_PROGRESO_CADA filas y al terminar.
+    """
+    pool, procesos = _obtener_pool(procesos) if procesos > 1 else (None, 1)
+    en_vuelo = 2 * procesos  # tareas enviadas al pool sin recoger
+    pendientes = deque()  # (resultado, future) en el orden de entrada
+    resumen = {"filas": 0, "ok": 0, "invalidas": 0, "errores": 0, "por_segundo": 0.0}
+    inicio = time.perf_counter()
+
+    def terminar(resultado, futuro):
+        if futuro is not None:
+            try:
+                resultado["pdf"] = futuro.result()
+            except Exception as e:
+                resultado.update(estado="error", errores={"pdf": str(e)})
+        resumen["filas"] += 1
+        resumen[{"ok": "ok", "invalido": "invalidas", "error": "errores"}[resultado["estado"]]] += 1
+        if al_avanzar and resumen["filas"] % LOTE_PROGRESO_CADA == 0:
+            resumen["por_segundo"] = round(resumen["filas"] / (time.perf_counter() - inicio), 1)
+            al_avanzar(dict(resumen))
+        return resultado
+
+    try:
+        for numero, (fila, registro, error) in enumerate(registros):
+            if maximo is not None and numero >= maximo:
+                pendientes.append(({"fila": fila, "id": None, "estado": "error", "errores": {
+                    "lote": f"el lote supera {maximo} denuncias; desde esta fila no se procesó"}}, None))
+                break
+            if error:
+                pendientes.append(({"fila": fila, "id": None, "estado": "invalido",
+                                    "errores": {"registro": error}}, None))
+            else:
+                datos, errores = normalizar_registro(registro)
+                resultado = {"fila": fila, "id": _texto(registro.get("id")) or None,
+                             "estado": "invalido" if errores else "ok", "errores": errores}
+                futuro = None
+                if not errores:
+                    if pool is None:
+                        try:
+                            resultado["pdf"] = _renderizar(datos)
+                        except Exception as e:
+                            resultado.update(estado="error", errores={"pdf": str(e)})
+                    else:
+                        futuro = pool.submit(_renderizar, datos)
+                pendientes.append((resultado, futuro))
+
+            # Se entregan los que ya terminaron (en orden) y se espera si hay demasiados en vuelo
+            while pendientes and (pendientes[0][1] is None or pendientes[0][1].done()
+                                  or len(pendientes) > en_vuelo):
+                yield terminar(*pendientes.popleft())
+        while pendientes:
+            yield terminar(*pendientes.popleft())
+    finally:
+        for _, futuro in pendientes:  # el cliente se desconectó: no seguir renderizando
+            if futuro is not None:
+                futuro.cancel()
+        segundos = time.perf_counter() - inicio
+        resumen["por_segundo"] = round(resumen["filas"] / segundos, 1) if segundos else 0.0
+        if al_avanzar:
+            al_avanzar(dict(resumen, terminado=True))
+        with _lock:
+            _estadisticas["lotes"] += 1
+            _estadisticas["filas"] += resumen["filas"]
+            _estadisticas["pdfs"] += resumen["ok"]
+            _estadisticas["invalidas"] += resumen["invalidas"]
+            _estadisticas["errores"] += resumen["errores"]
+            _estadisticas["segundos"] += segundos
+
+
+# --- Salida -----------------------------------------------------------------
+
+class _Partes:
+    """Destino sin seek para zipfile: acumula lo escrito hasta que se entrega."""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes = []
+        return datos
+
+
+def nombre_pdf(resultado):
+    identificador = re.sub(r"[^\w\-]+", "_", resultado["id"] or "")[:40].strip("_")
+    return f"denuncia_{resultado['fila']:05d}{'_' + identificador if identificador else ''}.pdf"
+
+
+def zip_en_partes(resultados):
+    """
+    Genera el ZIP por partes mientras llegan los resultados: un PDF por denuncia
+    válida y, al final, resultados.ndjson con el estado de cada fila.
+    """
+    salida = _Partes()
+    manifiesto = []
+    # ZIP_STORED: fpdf ya comprime el contenido de las páginas
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_STORED) as archivo_zip:
+        for resultado in resultados:
+            pdf = resultado.pop("pdf", None)
+            if pdf is not None:
+                resultado["archivo"] = nombre_pdf(resultado)
+                archivo_zip.writestr(resultado["archivo"], pdf)
+            manifiesto.append(json.dumps(resultado, ensure_ascii=False))
+            partes = salida.vaciar()
+            if partes:
+                yield partes
+        archivo_zip.writestr("resultados.ndjson", "\n".join(manifiesto) + "\n")
+    yield salida.vaciar()
+
+
+def ndjson_en_partes(resultados, url_descarga=None):
+    """Una línea JSON por fila; los PDFs se guardan en almacen_pdfs y la línea lleva su id."""
+    for resultado in resultados:
+        pdf = resultado.pop("pdf", None)
+        if pdf is not None:
+            resultado["pdf_id"] = guardar_pdf(pdf)
+            if url_descarga:
+                resultado["descarga"] = url_descarga(resultado["pdf_id"])
+        yield json.dumps(resultado, ensure_ascii=False) + "\n"
+
+
+def imprimir_avance(resumen):
+    estado = "✅ Lote terminado" if resumen.get("terminado") else "⏳ Lote en curso"
+    print(f"{estado}: {resumen['filas']} filas ({resumen['ok']} PDFs, {resumen['invalidas']} inválidas, "
+          f"{resumen['errores']} con error), {resumen['por_segundo']}/s.", file=sys.stderr)
+
+
+def estadisticas_lote():
+    with _lock:
+        stats = dict(_estadisticas)
+    segundos = stats.pop("segundos")
+    stats["filas_por_segundo"] = round(stats["filas"] / segundos, 1) if segundos else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera denuncias en PDF a partir de un JSONL o CSV.")
+    parser.add_argument("entrada", help="archivo .jsonl o .csv ('-' para leer de stdin)")
+    parser.add_argument("-o", "--salida", default="denuncias.zip", help="ZIP de salida")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="escribe en stdout el estado de cada fila y guarda los PDFs en almacen_pdfs")
+    parser.add_argument("--formato", choices=["jsonl", "csv"], help="por defecto, según la extensión")
+    parser.add_argument("--procesos", type=int, default=LOTE_PROCESOS)
+    args = parser.parse_args()
+    pools_procesos.PROCESOS_ARRANQUE = "fork"  # aquí no hay otros hilos
+
+    formato = args.formato or formato_de(args.entrada)
+    if args.entrada == "-":
+        entrada = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+    else:
+        entrada = open(args.entrada, encoding="utf-8-sig", newline="")
+    with entrada:
+        resultados = procesar_lote(leer_registros(entrada, formato), args.procesos, al_avanzar=imprimir_avance)
+        if args.ndjson:
+            for linea in ndjson_en_partes(resultados):
+                sys.stdout.write(linea)
+        else:
+            with open(args.salida, "wb") as salida:
+                for parte in zip_en_partes(resultados):
+                    salida.write(parte)
+            print(f"📦 {args.salida}", file=sys.stderr)
@@ -0,0 +1,208 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_audio import AUDIO_OUTPUT_FOLDER, AUDIO_LANG, AUDIO_VOZ, clave_audio, sintetizar
+
+# ----------------------------------------------------------------------
+#               PAQUETE PRE-RENDERIZADO DE AUDIOS FIJOS
+# ----------------------------------------------------------------------
+# Enumera todos los textos deterministas que la máquina de estados puede
+# convertir a voz, los sintetiza una sola vez y los guarda en una carpeta
+# versionada (la versión es un digest de los textos, idioma y voz). En cada
+# petición text_to_speech solo hace una búsqueda en memoria.
+#
+# Uso:  python paquete_audio.py [--hilos 8] [--limpiar]
+
+PAQUETE_FOLDER = os.path.join(AUDIO_OUTPUT_FOLDER, "paquete")
+
+# Campos que se agregan a la lista según la opción de tipo_prueba (ver app.chat)
+CAMPOS_PRUEBA_CONFESIONAL = [
+    "quien_desahoga", "numero_notarial", "notario_publico_numero",
+    "donde_funciones_notario", "fecha_intrumento_notarial",
+    "prueba_confesional", "numeros_prueba"
+]
+CAMPOS_PRUEBA_TESTIMONIAL = [
+    "quien_desahoga", "numero_notarial", "notario_publico_numero",
+    "donde_funciones_notario", "fecha_intrumento_notarial",
+    "prueba_testimonial", "numeros_prueba"
+]
+CAMPOS_PRUEBA_DOCUMENTAL = [
+    "documentos_oficiales", "folio", "fecha_folio",
+    "autoridad_emite", "acto_documento", "documento_prueba", "numeros_prueba"
+]
+CAMPOS_DEPENDIENTES_TIPO_PRUEBA = {
+    "quien_desahoga", "numero_notarial", "notario_publico_numero",
+    "donde_funciones_notario", "fecha_intrumento_notarial",
+    "prueba_confesional", "prueba_testimonial", "documento_prueba",
+    "numeros_prueba", "folio", "fecha_folio", "documentos_oficiales"
+}
+
+PAQUETE_REINTENTO_SEGUNDOS = 60  # si aún no existe, se vuelve a buscar el manifiesto
+
+_paquete = None  # {clave: url} del paquete vigente
+_paquete_revisado = float("-inf")
+_paquete_lock = threading.Lock()
+
+
+def secuencias_campos():
+    """Órdenes de campos que puede recorrer una denuncia según la prueba elegida."""
+    from funciones_auxiliares import LISTA_CAMPOS_DENUNCIA
+
+    base = LISTA_CAMPOS_DENUNCIA
+    i = base.index("tipo_prueba")
+    resto = base[i + 1:]
+    secuencias = [base]
+    for extra in (CAMPOS_PRUEBA_CONFESIONAL, CAMPOS_PRUEBA_TESTIMONIAL, CAMPOS_PRUEBA_DOCUMENTAL):
+        secuencias.append(base[:i + 1] + resto + extra)
+    # Presuncional / instrumental eliminan los dependientes
+    secuencias.append(base[:i + 1] + [d for d in resto if d not in CAMPOS_DEPENDIENTES_TIPO_PRUEBA])
+    return secuencias
+
+
+def textos_fijos():
+    """Todos los textos deterministas que el bot convierte a voz."""
+    import funciones_auxiliares as fa  # import diferido: funciones_auxiliares usa este módulo
+
+    textos = {
+        fa.TEXTO_PROCESO_CANCELADO,
+        fa.TEXTO_DENUNCIA_GENERADA,
+        fa.TEXTO_OTRA_CAUTELAR,
+        fa.TEXTO_OTRA_PROTECCION,
+        fa.TEXTO_MENU_TIPO_PRUEBA,
+        fa.TEXTO_MENU_TIPO_PRUEBA_OMITIR,
+        fa.TEXTO_NARRACION_AGREGADA,
+        fa.TEXTO_MENU_DECISION,
+        fa.texto_menu_medidas_cautelares(),
+        fa.texto_menu_medidas_proteccion(),
+        fa.texto_cautelares_registradas(),
+        fa.texto_inicio_denuncia(fa.LISTA_CAMPOS_DENUNCIA[0]),
+    }
+
+    for secuencia in secuencias_campos():
+        for dato_actual, siguiente_dato in zip(secuencia, secuencia[1:]):
+            textos.add(fa.texto_dato_registrado(dato_actual, siguiente_dato))
+            textos.add(fa.texto_omitido_siguiente(dato_actual, siguiente_dato))
+            if dato_actual == "narraciones":
+                textos.add(fa.texto_narraciones_registradas(siguiente_dato))
+            if dato_actual == "medidas_proteccion":
+                textos.add(fa.texto_proteccion_registrada(siguiente_dato))
+            if siguiente_dato == "medidas_cautelares":
+                textos.add(fa.texto_omitido_cautelares(dato_actual))
+            if siguiente_dato == "medidas_proteccion":
+                textos.add(fa.texto_omitido_proteccion(dato_actual))
+            if dato_actual == "tipo_prueba":
+                for tipo in ("presuncional", "instrumental"):
+                    textos.add(fa.texto_prueba_registrada(tipo, siguiente_dato))
+
+    for dato in CAMPOS_DEPENDIENTES_TIPO_PRUEBA:
+        textos.add(fa.texto_omitido_dependiente(dato))
+
+    return sorted(textos)
+
+
+def version_paquete(textos):
+    digest = hashlib.sha256(f"{AUDIO_LANG}\x00{AUDIO_VOZ}".encode("utf-8"))
+    for texto in textos:
+        digest.update(b"\x00" + texto.encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def construir_paquete(hilos=4, limpiar=False):
+    """Sintetiza los textos fijos que falten en el paquete vigente y escribe su manifiesto."""
+    global _paquete
+    textos = textos_fijos()
+    version = version_paquete(textos)
+    carpeta = os.path.join(PAQUETE_FOLDER, version)
+    os.makedirs(carpeta, exist_ok=True)
+
+    pendientes = []
+    audios = {}
+    for texto in textos:
+        clave = clave_audio(texto)
+        audios[clave] = f"{clave}.mp3"
+        ruta = os.path.join(carpeta, audios[clave])
+        if not os.path.exists(ruta):
+            pendientes.append((texto, ruta))
+
+    print(f"🔊 Paquete de audio {version}: {len(textos)} textos, {len(pendientes)} por sintetizar.")
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        for _ in executor.map(lambda par: sintetizar(*par), pendientes):
+            pass
+
+    manifiesto = {"version": version, "lang": AUDIO_LANG, "voz": AUDIO_VOZ, "audios": audios}
+    temporal = os.path.join(carpeta, f"manifest.json.{os.getpid()}.tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+    os.replace(temporal, os.path.join(carpeta, "manifest.json"))
+
+    if limpiar:
+        for nombre in os.listdir(PAQUETE_FOLDER):
+            if nombre != version:
+                shutil.rmtree(os.path.join(PAQUETE_FOLDER, nombre), ignore_errors=True)
+                print(f"🧹 Paquete de audio obsoleto eliminado: {nombre}")
+
+    with _paquete_lock:
+        _paquete = _urls_paquete(version, audios)
+    print(f"✅ Paquete de audio {version} listo en {carpeta}")
+    return version
+
+
+def buscar_en_paquete(texto):
+    """URL del audio pre-renderizado del texto, o None si no forma parte del paquete."""
+    global _paquete, _paquete_revisado
+    # Un paquete vacío se vuelve a buscar de vez en cuando: otro worker pudo haberlo construido
+    if not _paquete and time.monotonic() - _paquete_revisado > PAQUETE_REINTENTO_SEGUNDOS:
+        with _paquete_lock:
+            if not _paquete and time.monotonic() - _paquete_revisado > PAQUETE_REINTENTO_SEGUNDOS:
+                _paquete = cargar_paquete()
+                _paquete_revisado = time.monotonic()
+    return _paquete.get(clave_audio(texto)) if _paquete else None
+
+
+def cargar_paquete():
+    """Carga el manifiesto que corresponde a los textos actuales (si ya fue construido)."""
+    version = version_paquete(textos_fijos())
+    ruta = os.path.join(PAQUETE_FOLDER, version, "manifest.json")
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            manifiesto = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        print(f"⚠️ No hay paquete de audio para la versión {version}; se usará la caché de audio.")
+        return {}
+    print(f"🔊 Paquete de audio {version} cargado ({len(manifiesto['audios'])} audios).")
+    return _urls_paquete(version, manifiesto["audios"])
+
+
+def iniciar_precalentamiento(hilos=4):
+    """Construye el paquete en segundo plano (hook opcional de arranque)."""
+    def _construir():
+        try:
+            construir_paquete(hilos=hilos)
+        except Exception as e:
+            print(f"⚠️ Error al construir el paquete de audio: {str(e)}")
+
+    threading.Thread(target=_construir, name="paquete-audio", daemon=True).start()
+
+
+def _urls_paquete(version, audios):
+    return {clave: f"/{AUDIO_OUTPUT_FOLDER}/paquete/{version}/{archivo}" for clave, archivo in audios.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-renderiza el audio de todos los textos fijos del bot.")
+    parser.add_argument("--hilos", type=int, default=8, help="síntesis en paralelo")
+    parser.add_argument("--limpiar", action="store_true", help="elimina paquetes de versiones anteriores")
+    parser.add_argument("--listar", action="store_true", help="solo muestra los textos, sin sintetizar")
+    args = parser.parse_args()
+
+    if args.listar:
+        for texto in textos_fijos():
+            print(texto.replace("\n", " "))
+    else:
+        construir_paquete(hilos=args.hilos, limpiar=args.limpiar)
@@ -0,0 +1,37 @@
+import multiprocessing
+import os
+import threading
+
+# ----------------------------------------------------------------------
+#              CÓMO ARRANCAN LOS POOLS DE PROCESOS DEL SERVIDOR
+# ----------------------------------------------------------------------
+# ingesta_pdfs (/reload_index) y lote_denuncias (/generar_denuncias_lote) crean
+# pools de procesos dentro de un worker que ya tiene otros hilos corriendo (la
+# cola de TTS, los resúmenes, el cliente del LLM, la carga en segundo plano,
+# OpenMP de torch). Un fork copia los candados que esos hilos tengan tomados y
+# el hijo puede quedarse bloqueado para siempre (ver wsgi.py). Por eso dentro
+# del servidor los pools arrancan con "forkserver": un proceso limpio, sin
+# hilos, que solo importa los módulos de las tareas y del que salen los hijos.
+# Donde no hay forkserver se usa "spawn". Las herramientas de línea de comandos
+# (python indice.py, python lote_denuncias.py...) corren en un solo hilo y
+# pueden seguir usando "fork" (PROCESOS_ARRANQUE = "fork" en su __main__).
+# Con forkserver y spawn cada hijo vuelve a importar el módulo principal del
+# padre (app.py con `python app.py`), sin ejecutar su bloque __main__.
+
+PROCESOS_ARRANQUE = os.getenv("PROCESOS_ARRANQUE", "forkserver")  # forkserver | spawn | fork
+
+_lock = threading.Lock()
+_precargar = set()  # módulos que el forkserver importa una vez para todos sus hijos
+
+
+def contexto(*modulos):
+    """Contexto de multiprocessing para un pool cuyas tareas viven en `modulos`."""
+    metodos = multiprocessing.get_all_start_methods()
+    metodo = PROCESOS_ARRANQUE if PROCESOS_ARRANQUE in metodos else "spawn"
+    ctx = multiprocessing.get_context(metodo)
+    if metodo == "forkserver":
+        with _lock:
+            _precargar.update(modulos)
+            # Solo surte efecto si el forkserver aún no arranca; si ya corre, los hijos importan al deserializar
+            ctx.set_forkserver_preload(sorted(_precargar))
+    return ctx
@@ -106,14 +106,21 @@ async function sendMessage(text, isVoice = false) {
     try {
         const voiceMode = document.getElementById("voiceMode").checked;
 
-        // Enviar el mensaje al servidor
-        const response = await fetch("/chat", {
+        // Enviar el mensaje al servidor (la respuesta del LLM llega en streaming)
+        const response = await fetch("/chat_stream", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ message: text }),
+            // Solo se pide audio si se va a reproducir; así el servidor evita sintetizarlo
+            body: JSON.stringify({ message: text, voice: isVoice || voiceMode }),
         });
 
-        const data = await response.json();
+        let data;
+        if ((response.headers.get("Content-Type") || "").includes("text/event-stream")) {
+            data = await leerStream(response, botMessage);
+        } else {
+            // Flujos que no usan el LLM (formulario, menús): JSON igual que /chat
+            data = await response.json();
+        }
         let botResponse = data.response;
         let audioUrl = data.audio_response; // URL del audio generado por el backend
 
@@ -139,7 +146,10 @@ async function sendMessage(text, isVoice = false) {
 
         botMessage.innerHTML = botResponse;
 
-        // 🔊 Reproducir audio si está disponible
+        // 🔊 Reproducir audio si está disponible (puede estar generándose aún en el servidor)
+        if (audioUrl && data.audio_job && (isVoice || voiceMode)) {
+            audioUrl = await esperarAudio(data.audio_job);
+        }
         if (audioUrl && (isVoice || voiceMode)) {
             const audioPlayer = document.createElement("audio");
             audioPlayer.src = audioUrl;
@@ -270,10 +280,14 @@ startRecordingButton.addEventListener("click", async () => {
                 messages.appendChild(botMessage);
 
                 // Si hay una respuesta en audio, agregar el reproductor
-                if (data.audio_response) {
+                let audioUrl = data.audio_response;
+                if (audioUrl && data.audio_job) {
+                    audioUrl = await esperarAudio(data.audio_job);
+                }
+                if (audioUrl) {
                     const audioElement = document.createElement("audio");
                     audioElement.controls = true;
-                    audioElement.src = data.audio_response;
+                    audioElement.src = audioUrl;
                     messages.appendChild(audioElement);
                 }
 
@@ -304,6 +318,72 @@ stopRecordingButton.addEventListener("click", () => {
     audioModal.hide();
 });
 
+// Lee los Server-Sent Events de /chat_stream, mostrando el texto a medida que llega.
+// Devuelve los datos del evento "done" (mismo formato que la respuesta de /chat).
+async function leerStream(response, botMessage) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let texto = "";
+    let htmlBase = "";       // markdown ya renderizado por el servidor
+    let largoRenderizado = 0; // caracteres de `texto` cubiertos por htmlBase
+    let final = { response: "❌ Error en el servidor. Intenta nuevamente." };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let separador;
+        while ((separador = buffer.indexOf("\n\n")) !== -1) {
+            const bloque = buffer.slice(0, separador);
+            buffer = buffer.slice(separador + 2);
+
+            let evento = "message";
+            let datos = "";
+            for (const linea of bloque.split("\n")) {
+                if (linea.startsWith("event: ")) evento = linea.slice(7);
+                else if (linea.startsWith("data: ")) datos += linea.slice(6);
+            }
+            const payload = datos ? JSON.parse(datos) : {};
+
+            if (evento === "delta") {
+                texto += payload.text;
+                // Lo ya renderizado + el resto como texto plano hasta que llegue el siguiente "html"
+                const cola = document.createElement("span");
+                cola.textContent = texto.slice(largoRenderizado);
+                botMessage.innerHTML = htmlBase;
+                botMessage.appendChild(cola);
+            } else if (evento === "html") {
+                // Markdown renderizado por el servidor hasta la última línea completa
+                htmlBase = markdownToHtml(payload.html);
+                largoRenderizado = texto.length;
+                botMessage.innerHTML = htmlBase;
+            } else if (evento === "done") {
+                final = payload;
+            }
+            messages.scrollTop = messages.scrollHeight;
+        }
+    }
+    return final;
+}
+
+// Espera a que el servidor termine de generar el audio (la síntesis corre en segundo plano)
+async function esperarAudio(jobId, intentos = 12) {
+    for (let i = 0; i < intentos; i++) {
+        try {
+            const response = await fetch(`/audio_status/${jobId}?esperar=5`);
+            const data = await response.json();
+            if (data.status === "ready") return data.audio_response;
+            if (data.status === "error") return null;
+        } catch (error) {
+            console.error("Error al consultar el audio:", error);
+            return null;
+        }
+    }
+    return null;
+}
+
 function markdownToHtml(text) {
     return text.replace(/\[(.*?)\]\((.*?)\)/g, '<a href="$2" target="_blank" class="text-primary">$1</a>');
 }
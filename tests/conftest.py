@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Pruebas con pytest, desde la raíz del repo:  python -m pytest -q
+# Los módulos de la app viven en la raíz, no en un paquete.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
@@ -0,0 +1,98 @@
+import pytest
+from flask import Flask, session, stream_with_context
+
+from almacen_sesiones import AlmacenMemoria, AlmacenSQLite, InterfazSesiones, codificar, decodificar
+
+SESION = {
+    "messages": [
+        {"role": "user", "content": "¿Qué es la violencia política?"},
+        {"role": "assistant", "content": "Es…", "tipo": "formulario"},
+    ],
+    "datos_usuario": {"nombre_completo": "Ana María Pérez", "medidas_cautelares_lista": [], "telefono": None},
+    "datos_faltantes": ["telefono", "domicilio"],
+    "pdf_id": "4037c6df91334973883d5b00f4353390",
+    "pidiendo_medidas_cautelares": True,
+    "intentos": 3,
+    "vacia": [],
+    "historial_resumen": None,
+}
+
+
+def test_ida_y_vuelta():
+    assert decodificar(codificar(SESION)) == SESION
+
+
+def test_cada_elemento_de_una_lista_es_una_fila():
+    filas = codificar({"messages": SESION["messages"]})
+    assert set(filas) == {"messages[]", "messages[0]", "messages[1]"}
+    # Un turno nuevo agrega filas y cambia la longitud; las anteriores quedan iguales
+    mas = codificar({"messages": SESION["messages"] + [{"role": "user", "content": "gracias"}]})
+    assert {fila for fila in mas if mas[fila] != filas.get(fila)} == {"messages[]", "messages[2]"}
+
+
+def test_conjuntos_se_guardan_como_listas_ordenadas():
+    datos = {"vistos": {"tijuana", "ensenada", "mexicali"}, "anidado": {"numeros": frozenset({3, 1, 2})}}
+    filas = codificar(datos)
+    assert filas == codificar({"vistos": {"mexicali", "tijuana", "ensenada"}, "anidado": {"numeros": {2, 3, 1}}})
+    assert decodificar(filas) == {"vistos": ["ensenada", "mexicali", "tijuana"], "anidado": {"numeros": [1, 2, 3]}}
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def app(request, tmp_path):
+    app = Flask(__name__)
+    almacen = AlmacenMemoria() if request.param == "memoria" else AlmacenSQLite(str(tmp_path / "sesiones.sqlite3"))
+    app.session_interface = InterfazSesiones(almacen)
+
+    @app.post("/turno")
+    def turno():
+        session.setdefault("messages", []).append({"role": "user", "content": "hola"})
+        return {"turnos": len(session["messages"])}
+
+    @app.get("/leer")
+    def leer():
+        return {"turnos": len(session.get("messages", []))}
+
+    @app.post("/stream")
+    def stream():
+        session.setdefault("messages", []).append({"role": "user", "content": "hola"})
+
+        def generar():
+            yield "..."
+            # Los encabezados (y la cookie) ya salieron: solo se guarda el historial
+            session["messages"] = session["messages"] + [{"role": "assistant", "content": "respuesta"}]
+            app.session_interface.guardar_datos(session)
+            yield "listo"
+
+        return app.response_class(stream_with_context(generar()))
+
+    @app.post("/borrar")
+    def borrar():
+        session.clear()
+        return {}
+
+    return app
+
+
+def test_solo_se_escriben_las_filas_que_cambian(app):
+    cliente = app.test_client()
+    for turno in range(1, 4):
+        assert cliente.post("/turno").get_json() == {"turnos": turno}
+    # Cada turno escribe el mensaje nuevo y la longitud de la lista
+    assert app.session_interface.estadisticas["claves_escritas"] == 2 * 3
+    assert cliente.get("/leer").get_json() == {"turnos": 3}
+    assert app.session_interface.estadisticas["sin_cambios"] == 1
+
+
+def test_sesion_vacia_se_elimina(app):
+    cliente = app.test_client()
+    cliente.post("/turno")
+    sid = cliente.get_cookie(app.config["SESSION_COOKIE_NAME"]).value
+    cliente.post("/borrar")
+    assert app.session_interface.almacen.cargar(sid) is None
+    assert cliente.get("/leer").get_json() == {"turnos": 0}
+
+
+def test_guardar_datos_sin_respuesta_al_final_del_stream(app):
+    cliente = app.test_client()
+    assert cliente.post("/stream").get_data(as_text=True) == "...listo"
+    assert cliente.get("/leer").get_json() == {"turnos": 2}
@@ -0,0 +1,147 @@
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import cliente_llm
+from cliente_llm import LLMNoDisponible, llamar
+
+PETICION = httpx.Request("POST", "http://llm.falso/v1/chat/completions")
+
+
+def error_http(codigo, **cabeceras):
+    respuesta = httpx.Response(codigo, headers=cabeceras, request=PETICION)
+    return openai.APIStatusError(f"HTTP {codigo}", response=respuesta, body=None)
+
+
+def caida():
+    return openai.APIConnectionError(request=PETICION)
+
+
+class Operacion:
+    """operacion(timeout) que lanza los errores de `guion` en orden y después responde."""
+
+    def __init__(self, *guion):
+        self.guion = list(guion)
+        self.timeouts = []
+
+    def __call__(self, timeout):
+        self.timeouts.append(timeout)
+        if self.guion:
+            raise self.guion.pop(0)
+        return "respuesta"
+
+    @property
+    def intentos(self):
+        return len(self.timeouts)
+
+
+@pytest.fixture(autouse=True)
+def pasarela(monkeypatch):
+    """Circuito cerrado, contadores en cero, sin esperas reales entre reintentos y reloj manual."""
+    reloj = {"ahora": 1000.0}
+    monkeypatch.setattr(cliente_llm, "_circuito", {"estado": "cerrado", "abierto_desde": 0.0, "probando": False})
+    monkeypatch.setattr(cliente_llm, "_intentos", deque(maxlen=4))
+    monkeypatch.setattr(cliente_llm, "_operaciones", {})
+    monkeypatch.setattr(cliente_llm, "_estadisticas", dict.fromkeys(cliente_llm._estadisticas, 0))
+    monkeypatch.setattr(cliente_llm, "LLM_REINTENTOS", 2)
+    monkeypatch.setattr(cliente_llm, "LLM_CIRCUITO_FALLOS", 3)
+    monkeypatch.setattr(cliente_llm, "LLM_CIRCUITO_VENTANA", 4)
+    monkeypatch.setattr(cliente_llm, "LLM_CIRCUITO_ESPERA", 30)
+    monkeypatch.setattr(cliente_llm, "time", SimpleNamespace(
+        monotonic=lambda: reloj["ahora"],
+        sleep=lambda segundos: reloj.update(ahora=reloj["ahora"] + segundos),
+        perf_counter=time.perf_counter,
+    ))
+    return reloj
+
+
+def test_reintenta_errores_transitorios():
+    operacion = Operacion(caida(), error_http(503))
+    assert llamar(operacion, plazo=10) == "respuesta"
+    assert operacion.intentos == 3
+    stats = cliente_llm.estadisticas_llm()
+    assert (stats["reintentos"], stats["exitos"], stats["errores"]) == (2, 1, 0)
+
+
+def test_reintentos_agotados_dan_llm_no_disponible():
+    operacion = Operacion(error_http(500), error_http(502), error_http(503), error_http(504))
+    with pytest.raises(LLMNoDisponible):
+        llamar(operacion, plazo=10)
+    assert operacion.intentos == 1 + cliente_llm.LLM_REINTENTOS
+    assert cliente_llm.estadisticas_llm()["errores"] == 1
+
+
+@pytest.mark.parametrize("codigo", [400, 401, 404])
+def test_errores_definitivos_no_se_reintentan(codigo):
+    operacion = Operacion(error_http(codigo))
+    with pytest.raises(openai.APIStatusError):
+        llamar(operacion, plazo=10)
+    assert operacion.intentos == 1
+    assert cliente_llm.estadisticas_llm()["fallos_recientes"] == 0  # OpenAI respondió: no cuenta para el circuito
+
+
+def test_retry_after_que_no_cabe_en_el_plazo_no_se_espera():
+    operacion = Operacion(error_http(429, **{"retry-after": "60"}))
+    with pytest.raises(LLMNoDisponible):
+        llamar(operacion, plazo=10)
+    assert operacion.intentos == 1
+
+
+def test_cada_intento_recibe_lo_que_queda_del_plazo(pasarela):
+    operacion = Operacion(caida())
+    llamar(operacion, plazo=7)
+    primero, segundo = operacion.timeouts
+    assert (primero.read, primero.connect) == (7, cliente_llm.LLM_TIMEOUT_CONEXION)
+    assert segundo.read == pytest.approx(1007 - pasarela["ahora"])
+
+
+def test_circuito_se_abre_y_rechaza_al_instante():
+    with pytest.raises(LLMNoDisponible):
+        llamar(Operacion(*[caida()] * 3), plazo=10)  # tres intentos fallidos: el circuito se abre
+    assert cliente_llm.estadisticas_llm()["circuito"] == "abierto"
+
+    operacion = Operacion()
+    with pytest.raises(LLMNoDisponible, match="circuito abierto"):
+        llamar(operacion, plazo=10)
+    assert operacion.intentos == 0
+    assert cliente_llm.estadisticas_llm()["rechazadas_por_circuito"] == 1
+
+
+def test_semiabierto_deja_pasar_una_prueba_que_cierra_el_circuito(pasarela):
+    with pytest.raises(LLMNoDisponible):
+        llamar(Operacion(*[caida()] * 3), plazo=10)
+    pasarela["ahora"] += cliente_llm.LLM_CIRCUITO_ESPERA + 1
+
+    cliente_llm._permitir("chat")  # la prueba
+    assert cliente_llm._circuito["estado"] == "semiabierto"
+    with pytest.raises(LLMNoDisponible):
+        cliente_llm._permitir("chat")  # mientras tanto, las demás se rechazan
+    cliente_llm._registrar_intento("exito")
+
+    assert cliente_llm.estadisticas_llm()["circuito"] == "cerrado"
+    assert llamar(Operacion(), plazo=10) == "respuesta"
+
+
+def test_prueba_fallida_vuelve_a_abrir_el_circuito(pasarela):
+    with pytest.raises(LLMNoDisponible):
+        llamar(Operacion(*[caida()] * 3), plazo=10)
+    pasarela["ahora"] += cliente_llm.LLM_CIRCUITO_ESPERA + 1
+
+    with pytest.raises(LLMNoDisponible):
+        llamar(Operacion(caida(), caida()), plazo=10)  # la prueba falla y ya no hay más intentos
+    stats = cliente_llm.estadisticas_llm()
+    assert (stats["circuito"], stats["aperturas_circuito"]) == ("abierto", 2)
+
+
+def test_error_ajeno_a_la_api_libera_la_prueba(pasarela):
+    with pytest.raises(LLMNoDisponible):
+        llamar(Operacion(*[caida()] * 3), plazo=10)
+    pasarela["ahora"] += cliente_llm.LLM_CIRCUITO_ESPERA + 1
+
+    with pytest.raises(ValueError):
+        llamar(Operacion(ValueError("archivo dañado")), plazo=10)
+    assert (cliente_llm._circuito["estado"], cliente_llm._circuito["probando"]) == ("semiabierto", False)
@@ -0,0 +1,33 @@
+import pytest
+
+import cola_tts
+
+
+@pytest.fixture(autouse=True)
+def cola(monkeypatch, tmp_path):
+    """Trabajos en cero y MP3/marcadores en un directorio temporal."""
+    monkeypatch.setattr(cola_tts, "_trabajos", {})
+    monkeypatch.setattr(cola_tts, "ruta_audio", lambda clave: str(tmp_path / f"{clave}.mp3"))
+    return tmp_path
+
+
+def test_fallo_deja_marcador_que_ven_los_demas_workers(monkeypatch, cola):
+    def falla(texto):
+        raise RuntimeError("gTTS no responde")
+
+    monkeypatch.setattr(cola_tts, "obtener_audio", falla)
+    _, clave = cola_tts.encolar_audio("texto que no se puede sintetizar")
+    assert cola_tts.estado_trabajo(clave, esperar=5) == "error"
+    assert (cola / f"{clave}.err").exists()
+
+    cola_tts._trabajos.clear()  # otro worker, o este tras un reinicio
+    assert cola_tts.estado_trabajo(clave) == "error"
+
+
+def test_reintento_borra_el_marcador(monkeypatch, cola):
+    monkeypatch.setattr(cola_tts, "obtener_audio", lambda texto: None)
+    clave = cola_tts.clave_audio("reintento")
+    (cola / f"{clave}.err").write_text("fallo anterior")
+    assert cola_tts.encolar_audio("reintento")[1] == clave
+    assert cola_tts.estado_trabajo(clave, esperar=5) == "ready"
+    assert not (cola / f"{clave}.err").exists()
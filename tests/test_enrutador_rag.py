@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+
+import enrutador_rag
+
+# Fragmentos de muestra de la LGAMVLV y la LGIPE (el índice real tiene miles)
+FRAGMENTOS = [
+    ("LEY_GENERAL_DE_ACCESO_DE_LAS_MUJERES.pdf",
+     "Artículo 20 Bis. La violencia política contra las mujeres en razón de género es toda acción u omisión, "
+     "incluida la tolerancia, basada en elementos de género y ejercida dentro de la esfera pública o privada, "
+     "que tenga por objeto o resultado limitar, anular o menoscabar el ejercicio efectivo de los derechos "
+     "políticos y electorales de una o varias mujeres, el acceso al pleno ejercicio de las atribuciones "
+     "inherentes a su cargo, labor o actividad, el libre desarrollo de la función pública, la toma de "
+     "decisiones, la libertad de organización, así como el acceso y ejercicio a las prerrogativas de las "
+     "precandidaturas, candidaturas, funciones o cargos públicos."),
+    ("LEY_GENERAL_DE_ACCESO_DE_LAS_MUJERES.pdf",
+     "Artículo 20 Ter. La violencia política contra las mujeres puede expresarse, entre otras, a través de "
+     "las siguientes conductas: obstaculizar la campaña de las candidatas; difamar, calumniar, injuriar o "
+     "realizar cualquier expresión que denigre a las mujeres; amenazar o intimidar a una o varias mujeres o "
+     "a su familia; impedir que asistan a las sesiones ordinarias o extraordinarias; restringir el uso de la "
+     "palabra en las sesiones del cabildo; ocultar información o documentación; acosar u hostigar."),
+    ("LEY_GENERAL_DE_INSTITUCIONES_Y_PROCEDIMIENTOS.pdf",
+     "Artículo 442 Bis. La violencia política contra las mujeres en razón de género se manifiesta, entre "
+     "otras, a través de las conductas previstas en la ley. Las quejas o denuncias se sustanciarán por el "
+     "procedimiento especial sancionador; la autoridad podrá dictar medidas cautelares y de protección, y "
+     "ordenar la reparación del daño a la víctima."),
+]
+
+# (pregunta, ¿buscar?) con la forma en que escriben los usuarios del chat
+PREGUNTAS = [
+    ("hola, buenas tardes", False),
+    ("muchas gracias, muy amable", False),
+    ("¿qué dice el artículo 20 Ter?", True),
+    ("¿la LGIPE habla de esto?", True),
+    ("¿el OPLE puede recibir mi queja?", True),
+    ("¿qué es la violencia política contra las mujeres en razón de género?", True),
+    ("me restringieron el uso de la palabra en las sesiones del cabildo", True),
+    ("¿qué medidas cautelares puede dictar la autoridad?", True),
+    ("soy mujer y quiero saber la receta del pozole", False),
+    ("¿cuánto cobran de cargo por envío a Tijuana?", False),
+    ("mi candidato favorito del mundial es México", False),
+    ("escríbeme un poema sobre el mar", False),
+]
+
+
+@pytest.fixture
+def db():
+    documentos = {str(i): SimpleNamespace(page_content=texto, metadata={"source": fuente, "page": i})
+                  for i, (fuente, texto) in enumerate(FRAGMENTOS)}
+    return SimpleNamespace(manifiesto={"version": "prueba-enrutador"}, docstore=SimpleNamespace(search=documentos.get),
+                           index_to_docstore_id={i: clave for i, clave in enumerate(documentos)})
+
+
+@pytest.mark.parametrize("pregunta, buscar", PREGUNTAS)
+def test_separa_preguntas_con_y_sin_busqueda(db, pregunta, buscar):
+    assert enrutador_rag.decidir(db, pregunta)[0] is buscar
+
+
+def test_palabras_del_tema_no_deciden_solas(db):
+    # Antes "mujer", "cargo" o "candidat" mandaban a buscar sin mirar el resto de la pregunta
+    for pregunta in ("soy mujer y quiero saber la receta del pozole", "mi candidato favorito del mundial es México"):
+        assert enrutador_rag.decidir(db, pregunta) == (False, "cobertura_baja")
+    assert enrutador_rag.decidir(db, "¿el OPLE puede recibir mi queja?") == (True, "autoridad")
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_pdf import denuncias, generar_pdf_actual, generar_pdf_anterior  # noqa: E402
+
+DENUNCIAS = list(denuncias())
+
+
+@pytest.mark.parametrize("datos", DENUNCIAS, ids=[datos["tipo_prueba"] for datos in DENUNCIAS])
+def test_mismos_bytes_que_el_renderizador_anterior(datos):
+    anterior = generar_pdf_anterior(datos)
+    assert generar_pdf_actual(datos) == anterior
+    # La segunda vez sale de la caché de líneas de la plantilla y debe dar lo mismo
+    assert generar_pdf_actual(datos) == anterior
+
+
+def test_sin_cache_de_lineas_sale_lo_mismo(monkeypatch):
+    import formato_denuncia
+
+    monkeypatch.setattr(formato_denuncia, "LINEAS_EN_CACHE", False)
+    datos = DENUNCIAS[-1]
+    assert generar_pdf_actual(datos) == generar_pdf_anterior(datos)
+
+
+def test_fuentes_se_crean_una_vez_por_proceso(monkeypatch):
+    import formato_denuncia
+    from fpdf.fonts import CoreFont
+
+    creadas = []
+    monkeypatch.setattr(formato_denuncia, "_fuentes", {})
+    monkeypatch.setattr(formato_denuncia, "CoreFont",
+                        lambda *args: creadas.append(args[1:]) or CoreFont(*args))
+    fuentes = formato_denuncia.PDF().fonts
+    assert len(creadas) == len(formato_denuncia.FUENTES_DOCUMENTO)
+    assert all(formato_denuncia.PDF().fonts[clave] is fuente for clave, fuente in fuentes.items())
+    assert len(creadas) == len(formato_denuncia.FUENTES_DOCUMENTO)
@@ -0,0 +1,84 @@
+import io
+
+import pytest
+
+import lote_denuncias
+from funciones_auxiliares import MEDIDAS_CAUTELARES_OPCIONES, MEDIDAS_PROTECCION_OPCIONES
+from lote_denuncias import BLANCO, CAMPOS, autorizado, leer_registros, normalizar_registro
+
+MINIMO = {
+    "nombre_completo": "ana maría pérez",
+    "persona_denunciada": "Juan Gómez",
+    "narraciones": "En la sesión de cabildo me apagaron el micrófono.",
+}
+
+
+def test_registro_minimo_llena_la_plantilla_con_blancos():
+    datos, errores = normalizar_registro(MINIMO)
+    assert errores == {}
+    assert set(datos) == set(CAMPOS)
+    assert datos["nombre_completo"] == "Ana María Pérez"
+    assert datos["narraciones"] == MINIMO["narraciones"]
+    assert datos["telefono"] == datos["folio"] == BLANCO
+
+
+def test_campos_se_normalizan_como_en_el_chat():
+    datos, errores = normalizar_registro(dict(MINIMO, telefono="664-123-4567", fecha_hechos="05/02/2023",
+                                              ciudad="TIJUANA", narraciones=["Primer hecho.", " ", "Segundo hecho."]))
+    assert errores == {}
+    assert (datos["telefono"], datos["fecha_hechos"], datos["ciudad"]) == ("6641234567", "5 de febrero de 2023",
+                                                                          "tijuana")
+    assert datos["narraciones"] == "Primer hecho.\n\nSegundo hecho."
+
+
+@pytest.mark.parametrize("valor", ["1, 3", "1 y 3", [1, 3], [MEDIDAS_CAUTELARES_OPCIONES[0], "3"]])
+def test_medidas_por_numero_o_texto(valor):
+    datos, errores = normalizar_registro(dict(MINIMO, medidas_cautelares=valor))
+    assert errores == {}
+    assert datos["medidas_cautelares"] == f"- {MEDIDAS_CAUTELARES_OPCIONES[0]}\n- {MEDIDAS_CAUTELARES_OPCIONES[2]}"
+
+
+def test_medida_libre_se_conserva():
+    datos, _ = normalizar_registro(dict(MINIMO, medidas_proteccion=["2", "Escolta en las sesiones"]))
+    assert datos["medidas_proteccion"] == f"- {MEDIDAS_PROTECCION_OPCIONES[1]}\n- Escolta en las sesiones"
+
+
+@pytest.mark.parametrize("valor, tipo", [("3", "documental"), ("Documental Pública o Privada", "documental"),
+                                         ("testimonial", "testimonial"), ("Confesional", "confesional")])
+def test_tipo_de_prueba(valor, tipo):
+    datos, errores = normalizar_registro(dict(MINIMO, tipo_prueba=valor))
+    assert errores == {}
+    assert datos["tipo_prueba"] == tipo
+
+
+def test_errores_por_campo():
+    registro = {"nombre_completo": "Ana", "telefono": "123", "medidas_proteccion": "9",
+                "tipo_prueba": "pericial", "narraciones": "  "}
+    _, errores = normalizar_registro(registro)
+    assert set(errores) == {"nombre_completo", "telefono", "medidas_proteccion", "tipo_prueba",
+                            "persona_denunciada", "narraciones"}
+    assert errores["persona_denunciada"] == errores["narraciones"] == "es obligatorio"
+    assert errores["medidas_proteccion"].startswith("no hay opción 9")
+
+
+def test_leer_registros_jsonl_y_csv():
+    jsonl = io.StringIO('{"nombre_completo": "Ana Pérez"}\n\nno es json\n[1, 2]\n')
+    filas = list(leer_registros(jsonl, "jsonl"))
+    assert [(fila, registro) for fila, registro, _ in filas] == [(1, {"nombre_completo": "Ana Pérez"}),
+                                                                 (3, None), (4, None)]
+    assert filas[1][2].startswith("JSON inválido") and filas[2][2] == "cada línea debe ser un objeto JSON"
+
+    csv = io.StringIO('nombre_completo, narraciones\nAna Pérez,"Primer hecho.\nSegundo hecho."\nJuan Gómez,Otro\n')
+    assert list(leer_registros(csv, "csv")) == [
+        (2, {"nombre_completo": "Ana Pérez", "narraciones": "Primer hecho.\nSegundo hecho."}, None),
+        (3, {"nombre_completo": "Juan Gómez", "narraciones": "Otro"}, None),
+    ]
+
+
+def test_token_del_lote(monkeypatch):
+    monkeypatch.setattr(lote_denuncias, "LOTE_TOKEN", None)
+    assert not autorizado("Bearer ")  # sin LOTE_TOKEN la ruta queda apagada
+    monkeypatch.setattr(lote_denuncias, "LOTE_TOKEN", "s3cr3t")
+    assert autorizado("Bearer s3cr3t")
+    assert not autorizado("Bearer s3cr3")
+    assert not autorizado(None)
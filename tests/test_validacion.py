@@ -0,0 +1,76 @@
+from datetime import date, timedelta
+
+import pytest
+
+from funciones_auxiliares import LISTA_CAMPOS_DENUNCIA, REGLAS_CAMPOS, VALIDADORES, interpretar_fecha, validar_campo
+
+
+def test_cada_campo_del_chat_tiene_regla():
+    assert set(LISTA_CAMPOS_DENUNCIA) <= set(REGLAS_CAMPOS)
+    for regla in REGLAS_CAMPOS.values():
+        assert regla["tipo"] == "llm" or regla["tipo"] in VALIDADORES
+
+
+@pytest.mark.parametrize("campo, valor, normalizado", [
+    ("nombre_completo", "  ana   maría pérez ", "Ana María Pérez"),
+    ("telefono", "+52 (664) 123-4567", "6641234567"),
+    ("correo", " ana@ejemplo.mx ", "ana@ejemplo.mx"),
+    ("domicilio", "Calle Reforma 123, Centro", "Calle Reforma 123, Centro"),
+    ("fecha_hechos", "05/02/2023", "5 de febrero de 2023"),
+    ("fecha_folio", "2023-02-05", "5 de febrero de 2023"),
+    ("fecha_intrumento_notarial", "5 de Feb. de 2023", "5 de febrero de 2023"),
+    ("ciudad", "TIJUANA", "tijuana"),
+    ("ciudad", "tuxtla gutierrez", "tuxtla gutiérrez"),
+    ("numero_notarial", "número 1234/2023", "1234/2023"),
+    ("numeros_prueba", "1, 2 y 3", "1, 2 y 3"),
+    ("folio", "Folio: abc-123", "ABC-123"),
+    ("lugar_hechos", " sala de cabildo ", "sala de cabildo"),
+])
+def test_valores_validos_se_normalizan(campo, valor, normalizado):
+    assert validar_campo(campo, valor) == ("valido", normalizado, None)
+
+
+@pytest.mark.parametrize("campo, valor", [
+    ("nombre_completo", "Ana"),
+    ("nombre_completo", "Ana 123"),
+    ("telefono", "12345"),
+    ("telefono", "664 abc 4567"),
+    ("correo", "ana@ejemplo"),
+    ("domicilio", "1234567890"),
+    ("fecha_hechos", "ayer"),
+    ("fecha_hechos", "31/02/2023"),
+    ("ciudad", "tijuana 22000"),
+    ("numero_notarial", "sin número"),
+    ("numeros_prueba", "todos"),
+    ("folio", "sin folio"),
+    ("relacion_denunciada", "12"),
+    ("prueba_confesional", "corto"),
+])
+def test_valores_invalidos_dan_motivo(campo, valor):
+    estado, normalizado, motivo = validar_campo(campo, valor)
+    assert (estado, normalizado) == ("invalido", valor)
+    assert motivo
+
+
+def test_fecha_futura_es_invalida():
+    manana = date.today() + timedelta(days=1)
+    estado, _, motivo = validar_campo("fecha_hechos", manana.isoformat())
+    assert estado == "invalido" and "posterior" in motivo
+
+
+def test_texto_libre_y_ciudades_desconocidas_van_al_llm():
+    assert validar_campo("narraciones", "  me apagaron el micrófono ") == ("llm", "me apagaron el micrófono", None)
+    assert validar_campo("campo_sin_regla", " algo ") == ("llm", "algo", None)
+    assert validar_campo("ciudad", "San Quintín") == ("llm", "San Quintín", None)
+
+
+@pytest.mark.parametrize("texto, esperada", [
+    ("5 de febrero de 2023", date(2023, 2, 5)),
+    ("el 5 de febrero del 2023", date(2023, 2, 5)),
+    ("05-02-2023", date(2023, 2, 5)),
+    ("2023.02.05", date(2023, 2, 5)),
+    ("1 de setiembre de 2021", date(2021, 9, 1)),
+    ("febrero de 2023", None),
+])
+def test_interpretar_fecha(texto, esperada):
+    assert interpretar_fecha(texto) == esperada
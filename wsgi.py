@@ -0,0 +1,45 @@
+import gc
+import os
+
+# ----------------------------------------------------------------------
+#                 PUNTO DE ENTRADA DE PRODUCCIÓN (GUNICORN)
+# ----------------------------------------------------------------------
+# gunicorn.conf.py arranca la app con crear_app() (Flask) o crear_app_asgi()
+# (workers de uvicorn, ver asgi.py). Importar la app ya no carga nada pesado
+# (ver app.cargar_recursos); dónde se carga lo decide GUNICORN_PRECALENTAR:
+#   - "maestro" (por defecto): con preload_app el maestro carga el índice
+#     FAISS, su docstore, el índice BM25 y los pesos del modelo antes de crear
+#     los workers, que los comparten por copy-on-write. Menos memoria por
+#     worker, pero el puerto no se abre hasta terminar la carga.
+#   - "workers": el maestro solo importa la app y cada worker carga lo suyo en
+#     un hilo de fondo (gunicorn.conf.py, post_worker_init). "/" responde en
+#     cuanto arranca el proceso; conviene cuando se escala en caliente.
+# La carga no ejecuta el modelo: el pool de hilos de torch (OpenMP) no
+# sobrevive bien a un fork, así que la primera inferencia es en el worker.
+# gc.freeze() pasa lo cargado a la generación permanente: el recolector de los
+# workers ya no lo recorre ni escribe en sus encabezados, que es lo que haría
+# copiar esas páginas en cada worker.
+
+GUNICORN_PRECALENTAR = os.getenv("GUNICORN_PRECALENTAR", "maestro")  # maestro | workers
+
+
+def preparar(servidor):
+    if GUNICORN_PRECALENTAR == "maestro":
+        servidor.cargar_recursos()
+    gc.collect()
+    gc.freeze()
+    print(f"🧊 {gc.get_freeze_count()} objetos congelados para compartir con los workers.")
+
+
+def crear_app():
+    import app as servidor
+
+    preparar(servidor)
+    return servidor.app
+
+
+def crear_app_asgi():
+    import asgi
+
+    preparar(asgi.servidor)
+    return asgi.aplicacion